@@ -0,0 +1,161 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Persistent cache of checksums of files in an archive."""
+
+__all__ = [
+    "ChecksumCache",
+    "checksum_file",
+]
+
+import os
+import pickle
+from functools import partial
+
+from lp.archivepublisher.utils import HashingFile
+
+# Bump this if the structure of cached entries changes, so that caches
+# written by older code are discarded rather than misinterpreted.
+CHECKSUM_CACHE_FORMAT = 1
+
+
+def checksum_file(path, open_func=None):
+    """Return the size and checksums of the contents of a file.
+
+    :param path: The file to read.
+    :param open_func: A function that opens `path` for reading in binary
+        mode; for example, `gzip.open` to checksum the decompressed
+        contents of a gzipped file.  Defaults to `open`.
+    :return: A dictionary as returned by `HashingFile.checksums`.
+    """
+    if open_func is None:
+        open_func = partial(open, mode="rb")
+    hashing_file = HashingFile()
+    with open_func(path) as in_file:
+        for chunk in iter(lambda: in_file.read(256 * 1024), b""):
+            hashing_file.write(chunk)
+    return hashing_file.checksums
+
+
+def _stat_signature(path):
+    """Return the identity of a file as recorded in a `ChecksumCache`."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ChecksumCache:
+    """A persistent cache of file checksums.
+
+    The publisher reads many files that it did not write itself during the
+    current run (for example, translation files staged by other tools), and
+    most of them are unchanged from one run to the next.  This cache
+    records the checksums of each file along with its inode number, size,
+    and modification time, and only reads the file again if any of those
+    have changed.
+
+    The cache is stored in a single file.  On `save`, entries for files
+    that have since changed or been removed are dropped.
+    """
+
+    def __init__(self, path, log):
+        """Load a checksum cache.
+
+        :param path: The file in which the cache is stored.
+        :param log: A logger.
+        """
+        self.path = path
+        self.log = log
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._load()
+        self._changed = False
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as cache_file:
+                cache_format, entries = pickle.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.log.warning(
+                "Ignoring unreadable checksum cache %s: %s" % (self.path, e)
+            )
+            return {}
+        if cache_format != CHECKSUM_CACHE_FORMAT:
+            self.log.debug("Ignoring outdated checksum cache %s" % self.path)
+            return {}
+        return entries
+
+    def get(self, path, variant=None):
+        """Return stored checksums for a file, if it has not changed.
+
+        This never reads the file itself.
+
+        :param path: The file to look up.
+        :param variant: A key distinguishing different ways of reading the
+            same file, as passed to `lookup`.
+        :return: A dictionary as returned by `HashingFile.checksums`, or
+            None if there is no valid stored entry for this file.
+        """
+        key = (os.path.normpath(path), variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        signature, checksums = entry
+        if signature != _stat_signature(path):
+            del self._entries[key]
+            self._changed = True
+            return None
+        return dict(checksums)
+
+    def lookup(self, path, open_func=None, variant=None):
+        """Return checksums for a file, reading it only if necessary.
+
+        :param path: The file to checksum.
+        :param open_func: A function that opens `path` for reading, as for
+            `checksum_file`.
+        :param variant: A key distinguishing different ways of reading the
+            same file.  Callers that pass `open_func` to checksum something
+            other than the raw contents of `path` must pass a corresponding
+            `variant`.
+        :return: A dictionary as returned by `HashingFile.checksums`.
+        """
+        checksums = self.get(path, variant=variant)
+        if checksums is not None:
+            self.hits += 1
+            return checksums
+        self.misses += 1
+        signature = _stat_signature(path)
+        checksums = checksum_file(path, open_func=open_func)
+        # Don't remember checksums of a file that changed while we were
+        # reading it.
+        if signature is not None and signature == _stat_signature(path):
+            key = (os.path.normpath(path), variant)
+            self._entries[key] = (signature, checksums)
+            self._changed = True
+        return dict(checksums)
+
+    def save(self):
+        """Atomically write the cache to disk, if it has changed."""
+        for key, (signature, _) in list(self._entries.items()):
+            if signature != _stat_signature(key[0]):
+                del self._entries[key]
+                self._changed = True
+        if self._changed:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            new_path = self.path + ".new"
+            with open(new_path, "wb") as cache_file:
+                pickle.dump(
+                    (CHECKSUM_CACHE_FORMAT, self._entries),
+                    cache_file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.rename(new_path, self.path)
+            self._changed = False
+        self.log.debug(
+            "Checksum cache %s: %d hits, %d misses"
+            % (self.path, self.hits, self.misses)
+        )
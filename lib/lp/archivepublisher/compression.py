@@ -0,0 +1,368 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Multi-threaded compression of archive index files.
+
+The stdlib `zlib`, `bz2`, and `lzma` modules release the GIL while
+compressing, so splitting the input into independent blocks and
+compressing those blocks on a thread pool uses several cores.  The writers
+here reassemble the blocks into a single standard stream of the relevant
+format (as pigz, lbzip2, and "xz -T" do), so that the output can be read by
+any decompressor, including apt's, without relying on support for
+concatenated streams.
+"""
+
+__all__ = [
+    "ThreadedBzip2File",
+    "ThreadedGzipFile",
+    "ThreadedXZFile",
+    "get_compression_executor",
+]
+
+import bz2
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# One executor per (process, thread count).  Worker threads do not survive
+# fork, so executors are keyed by process ID as well.
+_executors = {}
+
+
+def get_compression_executor(threads):
+    """Return a shared executor with `threads` compression threads."""
+    key = (os.getpid(), threads)
+    if key not in _executors:
+        _executors[key] = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="compress"
+        )
+    return _executors[key]
+
+
+class ThreadedCompressedFile:
+    """A write-only file that compresses blocks of data on a thread pool.
+
+    Subclasses define how to compress a single block (`_compressBlock`,
+    which runs on a worker thread) and how to assemble compressed blocks
+    into a stream (`_writeHeader`, `_writeBlock`, and `_writeTrailer`,
+    which run in the calling thread, in order).
+
+    The underlying file object is not closed by `close`, matching the
+    behaviour of the stdlib compressed file classes when given a file
+    object.
+    """
+
+    # Size in bytes of the uncompressed blocks to compress independently.
+    block_size = None
+
+    def __init__(self, fileobj, executor, threads):
+        self.fileobj = fileobj
+        self.executor = executor
+        # Bound the number of compressed blocks held in memory.
+        self.max_pending = threads * 2
+        self._buffer = []
+        self._buffer_size = 0
+        self._previous_block = None
+        self._pending = deque()
+        self._closed = False
+        self._writeHeader()
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size >= self.block_size:
+            buffered = b"".join(self._buffer)
+            offset = 0
+            while len(buffered) - offset >= self.block_size:
+                self._submit(
+                    buffered[offset : offset + self.block_size], False
+                )
+                offset += self.block_size
+            self._buffer = [buffered[offset:]]
+            self._buffer_size = len(buffered) - offset
+        return len(data)
+
+    def _submit(self, block, last):
+        self._pending.append(
+            self.executor.submit(
+                self._compressBlock, block, self._previous_block, last
+            )
+        )
+        self._previous_block = block
+        while len(self._pending) > self.max_pending:
+            self._writeBlock(self._pending.popleft().result())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._submit(b"".join(self._buffer), True)
+        self._buffer = None
+        while self._pending:
+            self._writeBlock(self._pending.popleft().result())
+        self._writeTrailer()
+
+    def _writeHeader(self):
+        pass
+
+    def _compressBlock(self, block, previous_block, last):
+        """Compress a single block.  Runs on a worker thread.
+
+        :param block: The uncompressed data.
+        :param previous_block: The preceding uncompressed block, or None.
+        :param last: True if this is the last block in the stream.
+        :return: An object to pass to `_writeBlock`.
+        """
+        raise NotImplementedError
+
+    def _writeBlock(self, compressed):
+        raise NotImplementedError
+
+    def _writeTrailer(self):
+        pass
+
+
+class ThreadedGzipFile(ThreadedCompressedFile):
+    """Write a single-member gzip stream, compressing blocks in parallel.
+
+    Each block is compressed as raw deflate data primed with the last 32KiB
+    of the previous block, and all but the last end with a sync flush, so
+    the concatenation is one valid deflate stream.  The header matches
+    `gzip.GzipFile` with a blank filename and zero mtime.
+    """
+
+    block_size = 1024 * 1024
+    compresslevel = 9
+
+    def __init__(self, fileobj, executor, threads):
+        self._crc = zlib.crc32(b"")
+        self._size = 0
+        super().__init__(fileobj, executor, threads)
+
+    def write(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        return super().write(data)
+
+    def _writeHeader(self):
+        # Magic, method, flags, mtime, extra flags ("maximum compression"),
+        # and OS ("unknown").
+        self.fileobj.write(b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff")
+
+    def _compressBlock(self, block, previous_block, last):
+        kwargs = {}
+        if previous_block:
+            kwargs["zdict"] = previous_block[-32 * 1024 :]
+        compressor = zlib.compressobj(
+            self.compresslevel,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL,
+            zlib.Z_DEFAULT_STRATEGY,
+            **kwargs,
+        )
+        return compressor.compress(block) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+
+    def _writeBlock(self, compressed):
+        self.fileobj.write(compressed)
+
+    def _writeTrailer(self):
+        self.fileobj.write(
+            struct.pack("<II", self._crc & 0xFFFFFFFF, self._size & 0xFFFFFFFF)
+        )
+
+
+# bzip2 stream framing; see the format description in the bzip2 sources.
+BZIP2_BLOCK_MAGIC = 0x314159265359
+BZIP2_EOS_MAGIC = 0x177245385090
+
+
+class ThreadedBzip2File(ThreadedCompressedFile):
+    """Write a single bzip2 stream, compressing blocks in parallel.
+
+    Each block is compressed as a separate single-block bzip2 stream, from
+    which the (bit-aligned) compressed block is extracted and spliced into
+    the output stream, as lbzip2 does.  The stream CRC is combined from the
+    block CRCs.
+    """
+
+    # bzip2 at level 9 limits blocks to 899981 bytes after its initial
+    # run-length encoding, which can expand input by at most 5/4; this
+    # guarantees that each of our blocks is a single bzip2 block.
+    block_size = 700000
+    compresslevel = 9
+
+    def __init__(self, fileobj, executor, threads):
+        self._bits = 0
+        self._nbits = 0
+        self._combined_crc = 0
+        super().__init__(fileobj, executor, threads)
+
+    def _writeHeader(self):
+        self.fileobj.write(b"BZh%d" % self.compresslevel)
+
+    def _compressBlock(self, block, previous_block, last):
+        if not block:
+            return None
+        stream = bz2.compress(block, self.compresslevel)
+        total_bits = len(stream) * 8
+        value = int.from_bytes(stream, "big")
+        # The stream ends with the end-of-stream magic, the combined CRC,
+        # and 0-7 bits of zero padding.
+        for padding in range(8):
+            trailer = value >> padding
+            if (trailer >> 32) & ((1 << 48) - 1) == BZIP2_EOS_MAGIC and (
+                value & ((1 << padding) - 1) == 0
+            ):
+                break
+        else:
+            raise AssertionError("Cannot find end of bzip2 stream")
+        stream_crc = trailer & 0xFFFFFFFF
+        # Skip the 4-byte stream header; the block runs up to the
+        # end-of-stream magic.
+        nbits = total_bits - 32 - padding - 80
+        block_bits = (value >> (padding + 80)) & ((1 << nbits) - 1)
+        assert block_bits >> (nbits - 48) == BZIP2_BLOCK_MAGIC
+        block_crc = (block_bits >> (nbits - 80)) & 0xFFFFFFFF
+        # A single-block stream's combined CRC is its block's CRC.
+        assert block_crc == stream_crc, "Expected a single bzip2 block"
+        return block_bits, nbits, block_crc
+
+    def _writeBits(self, bits, nbits):
+        bits = (self._bits << nbits) | bits
+        nbits += self._nbits
+        spare = nbits % 8
+        if nbits >= 8:
+            self.fileobj.write((bits >> spare).to_bytes(nbits // 8, "big"))
+        self._bits = bits & ((1 << spare) - 1)
+        self._nbits = spare
+
+    def _writeBlock(self, compressed):
+        if compressed is None:
+            return
+        block_bits, nbits, block_crc = compressed
+        self._writeBits(block_bits, nbits)
+        self._combined_crc = (
+            ((self._combined_crc << 1) | (self._combined_crc >> 31))
+            ^ block_crc
+        ) & 0xFFFFFFFF
+
+    def _writeTrailer(self):
+        self._writeBits((BZIP2_EOS_MAGIC << 32) | self._combined_crc, 80)
+        if self._nbits:
+            self._writeBits(0, 8 - self._nbits)
+
+
+def _xz_varint(value):
+    """Encode an integer as an xz variable-length integer."""
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _xz_pad(length):
+    """Return the zero padding needed to align `length` to four bytes."""
+    return b"\x00" * (-length % 4)
+
+
+class ThreadedXZFile(ThreadedCompressedFile):
+    """Write a single multi-block xz stream, compressing blocks in parallel.
+
+    Each block is compressed as raw LZMA2 data and wrapped in an xz block
+    header, as "xz -T" does; the stream index records each block's sizes.
+    """
+
+    block_size = 8 * 1024 * 1024
+    preset = 6
+    dict_size = 8 * 1024 * 1024
+
+    # Stream flags: no reserved bits, CRC32 check.
+    stream_flags = b"\x00" + bytes([lzma.CHECK_CRC32])
+
+    def __init__(self, fileobj, executor, threads):
+        self._records = []
+        super().__init__(fileobj, executor, threads)
+
+    @classmethod
+    def _lzma2Properties(cls):
+        # LZMA2 encodes the dictionary size in a single byte as
+        # (2 | (p & 1)) << (p // 2 + 11).
+        for p in range(40):
+            if (2 | (p & 1)) << (p // 2 + 11) >= cls.dict_size:
+                return bytes([p])
+        return b"\x28"
+
+    def _writeHeader(self):
+        self.fileobj.write(
+            b"\xfd7zXZ\x00"
+            + self.stream_flags
+            + struct.pack("<I", zlib.crc32(self.stream_flags))
+        )
+
+    def _compressBlock(self, block, previous_block, last):
+        if not block:
+            return None
+        compressor = lzma.LZMACompressor(
+            format=lzma.FORMAT_RAW,
+            filters=[
+                {
+                    "id": lzma.FILTER_LZMA2,
+                    "preset": self.preset,
+                    "dict_size": self.dict_size,
+                }
+            ],
+        )
+        data = compressor.compress(block) + compressor.flush()
+        # Block header: size, flags (one filter; compressed and
+        # uncompressed sizes present), sizes, and LZMA2 filter flags.
+        header = (
+            b"\xc0"
+            + _xz_varint(len(data))
+            + _xz_varint(len(block))
+            + _xz_varint(lzma.FILTER_LZMA2)
+            + _xz_varint(1)
+            + self._lzma2Properties()
+        )
+        header += _xz_pad(len(header) + 1 + 4)
+        header = bytes([(len(header) + 1 + 4) // 4 - 1]) + header
+        header += struct.pack("<I", zlib.crc32(header))
+        check = struct.pack("<I", zlib.crc32(block))
+        unpadded_size = len(header) + len(data) + len(check)
+        return (
+            header + data + _xz_pad(len(data)) + check,
+            unpadded_size,
+            len(block),
+        )
+
+    def _writeBlock(self, compressed):
+        if compressed is None:
+            return
+        data, unpadded_size, uncompressed_size = compressed
+        self.fileobj.write(data)
+        self._records.append((unpadded_size, uncompressed_size))
+
+    def _writeTrailer(self):
+        index = b"\x00" + _xz_varint(len(self._records))
+        for unpadded_size, uncompressed_size in self._records:
+            index += _xz_varint(unpadded_size) + _xz_varint(uncompressed_size)
+        index += _xz_pad(len(index))
+        index += struct.pack("<I", zlib.crc32(index))
+        backward_size = struct.pack("<I", len(index) // 4 - 1)
+        self.fileobj.write(
+            index
+            + struct.pack("<I", zlib.crc32(backward_size + self.stream_flags))
+            + backward_size
+            + self.stream_flags
+            + b"YZ"
+        )
@@ -5,16 +5,20 @@
 Processes removals of packages that are scheduled for deletion.
 """
 
+from collections import defaultdict
 from datetime import datetime, timezone
+from operator import attrgetter
 
-from storm.expr import Exists
-from storm.locals import And, ClassAlias, Not, Select
+from storm.expr import Exists, Join, LeftJoin
+from storm.locals import And, ClassAlias, Not, Or, Select
 
 from lp.archivepublisher.config import getPubConfig
+from lp.registry.model.sourcepackagename import SourcePackageName
+from lp.services.database.bulk import load_related
 from lp.services.database.constants import UTC_NOW
 from lp.services.database.interfaces import IStore
 from lp.services.librarian.model import LibraryFileAlias, LibraryFileContent
-from lp.soyuz.enums import ArchivePurpose
+from lp.soyuz.enums import ArchivePurpose, ArchiveRepositoryFormat
 from lp.soyuz.interfaces.publishing import (
     IBinaryPackagePublishingHistory,
     ISourcePackagePublishingHistory,
@@ -22,11 +26,16 @@
     NotInPool,
     inactive_publishing_status,
 )
+from lp.soyuz.model.binarypackagebuild import BinaryPackageBuild
+from lp.soyuz.model.binarypackagename import BinaryPackageName
+from lp.soyuz.model.binarypackagerelease import BinaryPackageRelease
+from lp.soyuz.model.component import Component
 from lp.soyuz.model.files import BinaryPackageFile, SourcePackageReleaseFile
 from lp.soyuz.model.publishing import (
     BinaryPackagePublishingHistory,
     SourcePackagePublishingHistory,
 )
+from lp.soyuz.model.sourcepackagerelease import SourcePackageRelease
 
 
 def getDeathRow(archive, log, pool_root_override):
@@ -59,6 +68,10 @@ class DeathRow:
     by other packages.
     """
 
+    # The number of publications to load at once, and the number of files
+    # to remove at once.
+    batch_size = 1000
+
     def __init__(self, archive, diskpool, logger):
         self.archive = archive
         self.diskpool = diskpool
@@ -96,19 +109,21 @@ def _mockRemoveFile(
 
             self._removeFile = _mockRemoveFile
 
-        source_files, binary_files = self._collectCondemned()
-        records = self._tryRemovingFromDisk(source_files, binary_files)
+        source_ids, binary_ids = self._collectCondemned()
+        records = self._tryRemovingFromDisk(source_ids, binary_ids)
         self._markPublicationRemoved(records)
 
     def _collectCondemned(self):
-        """Return the condemned source and binary publications as a tuple.
+        """Return the condemned source and binary publication IDs as a tuple.
 
-        Return all the `SourcePackagePublishingHistory` and
+        Return the IDs of all the `SourcePackagePublishingHistory` and
         `BinaryPackagePublishingHistory` records that are eligible for
         removal ('condemned') where the source/binary package that they
         refer to is not published somewhere else.
 
-        Both sources and binaries are lists.
+        Both sources and binaries are lists of IDs, in ascending order.
+        The publications themselves are loaded in batches by
+        `_tryRemovingFromDisk`.
         """
         OtherSPPH = ClassAlias(SourcePackagePublishingHistory)
         other_active_spph = Select(
@@ -124,7 +139,7 @@ def _collectCondemned(self):
         sources = list(
             IStore(SourcePackagePublishingHistory)
             .find(
-                SourcePackagePublishingHistory,
+                SourcePackagePublishingHistory.id,
                 SourcePackagePublishingHistory.archive == self.archive,
                 SourcePackagePublishingHistory.scheduleddeletiondate < UTC_NOW,
                 SourcePackagePublishingHistory.dateremoved == None,
@@ -148,7 +163,7 @@ def _collectCondemned(self):
         binaries = list(
             IStore(BinaryPackagePublishingHistory)
             .find(
-                BinaryPackagePublishingHistory,
+                BinaryPackagePublishingHistory.id,
                 BinaryPackagePublishingHistory.archive == self.archive,
                 BinaryPackagePublishingHistory.scheduleddeletiondate < UTC_NOW,
                 BinaryPackagePublishingHistory.dateremoved == None,
@@ -160,91 +175,210 @@ def _collectCondemned(self):
 
         return (sources, binaries)
 
-    def canRemove(self, publication_class, filename, file_sha256):
-        """Check if given (filename, MD5) can be removed from the pool.
-
-        Check the archive reference-counter implemented in:
-        `SourcePackagePublishingHistory` or
-        `BinaryPackagePublishingHistory`.
-
-        Only allow removal of unnecessary files.
-        """
-        clauses = []
-
+    def _getFileReferenceClauses(self, publication_class):
+        """Return clauses joining publications to their files' contents."""
         if ISourcePackagePublishingHistory.implementedBy(publication_class):
-            clauses.extend(
-                [
-                    SourcePackagePublishingHistory.archive == self.archive,
-                    SourcePackagePublishingHistory.dateremoved == None,
-                    SourcePackagePublishingHistory.sourcepackagerelease
-                    == SourcePackageReleaseFile.sourcepackagerelease_id,
-                    SourcePackageReleaseFile.libraryfile
-                    == LibraryFileAlias.id,
-                ]
-            )
+            clauses = [
+                SourcePackagePublishingHistory.archive == self.archive,
+                SourcePackagePublishingHistory.dateremoved == None,
+                SourcePackagePublishingHistory.sourcepackagerelease
+                == SourcePackageReleaseFile.sourcepackagerelease_id,
+                SourcePackageReleaseFile.libraryfile == LibraryFileAlias.id,
+            ]
         elif IBinaryPackagePublishingHistory.implementedBy(publication_class):
-            clauses.extend(
-                [
-                    BinaryPackagePublishingHistory.archive == self.archive,
-                    BinaryPackagePublishingHistory.dateremoved == None,
-                    BinaryPackagePublishingHistory.binarypackagerelease
-                    == BinaryPackageFile.binarypackagerelease_id,
-                    BinaryPackageFile.libraryfile == LibraryFileAlias.id,
-                ]
-            )
+            clauses = [
+                BinaryPackagePublishingHistory.archive == self.archive,
+                BinaryPackagePublishingHistory.dateremoved == None,
+                BinaryPackagePublishingHistory.binarypackagerelease
+                == BinaryPackageFile.binarypackagerelease_id,
+                BinaryPackageFile.libraryfile == LibraryFileAlias.id,
+            ]
         else:
             raise AssertionError("%r is not supported." % publication_class)
+        clauses.append(LibraryFileAlias.content == LibraryFileContent.id)
+        return clauses
+
+    def findUnremovableFiles(self, publication_class, files):
+        """Return those of the given files that cannot be removed yet.
 
+        This is a set-based version of `canRemove`: a file cannot be
+        removed if any publication in this archive that refers to it is
+        still active, hasn't been dominated yet, or is still in
+        'quarantine'.
+
+        :param publication_class: `SourcePackagePublishingHistory` or
+            `BinaryPackagePublishingHistory`.
+        :param files: A set of (filename, SHA-256) pairs.
+        :return: The subset of `files` that must stay in the pool.
+        """
+        if not files:
+            return set()
+        right_now = datetime.now(timezone.utc)
+        clauses = self._getFileReferenceClauses(publication_class)
         clauses.extend(
             [
-                LibraryFileAlias.content == LibraryFileContent.id,
-                LibraryFileAlias.filename == filename,
-                LibraryFileContent.sha256 == file_sha256,
+                LibraryFileAlias.filename.is_in(
+                    {filename for filename, _ in files}
+                ),
+                LibraryFileContent.sha256.is_in(
+                    {file_sha256 for _, file_sha256 in files}
+                ),
+                Or(
+                    Not(
+                        publication_class.status.is_in(
+                            inactive_publishing_status
+                        )
+                    ),
+                    publication_class.scheduleddeletiondate == None,
+                    publication_class.scheduleddeletiondate > right_now,
+                ),
             ]
         )
+        referenced = (
+            IStore(publication_class)
+            .find(
+                (LibraryFileAlias.filename, LibraryFileContent.sha256),
+                *clauses,
+            )
+            .config(distinct=True)
+        )
+        return set(referenced) & set(files)
+
+    def canRemove(self, publication_class, filename, file_sha256):
+        """Check if given (filename, SHA-256) can be removed from the pool.
+
+        Check the archive reference-counter implemented in:
+        `SourcePackagePublishingHistory` or
+        `BinaryPackagePublishingHistory`.
+
+        Only allow removal of unnecessary files.
+        """
+        return not self.findUnremovableFiles(
+            publication_class, {(filename, file_sha256)}
+        )
+
+    def _loadCondemned(self, publication_class, ids):
+        """Load a batch of condemned publications along with their files.
 
-        all_publications = IStore(publication_class).find(
-            publication_class, *clauses
+        :param publication_class: `SourcePackagePublishingHistory` or
+            `BinaryPackagePublishingHistory`.
+        :param ids: A list of publication IDs.
+        :return: A list of (publication, files) pairs, in ID order.
+        """
+        store = IStore(publication_class)
+        pubs = list(
+            store.find(
+                publication_class, publication_class.id.is_in(ids)
+            ).order_by(publication_class.id)
         )
+        load_related(Component, pubs, ["component_id"])
+        if publication_class == SourcePackagePublishingHistory:
+            sprs = load_related(
+                SourcePackageRelease, pubs, ["sourcepackagerelease_id"]
+            )
+            file_class = SourcePackageReleaseFile
+            release_ids = {pub.sourcepackagerelease_id for pub in pubs}
+            release_id_of = attrgetter("sourcepackagerelease_id")
+            # See SourcePackagePublishingHistory.files.
+            if self.archive.repository_format == ArchiveRepositoryFormat.CONDA:
+                release_ids = set()
+        else:
+            bprs = load_related(
+                BinaryPackageRelease, pubs, ["binarypackagerelease_id"]
+            )
+            load_related(BinaryPackageName, bprs, ["binarypackagename_id"])
+            builds = load_related(BinaryPackageBuild, bprs, ["build_id"])
+            sprs = load_related(
+                SourcePackageRelease, builds, ["source_package_release_id"]
+            )
+            file_class = BinaryPackageFile
+            release_ids = {pub.binarypackagerelease_id for pub in pubs}
+            release_id_of = attrgetter("binarypackagerelease_id")
+        load_related(SourcePackageName, sprs, ["sourcepackagename_id"])
+
+        files_by_release = defaultdict(list)
+        if release_ids:
+            rows = (
+                store.using(
+                    file_class,
+                    Join(
+                        LibraryFileAlias,
+                        file_class.libraryfile_id == LibraryFileAlias.id,
+                    ),
+                    LeftJoin(
+                        LibraryFileContent,
+                        LibraryFileAlias.content == LibraryFileContent.id,
+                    ),
+                )
+                .find(
+                    (file_class, LibraryFileAlias, LibraryFileContent),
+                    release_id_of(file_class).is_in(release_ids),
+                )
+                .order_by(file_class.libraryfile_id)
+            )
+            for pub_file, _, _ in rows:
+                files_by_release[release_id_of(pub_file)].append(pub_file)
+        return [(pub, files_by_release[release_id_of(pub)]) for pub in pubs]
 
-        right_now = datetime.now(timezone.utc)
-        for pub in all_publications:
-            # Deny removal if any reference is still active.
-            if pub.status not in inactive_publishing_status:
-                return False
-            # Deny removal if any reference wasn't dominated yet.
-            if pub.scheduleddeletiondate is None:
-                return False
-            # Deny removal if any reference is still in 'quarantine'.
-            if pub.scheduleddeletiondate > right_now:
-                return False
-
-        return True
-
-    def _tryRemovingFromDisk(
-        self, condemned_source_files, condemned_binary_files
-    ):
-        """Take the list of publishing records provided and unpublish them.
+    def _tryRemovingFromDisk(self, condemned_source_ids, condemned_binary_ids):
+        """Take the IDs of the publishing records provided and unpublish them.
 
         You should only pass in entries you want to be unpublished because
         this will result in the files being removed if they're not otherwise
         in use.
+
+        Publications are loaded, and their files checked for other
+        references, in batches of `batch_size`; files are removed as soon
+        as `batch_size` of them have been condemned.
+
+        :return: A dict mapping each publication class to a set of the IDs
+            of the condemned publications of that class.
         """
         bytes = 0
         condemned_files = set()
-        condemned_records = set()
+        condemned_records = {
+            SourcePackagePublishingHistory: set(),
+            BinaryPackagePublishingHistory: set(),
+        }
         considered_files = set()
         details = {}
+        batches_removed = 0
 
-        def checkPubRecord(pub_record, publication_class):
+        def removeFiles():
+            """Remove the files condemned so far from the pool."""
+            removed_bytes = 0
+            self.logger.info(
+                "Removing %s files marked for reaping" % len(details)
+            )
+            for condemned_file in sorted(details, reverse=True):
+                component_name, pool_name, pool_version, pub_file = details[
+                    condemned_file
+                ]
+                try:
+                    removed_bytes += self._removeFile(
+                        component_name, pool_name, pool_version, pub_file
+                    )
+                except NotInPool as info:
+                    # It's safe for us to let this slide because it means
+                    # that the file is already gone.
+                    self.logger.debug(str(info))
+                except MissingSymlinkInPool as info:
+                    # This one is a little more worrying, because an
+                    # expected symlink has vanished from the pool/ (could be
+                    # a code mistake) but there is nothing we can do about
+                    # it at this point.
+                    self.logger.warning(str(info))
+            details.clear()
+            return removed_bytes
+
+        def checkPubRecord(pub_record, files, publication_class, unremovable):
             """Check if the publishing record can be removed.
 
             It can only be removed if all files in its context are not
             referred to any other 'published' publishing records.
 
-            See `canRemove` for more information.
+            See `findUnremovableFiles` for more information.
             """
-            files = pub_record.files
             for pub_file in files:
                 filename = pub_file.libraryfile.filename
                 file_sha256 = pub_file.libraryfile.content.sha256
@@ -267,57 +401,59 @@ def checkPubRecord(pub_record, publication_class):
                 if (filename, file_sha256) in considered_files:
                     self.logger.debug("Already verified.")
                     if file_path in condemned_files:
-                        condemned_records.add(pub_record)
+                        condemned_records[publication_class].add(pub_record.id)
                     continue
                 considered_files.add((filename, file_sha256))
 
                 # Check if the removal is allowed, if not continue.
-                if not self.canRemove(
-                    publication_class, filename, file_sha256
-                ):
+                if (filename, file_sha256) in unremovable:
                     self.logger.debug("Cannot remove.")
                     continue
 
                 # Update local containers, in preparation to file removal.
                 details.setdefault(file_path, pub_file_details)
                 condemned_files.add(file_path)
-                condemned_records.add(pub_record)
+                condemned_records[publication_class].add(pub_record.id)
 
             # A source package with no files at all (which can happen in
             # some cases where the archive's repository format is not
             # ArchiveRepositoryFormat.DEBIAN) cannot have any files which
             # refer to other publishing records, so can always be removed.
             if not files:
-                condemned_records.add(pub_record)
+                condemned_records[publication_class].add(pub_record.id)
 
         # Check source and binary publishing records.
-        for pub_record in condemned_source_files:
-            checkPubRecord(pub_record, SourcePackagePublishingHistory)
-        for pub_record in condemned_binary_files:
-            checkPubRecord(pub_record, BinaryPackagePublishingHistory)
-
-        self.logger.info(
-            "Removing %s files marked for reaping" % len(condemned_files)
-        )
-
-        for condemned_file in sorted(condemned_files, reverse=True):
-            component_name, pool_name, pool_version, pub_file = details[
-                condemned_file
-            ]
-            try:
-                bytes += self._removeFile(
-                    component_name, pool_name, pool_version, pub_file
+        for publication_class, condemned_ids in (
+            (SourcePackagePublishingHistory, condemned_source_ids),
+            (BinaryPackagePublishingHistory, condemned_binary_ids),
+        ):
+            for start in range(0, len(condemned_ids), self.batch_size):
+                batch = self._loadCondemned(
+                    publication_class,
+                    condemned_ids[start : start + self.batch_size],
                 )
-            except NotInPool as info:
-                # It's safe for us to let this slide because it means that
-                # the file is already gone.
-                self.logger.debug(str(info))
-            except MissingSymlinkInPool as info:
-                # This one is a little more worrying, because an expected
-                # symlink has vanished from the pool/ (could be a code
-                # mistake) but there is nothing we can do about it at this
-                # point.
-                self.logger.warning(str(info))
+                unremovable = self.findUnremovableFiles(
+                    publication_class,
+                    {
+                        (
+                            pub_file.libraryfile.filename,
+                            pub_file.libraryfile.content.sha256,
+                        )
+                        for _, files in batch
+                        for pub_file in files
+                    }
+                    - considered_files,
+                )
+                for pub_record, files in batch:
+                    checkPubRecord(
+                        pub_record, files, publication_class, unremovable
+                    )
+                    if len(details) >= self.batch_size:
+                        bytes += removeFiles()
+                        batches_removed += 1
+
+        if details or not batches_removed:
+            bytes += removeFiles()
 
         self.logger.info("Total bytes freed: %s" % bytes)
 
@@ -328,7 +464,14 @@ def _markPublicationRemoved(self, condemned_records):
         # now out-of-date record be marked as removed.
         self.logger.debug(
             "Marking %s condemned packages as removed."
-            % len(condemned_records)
+            % sum(len(ids) for ids in condemned_records.values())
         )
-        for record in condemned_records:
-            record.dateremoved = UTC_NOW
+        for publication_class, ids in condemned_records.items():
+            ids = sorted(ids)
+            for start in range(0, len(ids), self.batch_size):
+                IStore(publication_class).find(
+                    publication_class,
+                    publication_class.id.is_in(
+                        ids[start : start + self.batch_size]
+                    ),
+                ).set(dateremoved=UTC_NOW)
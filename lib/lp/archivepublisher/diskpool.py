@@ -9,14 +9,22 @@
     "unpoolify",
 ]
 
+import hashlib
 import logging
 import os
 import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path, PurePath
 from typing import TYPE_CHECKING, Optional, Tuple, Union
 
 from lp.archivepublisher import HARDCODED_COMPONENT_ORDER
-from lp.services.librarian.utils import copy_and_close, sha1_from_path
+from lp.services.config import config
+from lp.services.librarian.interfaces.client import DownloadFailed
+from lp.services.librarian.utils import (
+    copy_and_close,
+    filechunks,
+    sha1_from_path,
+)
 from lp.services.propertycache import cachedproperty
 from lp.soyuz.interfaces.archive import IArchive
 from lp.soyuz.interfaces.files import IPackageReleaseFile
@@ -91,6 +99,55 @@ def relative_symlink(src_path: Path, dst_path: Path) -> None:
     dst_path.symlink_to(src_path)
 
 
+def download_to_temporary_file(
+    client, url: str, alias_id: int, sha1: str, temppath: Path
+) -> Path:
+    """Download a librarian file to a new temporary file in `temppath`.
+
+    This runs on a worker thread, so it must not use the database.  The
+    file's SHA-1 checksum is verified as it is streamed.
+
+    :return: The path to the temporary file, ready to be renamed into the
+        pool.
+    """
+    fd, name = tempfile.mkstemp(prefix="temp-download.", dir=str(temppath))
+    tempname = Path(name)
+    try:
+        the_hash = hashlib.sha1()  # nosec B324
+        with os.fdopen(fd, "wb") as to_file:
+            from_file = client.getFileByDownloadURL(url, alias_id)
+            try:
+                for chunk in filechunks(from_file):
+                    the_hash.update(chunk)
+                    to_file.write(chunk)
+            finally:
+                from_file.close()
+        if the_hash.hexdigest() != sha1:
+            raise DownloadFailed(
+                "SHA-1 mismatch for LibraryFileAlias %d: expected %s, got %s"
+                % (alias_id, sha1, the_hash.hexdigest())
+            )
+        tempname.chmod(0o644)
+    except BaseException:
+        if tempname.exists():
+            tempname.unlink()
+        raise
+    return tempname
+
+
+def discard_prefetched_file(prefetched: Future) -> None:
+    """Remove a prefetched file that will not be added to the pool."""
+    if prefetched.cancel():
+        return
+    try:
+        tempname = prefetched.result()
+    except Exception:
+        # The download failed and has already cleaned up after itself.
+        return
+    if tempname.exists():
+        tempname.unlink()
+
+
 class FileAddActionEnum:
     """Possible actions taken when adding a file.
 
@@ -246,8 +303,14 @@ def file_hash(self) -> str:
         targetpath = self.pathFor(self.file_component)
         return sha1_from_path(str(targetpath))
 
-    def addFile(self, component: str):
-        """See DiskPool.addFile."""
+    def addFile(self, component: str, prefetched: Optional[Future] = None):
+        """See DiskPool.addFile.
+
+        :param prefetched: If not None, a `Future` for a temporary file
+            holding this file's contents, as started by
+            `DiskPool.prefetchFiles`.  This is used instead of downloading
+            the file again, unless prefetching it failed.
+        """
         assert component in HARDCODED_COMPONENT_ORDER
 
         targetpath = self.pathFor(component)
@@ -255,6 +318,8 @@ def addFile(self, component: str):
         lfa = self.pub_file.libraryfile
 
         if self.file_component:
+            if prefetched is not None:
+                discard_prefetched_file(prefetched)
             # There's something on disk. Check hash.
             sha1 = lfa.content.sha1
             if sha1 != self.file_hash:
@@ -287,6 +352,21 @@ def addFile(self, component: str):
             % (component, self.source_name, lfa.filename)
         )
 
+        if prefetched is not None:
+            try:
+                tempname = prefetched.result()
+            except Exception as e:
+                self.debug(
+                    "Prefetching %s failed (%s); downloading it again"
+                    % (lfa.filename, e)
+                )
+            else:
+                # Note that this will fail if the target and the temp dirs
+                # are on different filesystems.
+                tempname.rename(targetpath)
+                self.file_component = component
+                return FileAddActionEnum.FILE_ADDED
+
         file_to_write = _diskpool_atomicfile(
             targetpath, "wb", rootpath=self.temppath
         )
@@ -480,6 +560,8 @@ def __init__(
         self.rootpath = Path(rootpath)
         self.temppath = Path(temppath) if temppath is not None else None
         self.logger = logger
+        self._prefetched = {}
+        self._prefetch_executor = None
 
     def _getEntry(
         self,
@@ -554,7 +636,65 @@ def addFile(
         results.NONE will be returned and nothing will be done.
         """
         entry = self._getEntry(source_name, source_version, pub_file)
-        return entry.addFile(component)
+        return entry.addFile(
+            component,
+            prefetched=self._prefetched.pop(pub_file.libraryfile.id, None),
+        )
+
+    def prefetchFiles(self, files) -> None:
+        """Start downloading files that are about to be added to the pool.
+
+        If `config.archivepublisher.pool_download_threads` is greater than
+        1, any of `files` that are not already in the pool for any
+        component are downloaded from the librarian into `temppath` on a
+        pool of that many threads, so that `addFile` only has to move them
+        into place.  Otherwise, this does nothing.
+
+        Call `discardPrefetchedFiles` once the corresponding calls to
+        `addFile` have been made.
+
+        :param files: An iterable of (component, source_name,
+            source_version, pub_file) tuples, as will later be passed to
+            `addFile`.
+        """
+        threads = config.archivepublisher.pool_download_threads
+        if threads is None or threads <= 1 or self.temppath is None:
+            return
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="pool-download"
+            )
+        for _, source_name, source_version, pub_file in files:
+            lfa = pub_file.libraryfile
+            if lfa.id in self._prefetched:
+                continue
+            entry = self._getEntry(source_name, source_version, pub_file)
+            if entry.file_component is not None:
+                continue
+            # Look up everything that needs the database here, since the
+            # download itself happens on another thread.
+            client = lfa.client
+            url = client.getDownloadURLForAlias(lfa.id)
+            if url is None:
+                continue
+            self._prefetched[lfa.id] = self._prefetch_executor.submit(
+                download_to_temporary_file,
+                client,
+                url,
+                lfa.id,
+                lfa.content.sha1,
+                self.temppath,
+            )
+
+    def discardPrefetchedFiles(self) -> None:
+        """Discard any prefetched files that were not added to the pool."""
+        prefetched = self._prefetched
+        self._prefetched = {}
+        for future in prefetched.values():
+            discard_prefetched_file(future)
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown()
+            self._prefetch_executor = None
 
     def removeFile(
         self,
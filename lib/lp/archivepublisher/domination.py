@@ -58,7 +58,8 @@
 from operator import attrgetter, itemgetter
 
 import apt_pkg
-from storm.expr import And, Cast, Count, Desc, Not, Select
+from storm.expr import And, Cast, Count, Desc, Join, Not, Select
+from storm.info import ClassAlias
 from zope.component import getUtility
 
 from lp.registry.model.sourcepackagename import SourcePackageName
@@ -76,6 +77,7 @@
 from lp.soyuz.enums import BinaryPackageFormat, PackagePublishingStatus
 from lp.soyuz.interfaces.publishing import (
     IPublishingSet,
+    active_publishing_status,
     inactive_publishing_status,
 )
 from lp.soyuz.model.binarypackagebuild import BinaryPackageBuild
@@ -671,6 +673,188 @@ def findBinariesForDomination(self, distroarchseries, pocket):
         load_related(BinaryPackageName, bpphs, ["binarypackagename_id"])
         return bpphs
 
+    def _findOtherBinaryPublications(self, distroseries, pubs):
+        """Find the other publications of some binary publications.
+
+        This is a bulk version of
+        `IBinaryPackagePublishingHistory.getOtherPublications`, for use
+        when superseding many architecture-independent publications at
+        once.
+
+        :param distroseries: The `DistroSeries` that `pubs` are in.
+        :param pubs: An iterable of `BinaryPackagePublishingHistory`.
+        :return: A dict mapping the ID of each publication in `pubs` to a
+            list of the active publications in `distroseries` of the same
+            binary package release with the same overrides, including the
+            publication itself.
+        """
+        pub_ids = [pub.id for pub in pubs]
+        if not pub_ids:
+            return {}
+        BPPH = BinaryPackagePublishingHistory
+        other = ClassAlias(BPPH)
+        rows = IStore(BPPH).find(
+            (BPPH.id, other),
+            BPPH.id.is_in(pub_ids),
+            other.status.is_in(active_publishing_status),
+            other.distroarchseries_id.is_in(
+                [das.id for das in distroseries.architectures]
+            ),
+            other.binarypackagerelease_id == BPPH.binarypackagerelease_id,
+            other.archive_id == BPPH.archive_id,
+            other.pocket == BPPH.pocket,
+            other.component_id == BPPH.component_id,
+            other.section_id == BPPH.section_id,
+            other.priority == BPPH.priority,
+            Not(
+                IsDistinctFrom(
+                    other.phased_update_percentage,
+                    BPPH.phased_update_percentage,
+                )
+            ),
+        )
+        others = defaultdict(list)
+        for pub_id, dominated in rows:
+            others[pub_id].append(dominated)
+        return others
+
+    def _findCorrespondingDDEBIDs(self, pub_ids):
+        """Find the debug publications corresponding to some publications.
+
+        This is a bulk version of
+        `IPublishingSet.findCorrespondingDDEBPublications` that also says
+        which publication each debug publication belongs to.
+
+        :param pub_ids: A list of `BinaryPackagePublishingHistory` IDs.
+        :return: A list of (publication ID, debug publication ID) pairs.
+        """
+        if not pub_ids:
+            return []
+        deb_bpph = BinaryPackagePublishingHistory
+        debug_bpph = ClassAlias(BinaryPackagePublishingHistory)
+        origin = [
+            deb_bpph,
+            Join(
+                BinaryPackageRelease,
+                deb_bpph.binarypackagerelease_id == BinaryPackageRelease.id,
+            ),
+            Join(
+                debug_bpph,
+                debug_bpph.binarypackagerelease_id
+                == BinaryPackageRelease.debug_package_id,
+            ),
+        ]
+        return list(
+            IStore(deb_bpph)
+            .using(*origin)
+            .find(
+                (deb_bpph.id, debug_bpph.id),
+                deb_bpph.id.is_in(pub_ids),
+                debug_bpph.status.is_in(active_publishing_status),
+                deb_bpph.archive_id == debug_bpph.archive_id,
+                deb_bpph.distroarchseries_id == debug_bpph.distroarchseries_id,
+                deb_bpph.pocket == debug_bpph.pocket,
+                deb_bpph.component_id == debug_bpph.component_id,
+                deb_bpph.section_id == debug_bpph.section_id,
+                deb_bpph.priority == debug_bpph.priority,
+                Not(
+                    IsDistinctFrom(
+                        deb_bpph.phased_update_percentage,
+                        debug_bpph.phased_update_percentage,
+                    )
+                ),
+            )
+        )
+
+    def _supersedeBinaries(self, distroseries, supersede, keep):
+        """Execute a binary domination plan's supersessions in bulk.
+
+        This has the same effect as calling
+        `IBinaryPackagePublishingHistory.supersede` on each publication in
+        `supersede` in turn, and on each of the other publications of
+        architecture-independent ones that are not in `keep`, but it
+        issues one UPDATE per dominant build rather than one per
+        publication.  As with calling `supersede` in turn, a publication
+        that would be superseded more than once is superseded by the first
+        dominant in the plan.
+
+        :param distroseries: The `DistroSeries` being dominated.
+        :param supersede: A list of (superseded publication, dominant
+            publication) pairs, as returned by `planPackageDomination`.
+        :param keep: A set of publications that must not be superseded
+            along with other publications of the same binary.
+        :return: A set of the IDs of all the publications that were
+            superseded.
+        """
+        BPPH = BinaryPackagePublishingHistory
+        keep_ids = {pub.id for pub in keep}
+        others = self._findOtherBinaryPublications(
+            distroseries,
+            [pub for pub, _ in supersede if not pub.architecture_specific],
+        )
+
+        # If this is architecture-independent, all publications with the
+        # same context and overrides should be dominated simultaneously,
+        # unless one of the plans decided to keep it.  For this reason, an
+        # architecture's plan can't be executed until all architectures
+        # have been planned.
+        dominants = {}
+        for pub, dominant in supersede:
+            dominants.setdefault(pub.id, dominant)
+            for dominated in others.get(pub.id, []):
+                if dominated.id not in keep_ids:
+                    dominants.setdefault(dominated.id, dominant)
+        debug_ids = defaultdict(list)
+        for pub_id, debug_id in self._findCorrespondingDDEBIDs(
+            list(dominants)
+        ):
+            debug_ids[pub_id].append(debug_id)
+        for pub_id, dominant in list(dominants.items()):
+            for debug_id in debug_ids[pub_id]:
+                dominants.setdefault(debug_id, dominant)
+
+        bprs = load_related(
+            BinaryPackageRelease,
+            set(dominants.values()),
+            ["binarypackagerelease_id"],
+        )
+        load_related(BinaryPackageBuild, bprs, ["build_id"])
+        ids_by_dominant = defaultdict(list)
+        for pub_id, dominant in dominants.items():
+            ids_by_dominant[dominant].append(pub_id)
+        ids_by_build = defaultdict(list)
+        for dominant, pub_ids in ids_by_dominant.items():
+            # DDEBs cannot themselves be dominant; they are always dominated
+            # by their corresponding DEB.
+            assert (
+                not dominant.is_debug
+            ), "Should not dominate with %s (%s); DDEBs cannot dominate" % (
+                dominant.binarypackagerelease.title,
+                dominant.distroarchseries.architecturetag,
+            )
+            # Binary package releases are superseded by the new build, not
+            # the new binary package release.  CI builds can't be recorded
+            # in supersededby, so leave it unset for those.
+            dominant_build = dominant.binarypackagerelease.build
+            self.logger.debug2(
+                "%d publication(s) judged as superseded by %s.",
+                len(pub_ids),
+                dominant.binarypackagerelease.title,
+            )
+            ids_by_build[
+                None if dominant_build is None else dominant_build.id
+            ].extend(pub_ids)
+
+        for build_id, pub_ids in ids_by_build.items():
+            changes = {
+                "status": PackagePublishingStatus.SUPERSEDED,
+                "datesuperseded": UTC_NOW,
+            }
+            if build_id is not None:
+                changes["supersededby_id"] = build_id
+            IStore(BPPH).find(BPPH, BPPH.id.is_in(pub_ids)).set(**changes)
+        return set(dominants)
+
     def dominateBinaries(self, distroseries, pocket):
         """Perform domination on binary package publications.
 
@@ -703,27 +887,21 @@ def plan(pubs, live_versions):
             delete.extend(cur_delete)
 
         def execute_plan():
+            dominated_ids = set()
             if supersede:
                 self.logger.info("Superseding binaries...")
-            for pub, dominant in supersede:
-                pub.supersede(dominant, logger=self.logger)
-                IStore(pub).flush()
-                # If this is architecture-independent, all publications with
-                # the same context and overrides should be dominated
-                # simultaneously, unless one of the plans decided to keep
-                # it.  For this reason, an architecture's plan can't be
-                # executed until all architectures have been planned.
-                if not pub.architecture_specific:
-                    for dominated in pub.getOtherPublications():
-                        if dominated != pub and dominated not in keep:
-                            dominated.supersede(dominant, logger=self.logger)
-                            IStore(dominated).flush()
+                dominated_ids.update(
+                    self._supersedeBinaries(distroseries, supersede, keep)
+                )
             if delete:
                 self.logger.info("Deleting binaries...")
-            for pub in delete:
-                pub.requestDeletion(None)
-                IStore(pub).flush()
+                getUtility(IPublishingSet).requestDeletion(delete, None)
+                dominated_ids.update(pub.id for pub in delete)
+            return dominated_ids
 
+        # Sorted candidate publications for each architecture, as found in
+        # the first pass.
+        candidates = {}
         for distroarchseries in distroseries.architectures:
             self.logger.info(
                 "Performing domination across %s/%s (%s)",
@@ -735,6 +913,7 @@ def execute_plan():
             self.logger.info("Finding binaries...")
             bins = self.findBinariesForDomination(distroarchseries, pocket)
             sorted_packages = self._sortPackages(bins, generalization)
+            candidates[distroarchseries] = sorted_packages
             self.logger.info("Planning domination of binaries...")
             for (name, location), pubs in sorted_packages.items():
                 self.logger.debug(
@@ -746,7 +925,7 @@ def execute_plan():
                 if contains_arch_indep(pubs):
                     packages_w_arch_indep.add((name, location))
 
-        execute_plan()
+        dominated_ids = execute_plan()
 
         packages_w_arch_indep = frozenset(packages_w_arch_indep)
         supersede = []
@@ -760,20 +939,27 @@ def execute_plan():
         # (In maintaining this code, bear in mind that some or all of a
         # source package's binary packages may switch between
         # arch-specific and arch-indep between releases.)
+        # Rather than finding binaries all over again, this starts from
+        # the first pass's candidates, less those that the first pass
+        # dominated.  Like `findBinariesForDomination`, it ignores
+        # publications that no longer have any others competing with them.
         reprieve_cache = ArchSpecificPublicationsCache()
         for distroarchseries in distroseries.architectures:
-            self.logger.info("Finding binaries...(2nd pass)")
-            bins = self.findBinariesForDomination(distroarchseries, pocket)
-            sorted_packages = self._sortPackages(bins, generalization)
             self.logger.info("Planning domination of binaries...(2nd pass)")
+            sorted_packages = candidates[distroarchseries]
             for name, location in packages_w_arch_indep.intersection(
                 sorted_packages
             ):
-                pubs = sorted_packages[(name, location)]
+                pubs = [
+                    pub
+                    for pub in sorted_packages[(name, location)]
+                    if pub.id not in dominated_ids
+                ]
+                if len(pubs) < 2:
+                    continue
                 self.logger.debug(
                     "Planning domination of %s in %s" % (name, location)
                 )
-                assert len(pubs) > 0, "Dominating zero binaries in 2nd pass!"
                 live_versions = find_live_binary_versions_pass_2(
                     pubs, reprieve_cache
                 )
@@ -19,6 +19,7 @@
 import re
 import shutil
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from functools import partial
 from itertools import chain, groupby
@@ -33,7 +34,9 @@
 
 from lp.app.interfaces.launchpad import ILaunchpadCelebrities
 from lp.archivepublisher import HARDCODED_COMPONENT_ORDER
+from lp.archivepublisher.checksumcache import ChecksumCache, checksum_file
 from lp.archivepublisher.config import getPubConfig
+from lp.archivepublisher.diskpool import DiskPool
 from lp.archivepublisher.domination import Dominator
 from lp.archivepublisher.indices import (
     build_binary_stanza_fields,
@@ -44,10 +47,12 @@
     ISignableArchive,
 )
 from lp.archivepublisher.model.ftparchive import FTPArchiveHandler
+from lp.archivepublisher.stanzacache import StanzaCache
 from lp.archivepublisher.utils import RepositoryIndexFile, get_ppa_reference
 from lp.registry.interfaces.pocket import PackagePublishingPocket, pocketsuffix
 from lp.registry.interfaces.series import SeriesStatus
 from lp.registry.model.distroseries import DistroSeries
+from lp.services.config import config
 from lp.services.database.bulk import load
 from lp.services.database.constants import UTC_NOW
 from lp.services.database.interfaces import IStore
@@ -61,6 +66,7 @@
     ArchivePurpose,
     ArchiveStatus,
     BinaryPackageFormat,
+    IndexCompressionType,
     PackagePublishingStatus,
 )
 from lp.soyuz.interfaces.archive import NoSuchPPA
@@ -181,6 +187,88 @@ def cannot_modify_suite(archive, distroseries, pocket):
     )
 
 
+def render_stanza(stanza):
+    """Return the bytes to write to an index file for a single stanza.
+
+    :param stanza: An `IndexStanzaFields`, or the bytes previously
+        returned by this function for a stanza.
+    """
+    if isinstance(stanza, bytes):
+        return stanza
+    return stanza.makeOutput().encode("utf-8") + b"\n\n"
+
+
+def write_index_stanzas(path, temp_root, compressor_names, stanzas):
+    """Write a complete index file from a sequence of stanzas.
+
+    This is a module-level function so that it can be run in a worker
+    process; it takes only picklable arguments and does not touch the
+    database.
+
+    :param path: The final path of the uncompressed index file.
+    :param temp_root: The temporary directory to use while writing.
+    :param compressor_names: A list of `IndexCompressionType` item names.
+    :param stanzas: A sequence of stanzas as accepted by `render_stanza`.
+    :return: The `RepositoryIndexFile.checksums` of the written index.
+    """
+    compressors = [
+        IndexCompressionType.items[name] for name in compressor_names
+    ]
+    with RepositoryIndexFile(path, temp_root, compressors) as index:
+        for stanza in stanzas:
+            index.write(render_stanza(stanza))
+    return index.checksums
+
+
+class IndexStanzaWriter:
+    """Format and write index stanzas as they are produced."""
+
+    def __init__(self, path, temp_root, compressors, record_checksums):
+        self.index = RepositoryIndexFile(path, temp_root, compressors)
+        self.record_checksums = record_checksums
+
+    def add(self, stanza):
+        self.index.write(render_stanza(stanza))
+
+    def close(self):
+        self.index.close()
+        self.record_checksums(self.index.checksums)
+
+
+class DeferredIndexStanzaWriter:
+    """Collect index stanzas to be formatted and written by a worker.
+
+    Stanza fields are gathered in the publisher process (which is the only
+    one with database access), and formatting plus compression happen in
+    `write_index_stanzas` in a worker process once the index is closed.
+    Stanzas that have already been rendered (e.g. from a `StanzaCache`)
+    are passed through unchanged.
+    """
+
+    def __init__(self, executor, futures, path, temp_root, compressors):
+        self.executor = executor
+        self.futures = futures
+        self.path = path
+        self.temp_root = temp_root
+        self.compressor_names = [compressor.name for compressor in compressors]
+        self.stanzas = []
+
+    def add(self, stanza):
+        self.stanzas.append(stanza)
+
+    def close(self):
+        self.futures.append(
+            self.executor.submit(
+                write_index_stanzas,
+                self.path,
+                self.temp_root,
+                self.compressor_names,
+                self.stanzas,
+            )
+        )
+        self.stanzas = None
+
+
 class I18nIndex(_multivalued):
     """Represents an i18n/Index file."""
 
@@ -268,10 +356,12 @@ class SHA256ArchiveHash:
 class ByHash:
     """Represents a single by-hash directory tree."""
 
-    def __init__(self, root, key, log):
+    def __init__(self, root, key, log, checksum_cache=None):
         self.root = root
+        self.key = key
         self.path = os.path.join(root, key, "by-hash")
         self.log = log
+        self.checksum_cache = checksum_cache
         self.known_digests = defaultdict(lambda: defaultdict(set))
 
     @property
@@ -290,10 +380,22 @@ def add(self, name, lfa, copy_from_path=None):
         :param copy_from_path: If not None, copy file content from here
             rather than fetching it from the librarian.  This can be used
             for newly-added files to avoid needing to commit the transaction
-            before calling this method.
+            before calling this method.  Otherwise, if the checksum cache
+            shows that the file currently on disk under `name` has the
+            right content, then it is linked rather than fetched.
         """
         best_hash = self._usable_archive_hashes[-1]
         best_digest = getattr(lfa.content, best_hash.lfc_name)
+        if copy_from_path is None and self.checksum_cache is not None:
+            current_path = os.path.join(self.key, name)
+            checksums = self.checksum_cache.get(
+                os.path.join(self.root, current_path)
+            )
+            if (
+                checksums is not None
+                and checksums[best_hash.lfc_name] == best_digest
+            ):
+                copy_from_path = current_path
         for archive_hash in reversed(self._usable_archive_hashes):
             digest = getattr(lfa.content, archive_hash.lfc_name)
             digest_path = os.path.join(
@@ -361,9 +463,10 @@ def prune(self):
 class ByHashes:
     """Represents all by-hash directory trees in an archive."""
 
-    def __init__(self, root, log):
+    def __init__(self, root, log, checksum_cache=None):
         self.root = root
         self.log = log
+        self.checksum_cache = checksum_cache
         self.children = {}
 
     def registerChild(self, dirpath):
@@ -373,7 +476,12 @@ def registerChild(self, dirpath):
         the `prune` method.
         """
         if dirpath not in self.children:
-            self.children[dirpath] = ByHash(self.root, dirpath, self.log)
+            self.children[dirpath] = ByHash(
+                self.root,
+                dirpath,
+                self.log,
+                checksum_cache=self.checksum_cache,
+            )
         return self.children[dirpath]
 
     def add(self, path, lfa, copy_from_path=None):
@@ -434,6 +542,21 @@ def __init__(
         # This is a set of suite names as returned by DistroSeries.getSuite.
         self.release_files_needed = set()
 
+        # If index generation is running in worker processes, this is the
+        # executor used to run them and the list of outstanding futures.
+        self._index_executor = None
+        self._index_futures = []
+
+        # Checksums of index files written during this run, so that we
+        # don't need to read them back when writing Release files.  This
+        # maps normalised paths to tuples of (stat signature, checksums);
+        # see `_recordIndexChecksums`.
+        self._index_checksums = {}
+
+        # The persistent `ChecksumCache` for this archive, if enabled; see
+        # `_getChecksumCache`.
+        self._checksum_cache = None
+
     def setupArchiveDirs(self):
         self.log.debug("Setting up archive directories.")
         self._config.setupArchiveDirs()
@@ -529,14 +652,44 @@ def getPendingSourcePublications(self, is_careful):
             Desc(SourcePackagePublishingHistory.id),
         )
 
+    def _prefetchPoolFiles(self, pubs):
+        """Start downloading new pool files for some publications.
+
+        This only does anything for on-disk pools, and only if
+        `config.archivepublisher.pool_download_threads` is greater than 1.
+        """
+        threads = config.archivepublisher.pool_download_threads
+        if threads is None or threads <= 1:
+            return
+        if not isinstance(self._diskpool, DiskPool):
+            return
+        files = []
+        for pub in pubs:
+            component = None if pub.component is None else pub.component.name
+            for pub_file in pub.files:
+                files.append(
+                    (component, pub.pool_name, pub.pool_version, pub_file)
+                )
+        self._diskpool.prefetchFiles(files)
+
+    def _discardPrefetchedPoolFiles(self):
+        """Clean up after `_prefetchPoolFiles`."""
+        if isinstance(self._diskpool, DiskPool):
+            self._diskpool.discardPrefetchedFiles()
+
     def publishSources(self, distroseries, pocket, spphs):
         """Publish sources for a given distroseries and pocket."""
         self.log.debug(
             "* Publishing pending sources for %s"
             % distroseries.getSuite(pocket)
         )
-        for spph in spphs:
-            spph.publish(self._diskpool, self.log)
+        spphs = list(spphs)
+        self._prefetchPoolFiles(spphs)
+        try:
+            for spph in spphs:
+                spph.publish(self._diskpool, self.log)
+        finally:
+            self._discardPrefetchedPoolFiles()
 
     def findAndPublishSources(self, is_careful=False):
         """Search for and publish all pending sources.
@@ -603,8 +756,17 @@ def publishBinaries(self, distroarchseries, pocket, bpphs):
                 distroarchseries.architecturetag,
             )
         )
-        for bpph in bpphs:
-            bpph.publish(self._diskpool, self.log)
+        bpphs = list(bpphs)
+        self._prefetchPoolFiles(
+            bpph
+            for bpph in bpphs
+            if not bpph.is_debug or self.archive.publish_debug_symbols
+        )
+        try:
+            for bpph in bpphs:
+                bpph.publish(self._diskpool, self.log)
+        finally:
+            self._discardPrefetchedPoolFiles()
 
     def findAndPublishBinaries(self, is_careful=False):
         """Search for and publish all pending binaries.
@@ -846,24 +1008,119 @@ def C_writeIndexes(self, is_careful):
         Iterates over all distroseries and its pockets and components.
         """
         self.log.debug("* Step C': write indexes directly from DB")
-        for distroseries in self.distro:
-            for pocket in self.archive.getPockets():
-                if not is_careful:
-                    if not self.isDirty(distroseries, pocket):
-                        self.log.debug(
-                            "Skipping index generation for %s/%s"
-                            % (distroseries.name, pocket.name)
+        index_workers = config.archivepublisher.index_workers
+        if index_workers is not None and index_workers > 1:
+            self.log.debug(
+                "Writing indexes using %d worker processes" % index_workers
+            )
+            self._index_executor = ProcessPoolExecutor(
+                max_workers=index_workers
+            )
+        try:
+            for distroseries in self.distro:
+                for pocket in self.archive.getPockets():
+                    if not is_careful:
+                        if not self.isDirty(distroseries, pocket):
+                            self.log.debug(
+                                "Skipping index generation for %s/%s"
+                                % (distroseries.name, pocket.name)
+                            )
+                            continue
+                        self.checkDirtySuiteBeforePublishing(
+                            distroseries, pocket
                         )
-                        continue
-                    self.checkDirtySuiteBeforePublishing(distroseries, pocket)
 
-                self.release_files_needed.add(distroseries.getSuite(pocket))
+                    self.release_files_needed.add(
+                        distroseries.getSuite(pocket)
+                    )
 
-                components = self.archive.getComponentsForSeries(distroseries)
-                for component in components:
-                    self._writeComponentIndexes(
-                        distroseries, pocket, component
+                    components = self.archive.getComponentsForSeries(
+                        distroseries
                     )
+                    for component in components:
+                        self._writeComponentIndexes(
+                            distroseries, pocket, component, is_careful
+                        )
+            self._waitForIndexWriters()
+        finally:
+            if self._index_executor is not None:
+                self._index_executor.shutdown()
+                self._index_executor = None
+                self._index_futures = []
+
+    def _openIndexWriter(self, path, compressors):
+        """Return an object to which index stanzas can be added.
+
+        If worker processes are in use, the returned writer defers
+        formatting and compression to a worker when it is closed;
+        otherwise, it writes each stanza immediately.
+        """
+        if self._index_executor is not None:
+            return DeferredIndexStanzaWriter(
+                self._index_executor,
+                self._index_futures,
+                path,
+                self._config.temproot,
+                compressors,
+            )
+        else:
+            return IndexStanzaWriter(
+                path,
+                self._config.temproot,
+                compressors,
+                self._recordIndexChecksums,
+            )
+
+    def _waitForIndexWriters(self):
+        """Wait for any index files being written by worker processes.
+
+        Exceptions raised by workers are re-raised here.
+        """
+        futures = self._index_futures
+        self._index_futures = []
+        for future in futures:
+            self._recordIndexChecksums(future.result())
+
+    def _statIndexVariants(self, path):
+        """Return a signature of the on-disk variants of an index file.
+
+        This identifies the state of the uncompressed and compressed files
+        that `_readIndexFileHashes` might read for `path`, so that we can
+        tell whether they have changed since we recorded their checksums.
+        """
+        signature = []
+        for variant in sorted(get_suffixed_indices(remove_suffix(path))):
+            try:
+                st = os.stat(variant)
+            except FileNotFoundError:
+                continue
+            signature.append((variant, st.st_size, st.st_mtime_ns))
+        return tuple(signature)
+
+    def _recordIndexChecksums(self, checksums):
+        """Remember checksums computed while writing index files.
+
+        :param checksums: A dictionary as returned by
+            `RepositoryIndexFile.checksums`.
+        """
+        for path, file_checksums in checksums.items():
+            path = os.path.normpath(path)
+            self._index_checksums[path] = (
+                self._statIndexVariants(path),
+                file_checksums,
+            )
+
+    def _getRecordedIndexChecksums(self, path):
+        """Return recorded checksums for an index file, if still valid."""
+        path = os.path.normpath(path)
+        recorded = self._index_checksums.get(path)
+        if recorded is None:
+            return None
+        signature, checksums = recorded
+        if signature != self._statIndexVariants(path):
+            del self._index_checksums[path]
+            return None
+        return checksums
 
     def C_updateArtifactoryProperties(self, is_careful):
         """Update Artifactory properties to match our database."""
@@ -1073,6 +1330,10 @@ def D_writeReleaseFiles(self, is_careful):
                     }
                     self._updateByHash(suite, "Release", extra_by_hash_files)
 
+        if self._checksum_cache is not None:
+            self._checksum_cache.save()
+            self._checksum_cache = None
+
     def _allIndexFiles(self, distroseries):
         """Return all index files on disk for a distroseries.
 
@@ -1163,13 +1424,65 @@ def createSeriesAliases(self):
                     pass
                 os.symlink(current_suite, alias_suite_path)
 
-    def _writeComponentIndexes(self, distroseries, pocket, component):
+    def _getChecksumCache(self):
+        """Return the `ChecksumCache` for this archive, if enabled.
+
+        Like stanza caches, the checksum cache is stored under the archive's
+        cache root.  It is loaded on first use, and saved at the end of
+        `D_writeReleaseFiles`.
+        """
+        if (
+            not config.archivepublisher.checksum_cache
+            or self._config.cacheroot is None
+        ):
+            return None
+        if self._checksum_cache is None:
+            self._checksum_cache = ChecksumCache(
+                os.path.join(self._config.cacheroot, "checksums"), self.log
+            )
+        return self._checksum_cache
+
+    def _getStanzaCache(
+        self, suite_name, component, index_name, fingerprint, is_careful
+    ):
+        """Return a `StanzaCache` for a group of indexes, if enabled.
+
+        Stanza caches are stored under the archive's cache root, which only
+        exists for archives that are published using apt-ftparchive-style
+        directory layouts (the primary and partner archives).  A careful
+        run ignores existing caches, but still writes fresh ones.
+        """
+        if (
+            not config.archivepublisher.incremental_indexes
+            or self._config.cacheroot is None
+        ):
+            return None
+        return StanzaCache(
+            os.path.join(
+                self._config.cacheroot,
+                "stanzas",
+                suite_name,
+                component.name,
+                index_name,
+            ),
+            fingerprint,
+            self.log,
+            use_existing=not is_careful,
+        )
+
+    def _writeComponentIndexes(
+        self, distroseries, pocket, component, is_careful=False
+    ):
         """Write Index files for single distroseries + pocket + component.
 
         Iterates over all supported architectures and 'sources', no
         support for installer-* yet.
         Write contents using LP info to an extra plain file (Packages.lp
         and Sources.lp .
+
+        If incremental index generation is enabled, stanzas for
+        publications seen by previous runs are taken from a `StanzaCache`
+        rather than being rebuilt from the database.
         """
         suite_name = distroseries.getSuite(pocket)
         self.log.debug(
@@ -1186,7 +1499,7 @@ def _writeComponentIndexes(self, distroseries, pocket, component):
             # descriptions from the Packages.
             separate_long_descriptions = True
             packages = set()
-            translation_en = RepositoryIndexFile(
+            translation_en = self._openIndexWriter(
                 os.path.join(
                     self._config.distsroot,
                     suite_name,
@@ -1194,28 +1507,45 @@ def _writeComponentIndexes(self, distroseries, pocket, component):
                     "i18n",
                     "Translation-en",
                 ),
-                self._config.temproot,
                 distroseries.index_compressors,
             )
 
-        source_index = RepositoryIndexFile(
+        source_index = self._openIndexWriter(
             get_sources_path(self._config, suite_name, component),
-            self._config.temproot,
             distroseries.index_compressors,
         )
 
+        source_cache = self._getStanzaCache(
+            suite_name, component, "source", None, is_careful
+        )
+
+        def build_source_entry(spp):
+            stanza = build_source_stanza_fields(
+                spp.sourcepackagerelease, spp.component, spp.section
+            )
+            return stanza if source_cache is None else render_stanza(stanza)
+
         for spp in getUtility(IPublishingSet).getSourcesForPublishing(
             archive=self.archive,
             distroseries=distroseries,
             pocket=pocket,
             component=component,
+            skip_preload_ids=(
+                None if source_cache is None else source_cache.cached_ids
+            ),
         ):
-            stanza = build_source_stanza_fields(
-                spp.sourcepackagerelease, spp.component, spp.section
-            )
-            source_index.write(stanza.makeOutput().encode("utf-8") + b"\n\n")
+            if source_cache is None:
+                source_index.add(build_source_entry(spp))
+            else:
+                source_index.add(
+                    source_cache.lookup(
+                        spp.id, partial(build_source_entry, spp)
+                    )
+                )
 
         source_index.close()
+        if source_cache is not None:
+            source_cache.save()
 
         for arch in distroseries.architectures:
             if not arch.enabled:
@@ -1226,63 +1556,90 @@ def _writeComponentIndexes(self, distroseries, pocket, component):
             self.log.debug("Generating Packages for %s" % arch_path)
 
             indices = {}
-            indices[None] = RepositoryIndexFile(
+            indices[None] = self._openIndexWriter(
                 get_packages_path(self._config, suite_name, component, arch),
-                self._config.temproot,
                 distroseries.index_compressors,
             )
 
             for subcomp in self.subcomponents:
-                indices[subcomp] = RepositoryIndexFile(
+                indices[subcomp] = self._openIndexWriter(
                     get_packages_path(
                         self._config, suite_name, component, arch, subcomp
                     ),
-                    self._config.temproot,
                     distroseries.index_compressors,
                 )
 
+            binary_cache = self._getStanzaCache(
+                suite_name,
+                component,
+                arch_path,
+                separate_long_descriptions,
+                is_careful,
+            )
+
+            def build_binary_entry(bpp):
+                # Return (subcomponent, Packages stanza, Translation-en
+                # key, Translation-en stanza).  The translation stanza is
+                # built unconditionally here, since whether it is written
+                # depends on what else is in this run's Translation-en.
+                bpr = bpp.binarypackagerelease
+                subcomp = FORMAT_TO_SUBCOMPONENT.get(bpr.binpackageformat)
+                stanza = build_binary_stanza_fields(
+                    bpr,
+                    bpp.component,
+                    bpp.section,
+                    bpp.priority,
+                    bpp.phased_update_percentage,
+                    separate_long_descriptions,
+                )
+                translation_key = translation_stanza = None
+                if separate_long_descriptions:
+                    translation_stanza = build_translations_stanza_fields(
+                        bpr, set()
+                    )
+                    translation_key = (
+                        bpr.name,
+                        dict(translation_stanza.fields)["Description-md5"],
+                    )
+                if binary_cache is not None:
+                    stanza = render_stanza(stanza)
+                    if translation_stanza is not None:
+                        translation_stanza = render_stanza(translation_stanza)
+                return subcomp, stanza, translation_key, translation_stanza
+
             for bpp in getUtility(IPublishingSet).getBinariesForPublishing(
                 archive=self.archive,
                 distroarchseries=arch,
                 pocket=pocket,
                 component=component,
+                skip_preload_ids=(
+                    None if binary_cache is None else binary_cache.cached_ids
+                ),
             ):
-                subcomp = FORMAT_TO_SUBCOMPONENT.get(
-                    bpp.binarypackagerelease.binpackageformat
-                )
+                if binary_cache is None:
+                    entry = build_binary_entry(bpp)
+                else:
+                    entry = binary_cache.lookup(
+                        bpp.id, partial(build_binary_entry, bpp)
+                    )
+                subcomp, stanza, translation_key, translation_stanza = entry
                 if subcomp not in indices:
                     # Skip anything that we're not generating indices
                     # for, eg. ddebs where publish_debug_symbols is
                     # disabled.
                     continue
-                stanza = build_binary_stanza_fields(
-                    bpp.binarypackagerelease,
-                    bpp.component,
-                    bpp.section,
-                    bpp.priority,
-                    bpp.phased_update_percentage,
-                    separate_long_descriptions,
-                )
-                indices[subcomp].write(
-                    stanza.makeOutput().encode("utf-8") + b"\n\n"
-                )
+                indices[subcomp].add(stanza)
                 if separate_long_descriptions:
-                    # If the (Package, Description-md5) pair already exists
-                    # in the set, build_translations_stanza_fields will
-                    # return None. Otherwise it will add the pair to
-                    # the set and return a stanza to be written to
-                    # Translation-en.
-                    translation_stanza = build_translations_stanza_fields(
-                        bpp.binarypackagerelease, packages
-                    )
-                    if translation_stanza is not None:
-                        translation_en.write(
-                            translation_stanza.makeOutput().encode("utf-8")
-                            + b"\n\n"
-                        )
+                    # Only write the first Translation-en stanza for each
+                    # (Package, Description-md5) pair.
+                    if translation_key not in packages:
+                        packages.add(translation_key)
+                        translation_en.add(translation_stanza)
 
             for index in indices.values():
                 index.close()
+            if binary_cache is not None:
+                binary_cache.save()
 
         if separate_long_descriptions:
             translation_en.close()
@@ -1399,7 +1756,11 @@ def _updateByHash(self, suite, release_file_name, extra_files):
         archive_file_set = getUtility(IArchiveFileSet)
         container = "release:%s" % suite
 
-        by_hashes = ByHashes(self._config.distsroot, self.log)
+        by_hashes = ByHashes(
+            self._config.distsroot,
+            self.log,
+            checksum_cache=self._getChecksumCache(),
+        )
         existing_live_files = {}
         existing_nonlive_files = {}
         reapable_files = set()
@@ -1857,13 +2218,41 @@ def _readIndexFileHashes(
             {"md5sum": {"md5sum": ..., "size": ..., "name": ...}}), or None
             if the file could not be found.
         """
-        open_func = partial(open, mode="rb")
         full_name = os.path.join(
             self._config.distsroot,
             suite,
             subpath or ".",
             real_file_name or file_name,
         )
+        # If we wrote this file during this run, then we already know its
+        # checksums.
+        checksums = self._getRecordedIndexChecksums(full_name)
+        if checksums is None:
+            checksums = self._checksumIndexFile(full_name)
+            if checksums is None:
+                return None
+        return self._makeIndexFileHashes(
+            file_name,
+            checksums["size"],
+            {
+                archive_hash.deb822_name: checksums[archive_hash.lfc_name]
+                for archive_hash in archive_hashes
+            },
+            real_file_name=real_file_name,
+        )
+
+    def _checksumIndexFile(self, full_name):
+        """Read an index file from disk and return its checksums.
+
+        If `full_name` does not exist, then this reads the uncompressed
+        contents of a compressed variant of it instead.  If the checksum
+        cache is enabled, files that have not changed since they were last
+        read are not read again.
+
+        :return: A dictionary as returned by `HashingFile.checksums`, or
+            None if the file could not be found.
+        """
+        open_func = None
         if not os.path.exists(full_name):
             if os.path.exists(full_name + ".gz"):
                 open_func = gzip.open
@@ -1881,19 +2270,25 @@ def _readIndexFileHashes(
                 self.log.debug("Failed to find " + full_name)
                 return None
 
-        hashes = {
-            archive_hash.deb822_name: archive_hash.hash_factory()
-            for archive_hash in archive_hashes
-        }
-        size = 0
-        with open_func(full_name) as in_file:
-            for chunk in iter(lambda: in_file.read(256 * 1024), b""):
-                for hashobj in hashes.values():
-                    hashobj.update(chunk)
-                size += len(chunk)
+        checksum_cache = self._getChecksumCache()
+        if checksum_cache is None:
+            return checksum_file(full_name, open_func=open_func)
+        return checksum_cache.lookup(
+            full_name,
+            open_func=open_func,
+            variant=None if open_func is None else "uncompressed",
+        )
+
+    def _makeIndexFileHashes(
+        self, file_name, size, digests, real_file_name=None
+    ):
+        """Build the return value of `_readIndexFileHashes`.
+
+        :param digests: A dictionary mapping hash field names to hex
+            digests.
+        """
         ret = {}
-        for alg, hashobj in hashes.items():
-            digest = hashobj.hexdigest()
+        for alg, digest in digests.items():
             ret[alg] = {alg: digest, "name": file_name, "size": size}
             if real_file_name:
                 ret[alg]["real_name"] = real_file_name
@@ -1989,11 +2384,16 @@ def deleteArchive(self):
 
 
 class DirectoryHash:
-    """Represents a directory hierarchy for hashing."""
+    """Represents a directory hierarchy for hashing.
+
+    If a `ChecksumCache` is given, then files that it already knows about
+    are not read again.
+    """
 
-    def __init__(self, root, tmpdir):
+    def __init__(self, root, tmpdir, checksum_cache=None):
         self.root = root
         self.tmpdir = tmpdir
+        self.checksum_cache = checksum_cache
         self.checksum_hash = []
 
         for usable in self._usable_archive_hashes:
@@ -2025,21 +2425,32 @@ def checksum_paths(self):
 
     def add(self, path):
         """Add a path to be checksummed."""
-        hashes = [
-            (checksum_file, archive_hash.hash_factory())
-            for (_, checksum_file, archive_hash) in self.checksum_hash
-        ]
-        with open(path, "rb") as in_file:
-            for chunk in iter(lambda: in_file.read(256 * 1024), b""):
-                for _, hashobj in hashes:
-                    hashobj.update(chunk)
+        if self.checksum_cache is not None:
+            checksums = self.checksum_cache.lookup(path)
+            digests = [
+                (index_file, checksums[archive_hash.lfc_name])
+                for (_, index_file, archive_hash) in self.checksum_hash
+            ]
+        else:
+            hashes = [
+                (index_file, archive_hash.hash_factory())
+                for (_, index_file, archive_hash) in self.checksum_hash
+            ]
+            with open(path, "rb") as in_file:
+                for chunk in iter(lambda: in_file.read(256 * 1024), b""):
+                    for _, hashobj in hashes:
+                        hashobj.update(chunk)
+            digests = [
+                (index_file, hashobj.hexdigest())
+                for index_file, hashobj in hashes
+            ]
 
-        for checksum_file, hashobj in hashes:
+        for index_file, digest in digests:
             checksum_line = "%s *%s\n" % (
-                hashobj.hexdigest(),
+                digest,
                 path[len(self.root) + 1 :],
             )
-            checksum_file.write(checksum_line.encode("UTF-8"))
+            index_file.write(checksum_line.encode("UTF-8"))
 
     def add_dir(self, path):
         """Recursively add a directory path to be checksummed."""
@@ -2048,5 +2459,5 @@ def add_dir(self, path):
                 self.add(os.path.join(dirpath, filename))
 
     def close(self):
-        for _, checksum_file, _ in self.checksum_hash:
-            checksum_file.close()
+        for _, index_file, _ in self.checksum_hash:
+            index_file.close()
@@ -0,0 +1,103 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Persistent cache of rendered archive index stanzas."""
+
+__all__ = [
+    "StanzaCache",
+]
+
+import os
+import pickle
+
+# Bump this if the structure of cached entries changes, so that caches
+# written by older code are discarded rather than misinterpreted.
+STANZA_CACHE_FORMAT = 1
+
+
+class StanzaCache:
+    """A persistent cache of index stanzas, keyed by publication ID.
+
+    Publishing history rows are effectively immutable as far as index
+    stanzas are concerned: overrides and phasing changes create new rows.
+    This lets the publisher keep the rendered stanzas for one index (or a
+    closely-related group of indexes) from one run to the next, and only
+    build stanzas for publications that it has not seen before.
+
+    Each cache is stored in a single file.  On `save`, only entries that
+    were looked up during this run are written back, so publications that
+    are no longer published drop out of the cache automatically.
+    """
+
+    def __init__(self, path, fingerprint, log, use_existing=True):
+        """Load a stanza cache.
+
+        :param path: The file in which the cache is stored.
+        :param fingerprint: Any picklable value describing settings that
+            affect how stanzas are rendered.  If this does not match the
+            fingerprint of the stored cache, then the stored cache is
+            discarded.
+        :param log: A logger.
+        :param use_existing: If False, ignore any stored cache, but still
+            write out a fresh one on `save`.
+        """
+        self.path = path
+        self.fingerprint = (STANZA_CACHE_FORMAT, fingerprint)
+        self.log = log
+        self.hits = 0
+        self.misses = 0
+        self._old_entries = self._load() if use_existing else {}
+        self._new_entries = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as cache_file:
+                fingerprint, entries = pickle.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.log.warning(
+                "Ignoring unreadable stanza cache %s: %s" % (self.path, e)
+            )
+            return {}
+        if fingerprint != self.fingerprint:
+            self.log.debug("Ignoring outdated stanza cache %s" % self.path)
+            return {}
+        return entries
+
+    @property
+    def cached_ids(self):
+        """The set of publication IDs with stored entries."""
+        return set(self._old_entries)
+
+    def lookup(self, pub_id, build):
+        """Return the entry for a publication, building it if necessary.
+
+        :param pub_id: A publication ID.
+        :param build: A callable returning a new entry for this
+            publication, called only if there is no stored entry.
+        """
+        entry = self._old_entries.get(pub_id)
+        if entry is None:
+            entry = build()
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._new_entries[pub_id] = entry
+        return entry
+
+    def save(self):
+        """Atomically write the entries used during this run to disk."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        new_path = self.path + ".new"
+        with open(new_path, "wb") as cache_file:
+            pickle.dump(
+                (self.fingerprint, self._new_entries),
+                cache_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.rename(new_path, self.path)
+        self.log.debug(
+            "Stanza cache %s: %d hits, %d misses"
+            % (self.path, self.hits, self.misses)
+        )
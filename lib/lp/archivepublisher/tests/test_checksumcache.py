@@ -0,0 +1,134 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `ChecksumCache`."""
+
+import gzip
+import hashlib
+import os
+from unittest import mock
+
+from lp.archivepublisher.checksumcache import ChecksumCache, checksum_file
+from lp.services.log.logger import BufferLogger
+from lp.testing import TestCase
+
+
+class TestChecksumFile(TestCase):
+    def test_plain(self):
+        path = os.path.join(self.makeTemporaryDirectory(), "file")
+        with open(path, "wb") as f:
+            f.write(b"abc\n")
+        self.assertEqual(
+            {
+                "md5": hashlib.md5(b"abc\n").hexdigest(),
+                "sha1": hashlib.sha1(b"abc\n").hexdigest(),
+                "sha256": hashlib.sha256(b"abc\n").hexdigest(),
+                "size": 4,
+            },
+            checksum_file(path),
+        )
+
+    def test_open_func(self):
+        path = os.path.join(self.makeTemporaryDirectory(), "file.gz")
+        with gzip.open(path, "wb") as f:
+            f.write(b"abc\n")
+        checksums = checksum_file(path, open_func=gzip.open)
+        self.assertEqual(
+            hashlib.sha256(b"abc\n").hexdigest(), checksums["sha256"]
+        )
+        self.assertEqual(4, checksums["size"])
+
+
+class TestChecksumCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = self.makeTemporaryDirectory()
+        self.path = os.path.join(self.tempdir, "cache", "checksums")
+        self.logger = BufferLogger()
+
+    def makeFile(self, name, content):
+        path = os.path.join(self.tempdir, name)
+        with open(path + ".new", "wb") as f:
+            f.write(content)
+        os.rename(path + ".new", path)
+        return path
+
+    def makeCache(self):
+        return ChecksumCache(self.path, self.logger)
+
+    def test_lookup_reads_missing_entries(self):
+        path = self.makeFile("file", b"abc\n")
+        cache = self.makeCache()
+        self.assertIsNone(cache.get(path))
+        self.assertEqual(checksum_file(path), cache.lookup(path))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(checksum_file(path), cache.get(path))
+
+    def test_save_and_reload(self):
+        path = self.makeFile("file", b"abc\n")
+        cache = self.makeCache()
+        expected = cache.lookup(path)
+        cache.save()
+        self.assertFalse(os.path.exists(self.path + ".new"))
+
+        cache = self.makeCache()
+        with mock.patch(
+            "lp.archivepublisher.checksumcache.checksum_file",
+            side_effect=AssertionError("Unexpected read"),
+        ):
+            self.assertEqual(expected, cache.lookup(path))
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def test_changed_file_is_reread(self):
+        path = self.makeFile("file", b"abc\n")
+        cache = self.makeCache()
+        cache.lookup(path)
+        cache.save()
+
+        self.makeFile("file", b"defg\n")
+        cache = self.makeCache()
+        self.assertIsNone(cache.get(path))
+        self.assertEqual(
+            hashlib.sha256(b"defg\n").hexdigest(), cache.lookup(path)["sha256"]
+        )
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_variants_are_separate(self):
+        path = os.path.join(self.tempdir, "file.gz")
+        with gzip.open(path, "wb") as f:
+            f.write(b"abc\n")
+        cache = self.makeCache()
+        raw = cache.lookup(path)
+        uncompressed = cache.lookup(
+            path, open_func=gzip.open, variant="uncompressed"
+        )
+        self.assertNotEqual(raw, uncompressed)
+        self.assertEqual(raw, cache.get(path))
+        self.assertEqual(uncompressed, cache.get(path, variant="uncompressed"))
+
+    def test_save_drops_removed_files(self):
+        path1 = self.makeFile("file1", b"abc\n")
+        path2 = self.makeFile("file2", b"def\n")
+        cache = self.makeCache()
+        cache.lookup(path1)
+        cache.lookup(path2)
+        cache.save()
+
+        os.unlink(path1)
+        self.makeCache().save()
+
+        cache = self.makeCache()
+        self.assertIsNone(cache.get(path1))
+        self.assertIsNotNone(cache.get(path2))
+
+    def test_unreadable_cache_is_ignored(self):
+        path = self.makeFile("file", b"abc\n")
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "wb") as f:
+            f.write(b"not a pickle")
+        cache = self.makeCache()
+        self.assertIsNone(cache.get(path))
+        self.assertIn(
+            "WARNING Ignoring unreadable checksum cache",
+            self.logger.getLogBuffer(),
+        )
@@ -0,0 +1,101 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for multi-threaded index compression."""
+
+import bz2
+import io
+import lzma
+import random
+import zlib
+
+from testscenarios import WithScenarios, load_tests_apply_scenarios
+
+from lp.archivepublisher.compression import (
+    ThreadedBzip2File,
+    ThreadedGzipFile,
+    ThreadedXZFile,
+    get_compression_executor,
+)
+from lp.testing import TestCase
+
+
+class TestThreadedCompressedFile(WithScenarios, TestCase):
+    scenarios = [
+        (
+            "gzip",
+            {
+                "file_class": ThreadedGzipFile,
+                "block_size": 1000,
+                "decompressor": lambda: zlib.decompressobj(
+                    16 + zlib.MAX_WBITS
+                ),
+            },
+        ),
+        (
+            "bzip2",
+            {
+                "file_class": ThreadedBzip2File,
+                "block_size": 1000,
+                "decompressor": bz2.BZ2Decompressor,
+            },
+        ),
+        (
+            "xz",
+            {
+                "file_class": ThreadedXZFile,
+                "block_size": 1000,
+                "decompressor": lzma.LZMADecompressor,
+            },
+        ),
+    ]
+
+    def compress(self, chunks, threads=2):
+        # Use small blocks so that even short inputs span several blocks.
+        file_class = type(
+            "Small" + self.file_class.__name__,
+            (self.file_class,),
+            {"block_size": self.block_size},
+        )
+        output = io.BytesIO()
+        compressed_file = file_class(
+            output, get_compression_executor(threads), threads
+        )
+        for chunk in chunks:
+            compressed_file.write(chunk)
+        compressed_file.close()
+        return output.getvalue()
+
+    def assertDecompressesTo(self, expected, compressed):
+        # The output is a single stream, so a single-stream decompressor
+        # consumes all of it.
+        decompressor = self.decompressor()
+        self.assertEqual(expected, decompressor.decompress(compressed))
+        self.assertTrue(decompressor.eof)
+        self.assertEqual(b"", decompressor.unused_data)
+
+    def test_empty(self):
+        self.assertDecompressesTo(b"", self.compress([]))
+
+    def test_single_block(self):
+        self.assertDecompressesTo(b"hello", self.compress([b"hello"]))
+
+    def test_many_blocks(self):
+        rng = random.Random(0)
+        chunks = [
+            b"Package: %d\nVersion: %d\n\n"
+            % (rng.randint(0, 1000), rng.randint(0, 1000))
+            for _ in range(2000)
+        ]
+        self.assertDecompressesTo(b"".join(chunks), self.compress(chunks))
+
+    def test_exact_block_multiple(self):
+        content = b"x" * (self.block_size * 3)
+        self.assertDecompressesTo(content, self.compress([content]))
+
+    def test_one_thread(self):
+        content = b"abc" * self.block_size
+        self.assertDecompressesTo(content, self.compress([content], 1))
+
+
+load_tests = load_tests_apply_scenarios
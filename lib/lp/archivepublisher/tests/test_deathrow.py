@@ -22,8 +22,9 @@
 )
 from lp.soyuz.interfaces.component import IComponentSet
 from lp.soyuz.tests.test_publishing import SoyuzTestPublisher
-from lp.testing import TestCaseWithFactory
+from lp.testing import StormStatementRecorder, TestCaseWithFactory
 from lp.testing.layers import LaunchpadZopelessLayer
+from lp.testing.matchers import HasQueryCount
 
 
 class TestDeathRow(TestCaseWithFactory):
@@ -171,3 +172,59 @@ def test_skips_conda_source_packages(self):
         self.assertIsNone(pub_source.dateremoved)
         deathrow.reap()
         self.assertIsNotNone(pub_source.dateremoved)
+
+    def makeCondemnedSources(self, deathrow, count):
+        """Publish some sources to disk and then condemn them."""
+        distroseries = deathrow.archive.distribution.getSeries("hoary")
+        stp = self.getTestPublisher(distroseries)
+        pubs = [
+            stp.getPubSource(
+                sourcename="condemned%d" % self.factory.getUniqueInteger(),
+                archive=deathrow.archive,
+            )
+            for _ in range(count)
+        ]
+        self.layer.commit()
+        for pub in pubs:
+            pub.publish(deathrow.diskpool, deathrow.logger)
+            pub.requestObsolescence()
+        self.layer.commit()
+        return pubs
+
+    def test_reap_in_batches(self):
+        # Publications are reaped in batches, but all of them are reaped.
+        ubuntu = getUtility(IDistributionSet).getByName("ubuntu")
+        deathrow = self.getDeathRow(ubuntu.main_archive)
+        deathrow.batch_size = 2
+        pubs = self.makeCondemnedSources(deathrow, 5)
+        paths = [
+            self.getDiskPoolPath(pub, pub_file, deathrow.diskpool)
+            for pub in pubs
+            for pub_file in pub.files
+        ]
+        for path in paths:
+            self.assertIsFile(path)
+        deathrow.reap()
+        for pub in pubs:
+            self.assertIsNotNone(pub.dateremoved)
+        for path in paths:
+            self.assertDoesNotExist(path)
+
+    def test_reap_query_count(self):
+        # The number of queries needed to reap a batch of publications
+        # doesn't depend on the number of publications.
+        ubuntu = getUtility(IDistributionSet).getByName("ubuntu")
+
+        def reap(count):
+            archive = self.factory.makeArchive(
+                distribution=ubuntu, purpose=ArchivePurpose.PPA
+            )
+            deathrow = self.getDeathRow(archive)
+            self.makeCondemnedSources(deathrow, count)
+            with StormStatementRecorder() as recorder:
+                deathrow.reap()
+            return recorder
+
+        recorder1 = reap(1)
+        recorder2 = reap(3)
+        self.assertThat(recorder2, HasQueryCount.byEquality(recorder1))
@@ -650,6 +650,39 @@ def test_dominate_binaries_by_channel(self):
             PackagePublishingStatus.PUBLISHED,
         )
 
+    def test_dominateBinaries_supersedes_in_bulk(self):
+        # The number of queries needed to supersede binaries doesn't
+        # depend on the number of publications being superseded.
+        def make_upgrades(count):
+            for _ in range(count):
+                name = "pkg%d" % self.factory.getUniqueInteger()
+                for version in ("1.0", "1.1"):
+                    self.getPubBinaries(
+                        binaryname="%s-bin" % name,
+                        pub_source=self.getPubSource(
+                            sourcename=name,
+                            version=version,
+                            architecturehintlist="any",
+                            status=PackagePublishingStatus.PUBLISHED,
+                        ),
+                        architecturespecific=True,
+                        status=PackagePublishingStatus.PUBLISHED,
+                    )
+
+        def dominate():
+            dominator = Dominator(self.logger, self.ubuntutest.main_archive)
+            with StormStatementRecorder() as recorder:
+                dominator.dominateBinaries(
+                    self.distroseries, PackagePublishingPocket.RELEASE
+                )
+            return recorder
+
+        make_upgrades(1)
+        recorder1 = dominate()
+        make_upgrades(3)
+        recorder2 = dominate()
+        self.assertThat(recorder2, HasQueryCount.byEquality(recorder1))
+
 
 class TestDomination(TestNativePublishingBase):
     """Test overall domination procedure."""
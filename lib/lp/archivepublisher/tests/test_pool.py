@@ -4,6 +4,9 @@
 """Tests for pool.py."""
 
 import hashlib
+import io
+import os
+from itertools import count
 from pathlib import Path, PurePath
 from unittest import mock
 
@@ -37,10 +40,25 @@ def __init__(self, contents):
         self.sha1 = hashlib.sha1(contents).hexdigest()
 
 
+class FakeDownloadClient:
+    def __init__(self, contents):
+        self.contents = contents
+
+    def getDownloadURLForAlias(self, alias_id):
+        return "http://librarian.test/%d" % alias_id
+
+    def getFileByDownloadURL(self, url, alias_id):
+        return io.BytesIO(self.contents)
+
+
 class FakeLibraryFileAlias:
+    _ids = count(1)
+
     def __init__(self, contents, filename):
+        self.id = next(self._ids)
         self.contents = contents
         self.filename = filename
+        self.client = FakeDownloadClient(contents)
 
     @property
     def content(self):
@@ -328,3 +346,86 @@ def test_diskpool_atomicfile(self):
         self.assertTrue(foo.tempname.exists())
         foo.cleanup_temporary_path()
         self.assertFalse(foo.tempname.exists())
+
+
+class TestPoolPrefetch(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.pushConfig("archivepublisher", pool_download_threads=2)
+        self.pool_path = self.makeTemporaryDirectory()
+        self.temp_path = self.makeTemporaryDirectory()
+        self.pool = DiskPool(
+            FakeArchive(), self.pool_path, self.temp_path, BufferLogger()
+        )
+        self.foo = PoolTestingFile(
+            pool=self.pool,
+            source_name="foo",
+            source_version="1.0",
+            filename="foo-1.0.deb",
+        )
+
+    def prefetch(self, *pool_files, component="main"):
+        self.pool.prefetchFiles(
+            [
+                (
+                    component,
+                    pool_file.source_name,
+                    pool_file.source_version,
+                    pool_file.pub_file,
+                )
+                for pool_file in pool_files
+            ]
+        )
+
+    def test_adds_prefetched_file(self):
+        # A prefetched file is moved into place without being downloaded
+        # again.
+        self.prefetch(self.foo)
+        with mock.patch.object(
+            self.foo.pub_file.libraryfile,
+            "open",
+            side_effect=SpecificTestException,
+        ):
+            result = self.foo.addToPool("main")
+        self.assertEqual(self.pool.results.FILE_ADDED, result)
+        self.assertTrue(self.foo.checkIsFile("main"))
+        path = self.pool.pathFor("main", "foo", "1.0", self.foo.pub_file)
+        self.assertEqual(b"foo", path.read_bytes())
+        self.assertEqual(0o644, path.stat().st_mode & 0o777)
+        self.assertEqual([], os.listdir(self.temp_path))
+
+    def test_skips_files_in_pool(self):
+        # Files that are already in the pool are not prefetched.
+        self.foo.addToPool("main")
+        self.prefetch(self.foo, component="universe")
+        self.assertEqual({}, self.pool._prefetched)
+        self.assertEqual(
+            self.pool.results.SYMLINK_ADDED, self.foo.addToPool("universe")
+        )
+
+    def test_disabled(self):
+        # Nothing is prefetched unless more than one thread is configured.
+        self.pushConfig("archivepublisher", pool_download_threads=1)
+        self.prefetch(self.foo)
+        self.assertEqual({}, self.pool._prefetched)
+
+    def test_checksum_mismatch_falls_back_to_download(self):
+        # If a prefetched file's checksum doesn't match, it is discarded
+        # and the file is downloaded again when it is added.
+        self.foo.pub_file.libraryfile.client.contents = b"corrupt"
+        self.prefetch(self.foo)
+        self.assertEqual(
+            self.pool.results.FILE_ADDED, self.foo.addToPool("main")
+        )
+        path = self.pool.pathFor("main", "foo", "1.0", self.foo.pub_file)
+        self.assertEqual(b"foo", path.read_bytes())
+        self.assertEqual([], os.listdir(self.temp_path))
+
+    def test_discard_removes_unused_files(self):
+        # Prefetched files that were never added are removed from the
+        # temporary directory.
+        self.prefetch(self.foo)
+        self.pool.discardPrefetchedFiles()
+        self.assertEqual({}, self.pool._prefetched)
+        self.assertEqual([], os.listdir(self.temp_path))
+        self.assertFalse(self.foo.checkExists("main"))
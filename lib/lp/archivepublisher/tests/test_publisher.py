@@ -45,6 +45,7 @@
 from zope.component import getUtility
 from zope.security.proxy import removeSecurityProxy
 
+from lp.archivepublisher.checksumcache import ChecksumCache
 from lp.archivepublisher.config import getPubConfig
 from lp.archivepublisher.diskpool import DiskPool
 from lp.archivepublisher.interfaces.archivegpgsigningkey import (
@@ -629,6 +630,39 @@ def test_add_existing(self):
         by_hash.add("Sources", lfa)
         self.assertThat(by_hash_path, ByHashHasContents([content]))
 
+    def test_add_from_checksum_cache(self):
+        # If the checksum cache knows that the current file on disk has the
+        # right content, then it is linked rather than fetched from the
+        # librarian.
+        root = self.makeTemporaryDirectory()
+        content = b"abc\n"
+        sources_path = "dists/foo/main/source/Sources"
+        with open_for_writing(os.path.join(root, sources_path), "wb") as f:
+            f.write(content)
+        checksum_cache = ChecksumCache(
+            os.path.join(self.makeTemporaryDirectory(), "checksums"),
+            DevNullLogger(),
+        )
+        checksum_cache.lookup(os.path.join(root, sources_path))
+        lfa = self.factory.makeLibraryFileAlias(content=content, db_only=True)
+        by_hash = ByHash(
+            root,
+            "dists/foo/main/source",
+            DevNullLogger(),
+            checksum_cache=checksum_cache,
+        )
+        by_hash.add("Sources", lfa)
+        by_hash_path = os.path.join(root, "dists/foo/main/source/by-hash")
+        self.assertThat(by_hash_path, ByHashHasContents([content]))
+        self.assertEqual(
+            os.stat(os.path.join(root, sources_path)).st_ino,
+            os.stat(
+                os.path.join(
+                    by_hash_path, "SHA256", hashlib.sha256(content).hexdigest()
+                )
+            ).st_ino,
+        )
+
     def test_known(self):
         root = self.makeTemporaryDirectory()
         content = b"abc\n"
@@ -1971,6 +2005,97 @@ def testPPAArchiveIndexCompressors(self):
                 archive_publisher, uncompressed_file_path, [".xz"]
             )
 
+    def testPPAArchiveIndexWorkers(self):
+        # Writing indexes in worker processes produces byte-identical
+        # output to writing them serially.
+        archive_publisher = self.setupPPAArchiveIndexTest(
+            long_descriptions=False,
+            index_compressors=[
+                IndexCompressionType.UNCOMPRESSED,
+                IndexCompressionType.GZIP,
+                IndexCompressionType.BZIP2,
+                IndexCompressionType.XZ,
+            ],
+        )
+        component_path = os.path.join(
+            archive_publisher._config.distsroot, "breezy-autotest", "main"
+        )
+
+        def read_indexes():
+            contents = {}
+            for dirpath, _, filenames in os.walk(component_path):
+                for filename in filenames:
+                    # Release and i18n/Index are written by a later step.
+                    if filename in ("Release", "Index"):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    with open(path, "rb") as f:
+                        contents[os.path.relpath(path, component_path)] = (
+                            f.read()
+                        )
+            return contents
+
+        serial_contents = read_indexes()
+        self.assertIn(
+            os.path.join("i18n", "Translation-en.xz"), serial_contents
+        )
+        shutil.rmtree(component_path)
+
+        self.pushConfig("archivepublisher", index_workers=2)
+        archive_publisher.C_writeIndexes(True)
+        self.assertEqual(serial_contents, read_indexes())
+
+        # remove PPA root
+        shutil.rmtree(config.personalpackagearchive.root)
+
+    def testIncrementalIndexes(self):
+        # With incremental index generation enabled, stanzas for
+        # publications seen by a previous run come from a stanza cache, and
+        # the resulting indexes match those generated from scratch.
+        self.pushConfig("archivepublisher", incremental_indexes=True)
+        logger = BufferLogger()
+        publisher = Publisher(
+            logger, self.config, self.disk_pool, self.ubuntutest.main_archive
+        )
+        self.getPubSource(sourcename="foo", filecontent=b"foo")
+        publisher.A_publish(False)
+        self.layer.txn.commit()
+        publisher.C_writeIndexes(False)
+        cache_path = os.path.join(
+            self.config.cacheroot, "stanzas", "breezy-autotest", "main"
+        )
+        self.assertThat(os.path.join(cache_path, "source"), PathExists())
+        self.assertThat(os.path.join(cache_path, "binary-i386"), PathExists())
+
+        self.getPubSource(sourcename="bar", filecontent=b"bar")
+        logger.clearLogBuffer()
+        publisher.A_publish(False)
+        self.layer.txn.commit()
+        publisher.C_writeIndexes(False)
+        self.assertIn(
+            "Stanza cache %s: 1 hits, 1 misses"
+            % os.path.join(cache_path, "source"),
+            logger.getLogBuffer(),
+        )
+        sources_path = os.path.join(
+            self.config.distsroot, "breezy-autotest", "main", "source"
+        )
+        with open(os.path.join(sources_path, "Sources"), "rb") as f:
+            incremental_sources = f.read()
+        self.assertIn(b"Package: foo\n", incremental_sources)
+        self.assertIn(b"Package: bar\n", incremental_sources)
+
+        # A careful run ignores the existing cache.
+        logger.clearLogBuffer()
+        publisher.C_writeIndexes(True)
+        self.assertIn(
+            "Stanza cache %s: 0 hits, 2 misses"
+            % os.path.join(cache_path, "source"),
+            logger.getLogBuffer(),
+        )
+        with open(os.path.join(sources_path, "Sources"), "rb") as f:
+            self.assertEqual(incremental_sources, f.read())
+
     def testDirtyingPocketsWithDeletedPackages(self):
         """Test that dirtying pockets with deleted packages works.
 
@@ -3201,6 +3326,126 @@ def testReadIndexFileHashesCompression(self):
             )
             os.remove(path + suffix)
 
+    def testReadIndexFileHashesUsesRecordedChecksums(self):
+        # Checksums computed while writing indexes are used by
+        # _readIndexFileHashes rather than reading the files back, as long
+        # as the files on disk are unchanged.
+        publisher = Publisher(
+            self.logger,
+            self.config,
+            self.disk_pool,
+            self.ubuntutest.main_archive,
+        )
+        self.getPubSource(filecontent=b"Hello world")
+        publisher.A_publish(False)
+        self.layer.txn.commit()
+        publisher.C_writeIndexes(False)
+
+        fresh_publisher = Publisher(
+            self.logger,
+            self.config,
+            self.disk_pool,
+            self.ubuntutest.main_archive,
+        )
+        for file_name in (
+            "main/source/Sources",
+            "main/source/Sources.gz",
+            "main/binary-i386/Packages",
+            "main/binary-i386/Packages.bz2",
+        ):
+            expected = fresh_publisher._readIndexFileHashes(
+                "breezy-autotest", file_name
+            )
+            self.assertIsNotNone(expected)
+            with mock.patch(
+                "lp.archivepublisher.publishing.checksum_file",
+                side_effect=AssertionError("Unexpected read"),
+            ):
+                self.assertEqual(
+                    expected,
+                    publisher._readIndexFileHashes(
+                        "breezy-autotest", file_name
+                    ),
+                )
+
+        # If a file changes on disk, its recorded checksums are discarded.
+        contents = b"Package: changed\n\n"
+        sources_path = os.path.join(
+            publisher._config.distsroot, "breezy-autotest", "main", "source"
+        )
+        for suffix in ("", ".bz2", ".xz"):
+            if os.path.exists(os.path.join(sources_path, "Sources" + suffix)):
+                os.remove(os.path.join(sources_path, "Sources" + suffix))
+        with gzip.open(os.path.join(sources_path, "Sources.gz"), "wb") as f:
+            f.write(contents)
+        self.assertEqual(
+            hashlib.sha256(contents).hexdigest(),
+            publisher._readIndexFileHashes(
+                "breezy-autotest", "main/source/Sources"
+            )["sha256"]["sha256"],
+        )
+
+    def testReadIndexFileHashesUsesChecksumCache(self):
+        # With the checksum cache enabled, files that have not changed
+        # since a previous publisher run are not read again.
+        self.pushConfig("archivepublisher", checksum_cache=True)
+        publisher = Publisher(
+            self.logger,
+            self.config,
+            self.disk_pool,
+            self.ubuntutest.main_archive,
+        )
+        self.getPubSource(filecontent=b"Hello world")
+        i18n_path = os.path.join(
+            self.config.distsroot, "breezy-autotest", "main", "i18n"
+        )
+        os.makedirs(i18n_path, exist_ok=True)
+        with open(os.path.join(i18n_path, "Translation-de"), "wb") as f:
+            f.write(b"German\n")
+        with bz2.BZ2File(
+            os.path.join(i18n_path, "Translation-fr.bz2"), "wb"
+        ) as f:
+            f.write(b"French\n")
+        publisher.A_publish(False)
+        self.layer.txn.commit()
+        publisher.C_writeIndexes(False)
+        publisher.D_writeReleaseFiles(False)
+        self.assertThat(
+            os.path.join(self.config.cacheroot, "checksums"), PathExists()
+        )
+
+        fresh_publisher = Publisher(
+            self.logger,
+            self.config,
+            self.disk_pool,
+            self.ubuntutest.main_archive,
+        )
+        with mock.patch(
+            "lp.archivepublisher.checksumcache.checksum_file",
+            side_effect=AssertionError("Unexpected read"),
+        ):
+            for file_name, content in (
+                ("Translation-de", b"German\n"),
+                ("Translation-fr", b"French\n"),
+            ):
+                self.assertEqual(
+                    hashlib.sha256(content).hexdigest(),
+                    fresh_publisher._readIndexFileHashes(
+                        "breezy-autotest", "main/i18n/%s" % file_name
+                    )["sha256"]["sha256"],
+                )
+
+        # If a file changes on disk, it is read again.
+        os.unlink(os.path.join(i18n_path, "Translation-de"))
+        with open(os.path.join(i18n_path, "Translation-de"), "wb") as f:
+            f.write(b"Deutsch\n")
+        self.assertEqual(
+            hashlib.sha256(b"Deutsch\n").hexdigest(),
+            fresh_publisher._readIndexFileHashes(
+                "breezy-autotest", "main/i18n/Translation-de"
+            )["sha256"]["sha256"],
+        )
+
 
 class TestArchiveIndices(TestPublisherBase):
     """Tests for the native publisher's index generation.
@@ -4568,6 +4813,30 @@ def test_basic_directory_add(self):
         }
         self.assertThat(self.fetchSums(rootdir), MatchesDict(expected))
 
+    def test_file_add_uses_checksum_cache(self):
+        tmpdir = self.makeTemporaryDirectory()
+        rootdir = self.makeTemporaryDirectory()
+        test1_file = os.path.join(rootdir, "test1")
+        test1_hash = self.createTestFile(test1_file, b"test1")
+        checksum_cache = ChecksumCache(
+            os.path.join(tmpdir, "checksums"), DevNullLogger()
+        )
+        checksum_cache.lookup(test1_file)
+
+        with mock.patch(
+            "lp.archivepublisher.checksumcache.checksum_file",
+            side_effect=AssertionError("Unexpected read"),
+        ):
+            with DirectoryHash(
+                rootdir, tmpdir, checksum_cache=checksum_cache
+            ) as dh:
+                dh.add(test1_file)
+
+        expected = {
+            "SHA256SUMS": MatchesSetwise(Equals([test1_hash, "*test1"])),
+        }
+        self.assertThat(self.fetchSums(rootdir), MatchesDict(expected))
+
 
 class TestArtifactoryPublishing(TestPublisherBase):
     """Test publishing to Artifactory."""
@@ -5,12 +5,14 @@
 
 import bz2
 import gzip
+import hashlib
 import lzma
 import os
 import shutil
 import stat
 import tempfile
 import unittest
+import zlib
 
 from lp.archivepublisher.utils import RepositoryIndexFile
 from lp.soyuz.enums import IndexCompressionType
@@ -31,7 +33,7 @@ def tearDown(self):
         for path in [self.root, self.temp_root]:
             shutil.rmtree(path)
 
-    def getRepoFile(self, filename, compressors=None):
+    def getRepoFile(self, filename, compressors=None, compression_threads=0):
         """Return a `RepositoryIndexFile` for the given filename.
 
         The `RepositoryIndexFile` is created with the test 'root' and
@@ -44,7 +46,10 @@ def getRepoFile(self, filename, compressors=None):
                 IndexCompressionType.XZ,
             ]
         return RepositoryIndexFile(
-            os.path.join(self.root, filename), self.temp_root, compressors
+            os.path.join(self.root, filename),
+            self.temp_root,
+            compressors,
+            compression_threads=compression_threads,
         )
 
     def testWorkflow(self):
@@ -112,6 +117,66 @@ def testWrite(self):
         # module discards it so it's hard to test.
         self.assertEqual(0, gzip_file.mtime)
 
+    def testThreadedCompression(self):
+        """`RepositoryIndexFile` can compress using multiple threads.
+
+        The resulting files are single standard streams with the same
+        contents as those produced by single-threaded compression.
+        """
+        content = b"".join(
+            b"Package: package%d\nVersion: %d\n\n" % (i, i % 7)
+            for i in range(100000)
+        )
+        repo_file = self.getRepoFile("boing", compression_threads=2)
+        for i in range(0, len(content), 4096):
+            repo_file.write(content[i : i + 4096])
+        repo_file.close()
+
+        for suffix, decompressor in (
+            (".gz", lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+            (".bz2", bz2.BZ2Decompressor),
+            (".xz", lzma.LZMADecompressor),
+        ):
+            with open(os.path.join(self.root, "boing" + suffix), "rb") as f:
+                compressed = f.read()
+            decompressor = decompressor()
+            self.assertEqual(content, decompressor.decompress(compressed))
+            self.assertTrue(decompressor.eof)
+            self.assertEqual(b"", decompressor.unused_data)
+
+    def testChecksums(self):
+        """`RepositoryIndexFile` checksums files as it writes them.
+
+        Checksums are available for each file written to disk, and for
+        the uncompressed contents even if no uncompressed file is written.
+        """
+        repo_file = self.getRepoFile("boing")
+        repo_file.write(b"hello")
+        repo_file.close()
+
+        self.assertEqual(
+            sorted(
+                os.path.join(self.root, name)
+                for name in ("boing", "boing.gz", "boing.bz2", "boing.xz")
+            ),
+            sorted(repo_file.checksums),
+        )
+        for path, checksums in repo_file.checksums.items():
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    content = f.read()
+            else:
+                content = b"hello"
+            self.assertEqual(
+                {
+                    "size": len(content),
+                    "md5": hashlib.md5(content).hexdigest(),
+                    "sha1": hashlib.sha1(content).hexdigest(),
+                    "sha256": hashlib.sha256(content).hexdigest(),
+                },
+                checksums,
+            )
+
     def testCompressors(self):
         """`RepositoryIndexFile` honours the supplied list of compressors."""
         repo_file = self.getRepoFile(
@@ -0,0 +1,94 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `StanzaCache`."""
+
+import os
+
+from lp.archivepublisher.stanzacache import StanzaCache
+from lp.services.log.logger import BufferLogger
+from lp.testing import TestCase
+from lp.testing.fakemethod import FakeMethod
+
+
+class TestStanzaCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(
+            self.makeTemporaryDirectory(), "stanzas", "main", "source"
+        )
+        self.logger = BufferLogger()
+
+    def makeCache(self, fingerprint=None, use_existing=True):
+        return StanzaCache(
+            self.path, fingerprint, self.logger, use_existing=use_existing
+        )
+
+    def test_lookup_builds_missing_entries(self):
+        cache = self.makeCache()
+        build = FakeMethod(result=b"Package: foo\n\n")
+        self.assertEqual(b"Package: foo\n\n", cache.lookup(1, build))
+        self.assertEqual(1, build.call_count)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_save_and_reload(self):
+        cache = self.makeCache()
+        cache.lookup(1, lambda: b"Package: foo\n\n")
+        cache.lookup(2, lambda: b"Package: bar\n\n")
+        cache.save()
+        self.assertFalse(os.path.exists(self.path + ".new"))
+
+        cache = self.makeCache()
+        self.assertEqual({1, 2}, cache.cached_ids)
+        build = FakeMethod(result=b"Package: baz\n\n")
+        self.assertEqual(b"Package: foo\n\n", cache.lookup(1, build))
+        self.assertEqual(0, build.call_count)
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def test_save_drops_unused_entries(self):
+        cache = self.makeCache()
+        cache.lookup(1, lambda: b"Package: foo\n\n")
+        cache.lookup(2, lambda: b"Package: bar\n\n")
+        cache.save()
+
+        cache = self.makeCache()
+        cache.lookup(2, lambda: b"Package: bar\n\n")
+        cache.lookup(3, lambda: b"Package: baz\n\n")
+        cache.save()
+
+        self.assertEqual({2, 3}, self.makeCache().cached_ids)
+
+    def test_fingerprint_mismatch_discards_cache(self):
+        cache = self.makeCache(fingerprint=False)
+        cache.lookup(1, lambda: b"Package: foo\n\n")
+        cache.save()
+
+        self.assertEqual({1}, self.makeCache(fingerprint=False).cached_ids)
+        self.assertEqual(set(), self.makeCache(fingerprint=True).cached_ids)
+
+    def test_use_existing_false_ignores_cache(self):
+        cache = self.makeCache()
+        cache.lookup(1, lambda: b"Package: foo\n\n")
+        cache.save()
+
+        cache = self.makeCache(use_existing=False)
+        self.assertEqual(set(), cache.cached_ids)
+        self.assertEqual(
+            b"Package: new\n\n", cache.lookup(1, lambda: b"Package: new\n\n")
+        )
+        cache.save()
+        cache = self.makeCache()
+        self.assertEqual(
+            b"Package: new\n\n", cache.lookup(1, lambda: b"Package: old\n\n")
+        )
+
+    def test_unreadable_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "wb") as f:
+            f.write(b"not a pickle")
+        cache = self.makeCache()
+        self.assertEqual(set(), cache.cached_ids)
+        self.assertIn(
+            "WARNING Ignoring unreadable stanza cache",
+            self.logger.getLogBuffer(),
+        )
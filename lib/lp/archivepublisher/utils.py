@@ -4,6 +4,7 @@
 """Miscellaneous functions for publisher."""
 
 __all__ = [
+    "HashingFile",
     "RepositoryIndexFile",
     "get_ppa_reference",
 ]
@@ -11,11 +12,19 @@
 
 import bz2
 import gzip
+import hashlib
 import lzma
 import os
 import stat
 import tempfile
 
+from lp.archivepublisher.compression import (
+    ThreadedBzip2File,
+    ThreadedGzipFile,
+    ThreadedXZFile,
+    get_compression_executor,
+)
+from lp.services.config import config
 from lp.soyuz.enums import ArchivePurpose, IndexCompressionType
 from lp.soyuz.interfaces.archive import default_name_by_purpose
 
@@ -36,6 +45,57 @@ def get_ppa_reference(ppa):
     return ppa.owner.name
 
 
+# Hash algorithms computed for every index file as it is written, named as
+# in `LibraryFileContent`.
+index_hash_factories = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+}
+
+
+class HashingFile:
+    """A write-only file wrapper that checksums everything written to it.
+
+    If `fileobj` is None, data is checksummed and then discarded.
+    """
+
+    def __init__(self, fileobj=None):
+        self.fileobj = fileobj
+        self.size = 0
+        self._hashes = {
+            name: factory() for name, factory in index_hash_factories.items()
+        }
+
+    def write(self, data):
+        for hashobj in self._hashes.values():
+            hashobj.update(data)
+        self.size += len(data)
+        if self.fileobj is not None:
+            self.fileobj.write(data)
+        return len(data)
+
+    def flush(self):
+        if self.fileobj is not None:
+            self.fileobj.flush()
+
+    def close(self):
+        if self.fileobj is not None:
+            self.fileobj.close()
+
+    @property
+    def checksums(self):
+        """A dictionary of the size and hex digests of the data written.
+
+        Digests are keyed by `LibraryFileContent` attribute name.
+        """
+        checksums = {
+            name: hashobj.hexdigest() for name, hashobj in self._hashes.items()
+        }
+        checksums["size"] = self.size
+        return checksums
+
+
 class PlainTempFile:
     # Enumerated identifier.
     compression_type = IndexCompressionType.UNCOMPRESSED
@@ -43,28 +103,51 @@ class PlainTempFile:
     suffix = ""
     # File path built on initialization.
     path = None
+    # Class used to compress this format on a thread pool, if any.
+    threaded_file_class = None
 
-    def __init__(self, temp_root, filename, auto_open=True):
+    def __init__(self, temp_root, filename, auto_open=True, threads=None):
         self.temp_root = temp_root
         self.filename = filename + self.suffix
+        self.threads = threads
 
         if auto_open:
             self.open()
 
-    def _buildFile(self, fd):
-        return os.fdopen(fd, "wb")
+    def _buildFile(self, fileobj):
+        if (
+            self.threads is not None
+            and self.threads > 1
+            and self.threaded_file_class is not None
+        ):
+            return self.threaded_file_class(
+                fileobj, get_compression_executor(self.threads), self.threads
+            )
+        return self._buildSerialFile(fileobj)
+
+    def _buildSerialFile(self, fileobj):
+        return fileobj
 
     def open(self):
         fd, self.path = tempfile.mkstemp(
             dir=self.temp_root, prefix="%s_" % self.filename
         )
-        self._fd = self._buildFile(fd)
+        # Checksum the data that actually reaches the disk, so that callers
+        # don't need to read the file back afterwards.
+        self._hashing_file = HashingFile(os.fdopen(fd, "wb"))
+        self._fd = self._buildFile(self._hashing_file)
 
     def write(self, content):
         self._fd.write(content)
 
     def close(self):
         self._fd.close()
+        self._hashing_file.close()
+
+    @property
+    def checksums(self):
+        """The size and hex digests of the file as written to disk."""
+        return self._hashing_file.checksums
 
     def __del__(self):
         """Remove temporary file if it was left behind."""
@@ -76,28 +159,32 @@ class GzipTempFile(PlainTempFile):
     compression_type = IndexCompressionType.GZIP
     suffix = ".gz"
 
-    def _buildFile(self, fd):
+    threaded_file_class = ThreadedGzipFile
+
+    def _buildSerialFile(self, fileobj):
         # Blank the filename and mtime as if using "gzip -n" to avoid
         # needless hash changes.
-        return gzip.GzipFile(fileobj=os.fdopen(fd, "wb"), filename="", mtime=0)
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", filename="", mtime=0)
 
 
 class Bzip2TempFile(PlainTempFile):
     compression_type = IndexCompressionType.BZIP2
     suffix = ".bz2"
 
-    def _buildFile(self, fd):
-        os.close(fd)
-        return bz2.BZ2File(self.path, mode="wb")
+    threaded_file_class = ThreadedBzip2File
+
+    def _buildSerialFile(self, fileobj):
+        return bz2.BZ2File(fileobj, mode="wb")
 
 
 class XZTempFile(PlainTempFile):
     compression_type = IndexCompressionType.XZ
     suffix = ".xz"
 
-    def _buildFile(self, fd):
-        os.close(fd)
-        return lzma.LZMAFile(self.path, mode="wb", format=lzma.FORMAT_XZ)
+    threaded_file_class = ThreadedXZFile
+
+    def _buildSerialFile(self, fileobj):
+        return lzma.LZMAFile(fileobj, mode="wb", format=lzma.FORMAT_XZ)
 
 
 class RepositoryIndexFile:
@@ -105,9 +192,15 @@ class RepositoryIndexFile:
 
     It allows callsites to publish index files with different compression
     formats (plain, gzip, bzip2, and xz) transparently and atomically.
+
+    Checksums of the uncompressed data and of each compressed file are
+    computed while writing; once the index has been closed, they are
+    available in `checksums`.
     """
 
-    def __init__(self, path, temp_root, compressors=None):
+    def __init__(
+        self, path, temp_root, compressors=None, compression_threads=None
+    ):
         """Store repositories destinations and filename.
 
         The given 'temp_root' needs to exist; on the other hand, the
@@ -116,22 +209,42 @@ def __init__(self, path, temp_root, compressors=None):
 
         Additionally creates the needed temporary files in the given
         'temp_root'.
+
+        :param compression_threads: If greater than one, compress each
+            file using this many threads; see
+            `lp.archivepublisher.compression`.  Defaults to
+            `config.archivepublisher.compression_threads`.
         """
         if compressors is None:
             compressors = [IndexCompressionType.UNCOMPRESSED]
+        if compression_threads is None:
+            compression_threads = config.archivepublisher.compression_threads
 
-        self.root, filename = os.path.split(path)
+        self.root, self.filename = os.path.split(path)
+        filename = self.filename
         assert os.path.exists(temp_root), "Temporary root does not exist."
 
+        # Maps final paths to dictionaries of sizes and digests; see
+        # `HashingFile.checksums`.  Filled in by `close`.
+        self.checksums = {}
+
         self.index_files = []
         self.old_index_files = []
         for cls in (PlainTempFile, GzipTempFile, Bzip2TempFile, XZTempFile):
             if cls.compression_type in compressors:
-                self.index_files.append(cls(temp_root, filename))
+                self.index_files.append(
+                    cls(temp_root, filename, threads=compression_threads)
+                )
             else:
                 self.old_index_files.append(
                     cls(temp_root, filename, auto_open=False)
                 )
+        # If we aren't writing an uncompressed file, then we still need
+        # checksums of the uncompressed data for use in Release files.
+        if IndexCompressionType.UNCOMPRESSED in compressors:
+            self.uncompressed_file = None
+        else:
+            self.uncompressed_file = HashingFile()
 
     def __enter__(self):
         return self
@@ -143,6 +256,8 @@ def write(self, content):
         """Write contents to all target files."""
         for index_file in self.index_files:
             index_file.write(content)
+        if self.uncompressed_file is not None:
+            self.uncompressed_file.write(content)
 
     def close(self):
         """Close temporary files and atomically publish them.
@@ -172,6 +287,11 @@ def close(self):
             os.chmod(
                 root_path, mode | stat.S_IWGRP | stat.S_IRGRP | stat.S_IROTH
             )
+            self.checksums[root_path] = index_file.checksums
+        if self.uncompressed_file is not None:
+            self.checksums[os.path.join(self.root, self.filename)] = (
+                self.uncompressed_file.checksums
+            )
 
         # Remove files that may have been created by older versions of this
         # code.
@@ -17,6 +17,7 @@
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import apt_pkg
 from zope.component import getUtility
@@ -42,6 +43,7 @@
 from lp.registry.interfaces.pocket import PackagePublishingPocket
 from lp.registry.interfaces.sourcepackage import SourcePackageFileType
 from lp.registry.interfaces.sourcepackagename import ISourcePackageNameSet
+from lp.services.config import config
 from lp.services.librarian.interfaces import ILibraryFileAliasSet
 from lp.soyuz.adapters.overrides import (
     BinaryOverride,
@@ -162,28 +164,41 @@ def process(self, build=None):
 
         self.run_and_reject_on_error(self.changes.processFiles)
 
-        for uploaded_file in self.changes.files:
-            self.run_and_check_error(uploaded_file.checkNameIsTaintFree)
-            self.run_and_check_error(uploaded_file.checkSizeAndCheckSum)
-
-        # Override archive location if necessary to cope with partner
-        # uploads to a primary path. We consider an upload to be
-        # targeted to partner if the .changes lists any files in the
-        # partner component.
-        self.overrideArchive()
-
-        self._check_overall_consistency()
-        if self.sourceful:
-            self._check_sourceful_consistency()
-        if self.binaryful:
-            self._check_binaryful_consistency()
-            self.run_and_collect_errors(self._matchDDEBs)
-
-        self.run_and_collect_errors(self.changes.verify)
-
-        self.logger.debug("Verifying files in upload.")
-        for uploaded_file in self.changes.files:
-            self.run_and_collect_errors(uploaded_file.verify)
+        verification_executor, verification_futures = (
+            self._startFileVerification()
+        )
+        try:
+            for uploaded_file in self.changes.files:
+                self.run_and_check_error(uploaded_file.checkNameIsTaintFree)
+                self.run_and_check_error(uploaded_file.checkSizeAndCheckSum)
+
+            # Override archive location if necessary to cope with partner
+            # uploads to a primary path. We consider an upload to be
+            # targeted to partner if the .changes lists any files in the
+            # partner component.
+            self.overrideArchive()
+
+            self._check_overall_consistency()
+            if self.sourceful:
+                self._check_sourceful_consistency()
+            if self.binaryful:
+                self._check_binaryful_consistency()
+                self.run_and_collect_errors(self._matchDDEBs)
+
+            self.run_and_collect_errors(self.changes.verify)
+
+            self.logger.debug("Verifying files in upload.")
+            for uploaded_file in self.changes.files:
+                self.run_and_collect_errors(uploaded_file.verify)
+        except BaseException:
+            self._stopFileVerification(
+                verification_executor, verification_futures, wait=False
+            )
+            raise
+        else:
+            self._stopFileVerification(
+                verification_executor, verification_futures
+            )
 
         policy.validateUploadType(self)
 
@@ -205,6 +220,51 @@ def process(self, build=None):
         # That's all folks.
         self.logger.debug("Finished checking upload.")
 
+    def _startFileVerification(self):
+        """Start verifying the uploaded files in worker processes.
+
+        Checksumming files and inspecting the contents of .debs only needs
+        the files themselves, and can take a long time for large uploads,
+        so if enabled this is started for all files at once before any
+        other checks.  The individual checks collect the results as they
+        need them.
+
+        :return: A tuple of the executor running the checks and a list of
+            the futures submitted to it, or (None, []) if file verification
+            is not done in worker processes.
+        """
+        workers = config.uploader.verification_workers
+        if workers is None or workers <= 1:
+            return None, []
+        self.logger.debug(
+            "Verifying files using %d worker processes" % workers
+        )
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = []
+        for uploaded_file in self.changes.files:
+            futures.extend(uploaded_file.startVerification(executor))
+        return executor, futures
+
+    def _stopFileVerification(self, executor, futures, wait=True):
+        """Stop verifying the uploaded files in worker processes.
+
+        Checks that have not started yet are cancelled, since nothing will
+        collect their results.  (`Executor.shutdown` can only do this
+        itself on Python >= 3.9.)
+
+        :param executor: The executor returned by `_startFileVerification`,
+            or None.
+        :param futures: The futures returned by `_startFileVerification`.
+        :param wait: If False, don't wait for checks that are already
+            running to finish; this is used when processing the upload
+            failed.
+        """
+        if executor is None:
+            return
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=wait)
+
     #
     # Minor helpers
     #
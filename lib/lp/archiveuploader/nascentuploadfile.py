@@ -12,6 +12,9 @@
     "PackageUploadFile",
     "SourceUploadFile",
     "UdebBinaryUploadFile",
+    "check_deb_timestamps",
+    "compute_file_checksums",
+    "extract_deb_control",
     "splitComponentAndSection",
 ]
 
@@ -102,6 +105,112 @@ def check_cutoff(self, name, mtime):
             self.ancient_files[name] = mtime
 
 
+def compute_file_checksums(filepath, algorithms):
+    """Compute the size and checksums of a file.
+
+    This and the other module-level verification functions below take and
+    return only picklable values, so that they can run in worker processes.
+
+    :param filepath: The file to read.
+    :param algorithms: A sequence of `hashlib` algorithm names.
+    :return: A tuple of (size, {algorithm: hex digest}).
+    """
+    digesters = {n: hashlib.new(n) for n in algorithms}
+    with open(filepath, "rb") as ckfile:
+        size = 0
+        for chunk in filechunks(ckfile):
+            for digester in digesters.values():
+                digester.update(chunk)
+            size += len(chunk)
+    return size, {n: digester.hexdigest() for n, digester in digesters.items()}
+
+
+def extract_deb_control(filename, filepath, mandatory_fields):
+    """Extract the control fields of a .deb.
+
+    :param filename: The name of the .deb, for use in error messages.
+    :param filepath: The .deb to read.
+    :param mandatory_fields: Fields that the control file must contain.
+    :return: A tuple of (control, errors), where `control` is a dictionary
+        of control fields, or None if they could not be extracted, and
+        `errors` is a list of error messages.
+    """
+    try:
+        deb_file = apt_inst.DebFile(filepath)
+        control_file = deb_file.control.extractdata("control")
+        control_lines = apt_pkg.TagSection(control_file, bytes=True)
+    except Exception as e:
+        return None, [
+            "%s: extracting control file raised %s: %s. giving up."
+            % (filename, sys.exc_info()[0], e)
+        ]
+
+    errors = []
+    for mandatory_field in mandatory_fields:
+        if control_lines.find(mandatory_field) is None:
+            errors.append(
+                "%s: control file lacks mandatory field %r"
+                % (filename, mandatory_field)
+            )
+    control = {}
+    for key in control_lines.keys():
+        control[key] = control_lines.find(key)
+    return control, errors
+
+
+def check_deb_timestamps(filename, filepath, future_cutoff, past_cutoff):
+    """Check that all files in a .deb are within a given date range.
+
+    :param filename: The name of the .deb, for use in error messages.
+    :param filepath: The .deb to read.
+    :param future_cutoff: The latest acceptable timestamp.
+    :param past_cutoff: The earliest acceptable timestamp.
+    :return: A list of error messages.
+    """
+    tar_checker = TarFileDateChecker(future_cutoff, past_cutoff)
+    tar_checker.reset()
+    try:
+        deb_file = apt_inst.DebFile(filepath)
+    except SystemError as error:
+        # We get an error from the constructor if the .deb does not
+        # contain all the expected top-level members (debian-binary,
+        # control.tar.gz, and data.tar.*).
+        return [str(error)]
+    errors = []
+    try:
+        deb_file.control.go(tar_checker.callback)
+        deb_file.data.go(tar_checker.callback)
+        future_files = list(tar_checker.future_files)
+        if future_files:
+            first_file = future_files[0]
+            timestamp = time.ctime(tar_checker.future_files[first_file])
+            errors.append(
+                "%s: has %s file(s) with a time stamp too "
+                "far into the future (e.g. %s [%s])."
+                % (filename, len(future_files), first_file, timestamp)
+            )
+
+        ancient_files = list(tar_checker.ancient_files)
+        if ancient_files:
+            first_file = ancient_files[0]
+            timestamp = time.ctime(tar_checker.ancient_files[first_file])
+            errors.append(
+                "%s: has %s file(s) with a time stamp too "
+                "far in the past (e.g. %s [%s])."
+                % (filename, len(ancient_files), first_file, timestamp)
+            )
+    except Exception as error:
+        # There is a very large number of places where we
+        # might get an exception while checking the timestamps.
+        # Many of them come from apt_inst/apt_pkg and they are
+        # terrible in giving sane exceptions. We thusly capture
+        # them all and make them into rejection messages instead
+        errors.append(
+            "%s: deb contents timestamp check failed: %s" % (filename, error)
+        )
+    return errors
+
+
 def splitComponentAndSection(component_and_section):
     """Split the component out of the section."""
     if "/" not in component_and_section:
@@ -117,6 +226,11 @@ class NascentUploadFile:
 
     new = False
 
+    # If verification has been started in a worker process by
+    # `startVerification`, this is a future for the result of
+    # `compute_file_checksums`.
+    _checksums_future = None
+
     # Files need their content type for creating in the librarian.
     # This maps endings of filenames onto content types we may encounter
     # in the processing of an upload.
@@ -194,6 +308,23 @@ def storeInDatabase(self):
     #
     # Verification
     #
+    def startVerification(self, executor):
+        """Start expensive verification checks in worker processes.
+
+        The results are collected by the corresponding checks (e.g.
+        `checkSizeAndCheckSum`), which raise or yield exactly the same
+        errors as they would if they had done all the work themselves.
+
+        :param executor: A `concurrent.futures.Executor`.
+        :return: A list of the futures submitted to `executor`.
+        """
+        if not self.exists_on_disk:
+            return []
+        self._checksums_future = executor.submit(
+            compute_file_checksums, self.filepath, list(self.checksums)
+        )
+        return [self._checksums_future]
+
     def verify(self):
         """Implemented locally.
 
@@ -223,24 +354,23 @@ def checkSizeAndCheckSum(self):
 
         # Read in the file and compute its md5 and sha1 checksums and remember
         # the size of the file as read-in.
-        digesters = {n: hashlib.new(n) for n in self.checksums.keys()}
-        with open(self.filepath, "rb") as ckfile:
-            size = 0
-            for chunk in filechunks(ckfile):
-                for digester in digesters.values():
-                    digester.update(chunk)
-                size += len(chunk)
+        if self._checksums_future is not None:
+            size, digests = self._checksums_future.result()
+        else:
+            size, digests = compute_file_checksums(
+                self.filepath, self.checksums.keys()
+            )
 
         # Check the size and checksum match what we were told in __init__
         for n in sorted(self.checksums.keys()):
-            if digesters[n].hexdigest() != self.checksums[n]:
+            if digests[n] != self.checksums[n]:
                 raise UploadError(
                     "File %s mentioned in the changes has a %s mismatch. "
                     "%s != %s"
                     % (
                         self.filename,
                         n,
-                        digesters[n].hexdigest(),
+                        digests[n],
                         self.checksums[n],
                     )
                 )
@@ -532,6 +662,11 @@ class BaseBinaryUploadFile(PackageUploadFile):
     source_name = None
     source_version = None
 
+    # Futures for the results of `extract_deb_control` and
+    # `check_deb_timestamps`, if `startVerification` has started them.
+    _control_future = None
+    _timestamps_future = None
+
     def __init__(
         self,
         filepath,
@@ -611,6 +746,17 @@ def local_checks(self):
         """Should be implemented locally."""
         raise NotImplementedError
 
+    def startVerification(self, executor):
+        """See `NascentUploadFile`."""
+        futures = super().startVerification(executor)
+        self._control_future = executor.submit(
+            extract_deb_control,
+            self.filename,
+            self.filepath,
+            self.mandatory_fields,
+        )
+        return futures + [self._control_future]
+
     def verify(self):
         """Verify the contents of the .deb or .udeb as best we can.
 
@@ -628,27 +774,16 @@ def verify(self):
 
     def extractAndParseControl(self):
         """Extract and parse control information."""
-        try:
-            deb_file = apt_inst.DebFile(self.filepath)
-            control_file = deb_file.control.extractdata("control")
-            control_lines = apt_pkg.TagSection(control_file, bytes=True)
-        except Exception as e:
-            yield UploadError(
-                "%s: extracting control file raised %s: %s. giving up."
-                % (self.filename, sys.exc_info()[0], e)
+        if self._control_future is not None:
+            control, errors = self._control_future.result()
+        else:
+            control, errors = extract_deb_control(
+                self.filename, self.filepath, self.mandatory_fields
             )
-            return
-
-        for mandatory_field in self.mandatory_fields:
-            if control_lines.find(mandatory_field) is None:
-                yield UploadError(
-                    "%s: control file lacks mandatory field %r"
-                    % (self.filename, mandatory_field)
-                )
-        control = {}
-        for key in control_lines.keys():
-            control[key] = control_lines.find(key)
-        self.parseControl(control)
+        for error in errors:
+            yield UploadError(error)
+        if control is not None:
+            self.parseControl(control)
 
     def parseControl(self, control):
         # XXX kiko 2007-02-15: We never use the Maintainer information in
@@ -864,61 +999,25 @@ def verifyFormat(self):
                 )
             )
 
-    def verifyDebTimestamp(self):
-        """Check specific DEB format timestamp checks."""
-        self.logger.debug("Verifying timestamps in %s" % (self.filename))
-
+    def _getTimestampCutoffs(self):
+        """Return the range of timestamps allowed by the upload policy."""
         future_cutoff = time.time() + self.policy.future_time_grace
         earliest_year = time.strptime(str(self.policy.earliest_year), "%Y")
         past_cutoff = time.mktime(earliest_year)
+        return future_cutoff, past_cutoff
 
-        tar_checker = TarFileDateChecker(future_cutoff, past_cutoff)
-        tar_checker.reset()
-        try:
-            deb_file = apt_inst.DebFile(self.filepath)
-        except SystemError as error:
-            # We get an error from the constructor if the .deb does not
-            # contain all the expected top-level members (debian-binary,
-            # control.tar.gz, and data.tar.*).
-            yield UploadError(str(error))
-            return
-        try:
-            deb_file.control.go(tar_checker.callback)
-            deb_file.data.go(tar_checker.callback)
-            future_files = list(tar_checker.future_files)
-            if future_files:
-                first_file = future_files[0]
-                timestamp = time.ctime(tar_checker.future_files[first_file])
-                yield UploadError(
-                    "%s: has %s file(s) with a time stamp too "
-                    "far into the future (e.g. %s [%s])."
-                    % (self.filename, len(future_files), first_file, timestamp)
-                )
+    def verifyDebTimestamp(self):
+        """Check specific DEB format timestamp checks."""
+        self.logger.debug("Verifying timestamps in %s" % (self.filename))
 
-            ancient_files = list(tar_checker.ancient_files)
-            if ancient_files:
-                first_file = ancient_files[0]
-                timestamp = time.ctime(tar_checker.ancient_files[first_file])
-                yield UploadError(
-                    "%s: has %s file(s) with a time stamp too "
-                    "far in the past (e.g. %s [%s])."
-                    % (
-                        self.filename,
-                        len(ancient_files),
-                        first_file,
-                        timestamp,
-                    )
-                )
-        except Exception as error:
-            # There is a very large number of places where we
-            # might get an exception while checking the timestamps.
-            # Many of them come from apt_inst/apt_pkg and they are
-            # terrible in giving sane exceptions. We thusly capture
-            # them all and make them into rejection messages instead
-            yield UploadError(
-                "%s: deb contents timestamp check failed: %s"
-                % (self.filename, error)
+        if self._timestamps_future is not None:
+            errors = self._timestamps_future.result()
+        else:
+            errors = check_deb_timestamps(
+                self.filename, self.filepath, *self._getTimestampCutoffs()
             )
+        for error in errors:
+            yield UploadError(error)
 
     #
     #   Database relationship methods
@@ -1145,6 +1244,17 @@ class DebBinaryUploadFile(BaseBinaryUploadFile):
 
     format = BinaryPackageFormat.DEB
 
+    def startVerification(self, executor):
+        """See `NascentUploadFile`."""
+        futures = super().startVerification(executor)
+        self._timestamps_future = executor.submit(
+            check_deb_timestamps,
+            self.filename,
+            self.filepath,
+            *self._getTimestampCutoffs(),
+        )
+        return futures + [self._timestamps_future]
+
     @property
     def local_checks(self):
         """Checks to be executed on DEBs."""
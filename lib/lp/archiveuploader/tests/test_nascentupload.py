@@ -3,6 +3,10 @@
 
 """Test NascentUpload functionality."""
 
+from concurrent.futures import Future
+from textwrap import dedent
+from unittest import mock
+
 from testtools import TestCase
 from testtools.matchers import MatchesStructure
 
@@ -10,6 +14,7 @@
 from lp.archiveuploader.nascentupload import NascentUpload
 from lp.archiveuploader.tests import datadir, getPolicy
 from lp.archiveuploader.uploadpolicy import ArchiveUploadType
+from lp.services.config import config
 from lp.services.log.logger import DevNullLogger
 from lp.testing.layers import LaunchpadZopelessLayer, ZopelessDatabaseLayer
 
@@ -140,3 +145,43 @@ def test_hash_mismatch_rejects(self):
             "91556113ad38eb35d2fe03d27ae646e0ed487a3d",
             upload.rejection_message,
         )
+
+    def test_failure_cancels_file_verification(self):
+        # If processing an upload fails, file verification jobs that have
+        # not started yet are cancelled, and we don't wait for the worker
+        # processes to finish.
+        config.push(
+            "verification-workers",
+            dedent(
+                """
+                [uploader]
+                verification_workers: 2
+                """
+            ),
+        )
+        self.addCleanup(config.pop, "verification-workers")
+        futures = []
+
+        def submit(*args):
+            futures.append(Future())
+            return futures[-1]
+
+        executor = mock.Mock()
+        executor.submit.side_effect = submit
+        policy = getPolicy(name="sync", distro="ubuntu", distroseries="hoary")
+        policy.accepted_type = ArchiveUploadType.BINARY_ONLY
+        upload = NascentUpload.from_changesfile_path(
+            datadir("suite/badhash_1.0-1/badhash_1.0-1_i386.changes"),
+            policy,
+            DevNullLogger(),
+        )
+        with mock.patch(
+            "lp.archiveuploader.nascentupload.ProcessPoolExecutor",
+            return_value=executor,
+        ), mock.patch.object(
+            upload, "run_and_check_error", side_effect=ZeroDivisionError
+        ):
+            self.assertRaises(ZeroDivisionError, upload.process)
+        self.assertNotEqual([], futures)
+        self.assertTrue(all(future.cancelled() for future in futures))
+        executor.shutdown.assert_called_once_with(wait=False)
@@ -10,6 +10,7 @@
 import os
 import subprocess
 import tarfile
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 from unittest import mock
 
@@ -122,6 +123,25 @@ def test_checkSizeAndCheckSum_validates_sha1(self):
             nuf.checkSizeAndCheckSum,
         )
 
+    def test_checkSizeAndCheckSum_uses_startVerification(self):
+        # If verification has been started in a worker process,
+        # checkSizeAndCheckSum uses its results.
+        (path, md5, sha1, size) = self.writeUploadFile("foo", b"bar")
+        nuf = NascentUploadFile(
+            path, dict(MD5="deadbeef"), size, "main/devel", None, None, None
+        )
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            nuf.startVerification(executor)
+            nuf._checksums_future.result()
+            os.unlink(path)
+            write_file(path, b"baz")
+            self.assertRaisesWithContent(
+                UploadError,
+                "File foo mentioned in the changes has a MD5 mismatch. "
+                "37b51d194a7513e45b56f6524f2d51f2 != deadbeef",
+                nuf.checkSizeAndCheckSum,
+            )
+
 
 class CustomUploadFileTests(NascentUploadFileTestCase):
     """Tests for CustomUploadFile."""
@@ -733,6 +753,47 @@ def test_verifyDebTimestamp_SystemError(self):
             ),
         )
 
+    def test_startVerification_matches_serial(self):
+        # Extracting control files and checking timestamps in worker
+        # processes produces the same control fields and errors as doing so
+        # in-process.
+        self.policy.future_time_grace = -3600
+        for members in (None, ["debian-binary"]):
+            uploadfile = self.createDebBinaryUploadFile(
+                "foo_0.42_i386.deb",
+                "main/python",
+                "unknown",
+                "mypkg",
+                "0.42",
+                None,
+                control_format="gz",
+                data_format="gz",
+                members=members,
+            )
+            serial_errors = [
+                str(error)
+                for check in (
+                    uploadfile.extractAndParseControl,
+                    uploadfile.verifyDebTimestamp,
+                )
+                for error in check()
+            ]
+            self.assertNotEqual([], serial_errors)
+            serial_control = uploadfile.control
+            uploadfile.control = None
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                uploadfile.startVerification(executor)
+                parallel_errors = [
+                    str(error)
+                    for check in (
+                        uploadfile.extractAndParseControl,
+                        uploadfile.verifyDebTimestamp,
+                    )
+                    for error in check()
+                ]
+            self.assertEqual(serial_errors, parallel_errors)
+            self.assertEqual(serial_control, uploadfile.control)
+
     def test_storeInDatabase(self):
         # storeInDatabase creates a BinaryPackageRelease.
         uploadfile = self.createDebBinaryUploadFile(
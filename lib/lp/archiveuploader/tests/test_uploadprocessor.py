@@ -1900,6 +1900,70 @@ def testXZDebUpload(self):
             % queue_items.count(),
         )
 
+    def testVerificationWorkers(self):
+        """Uploaded files can be verified in worker processes.
+
+        Binary uploads verified in worker processes are accepted or
+        rejected just as they are when verified serially, with the same
+        rejection messages.
+        """
+        self.setupBreezy()
+        self.layer.txn.commit()
+        self.options.context = "absolutely-anything"
+        uploadprocessor = self.getUploadProcessor(self.layer.txn)
+
+        upload_dir = self.queueUpload("bar_1.0-1")
+        self.processUpload(uploadprocessor, upload_dir)
+        [msg] = pop_notifications()
+        self.assertFalse(
+            "rejected" in str(msg), "Failed to upload bar source:\n%s" % msg
+        )
+        self.publishPackage("bar", "1.0-1")
+        pop_notifications()
+
+        # Make the timestamp checks on the .deb fail.
+        get_policy = uploadprocessor._getPolicyForDistro
+
+        def get_strict_policy(distro, build):
+            policy = get_policy(distro, build)
+            policy.earliest_year = 2100
+            return policy
+
+        uploadprocessor._getPolicyForDistro = get_strict_policy
+        rejection_messages = []
+        for verification_workers in (0, 2):
+            self.pushConfig(
+                "uploader", verification_workers=verification_workers
+            )
+            upload_dir = self.queueUpload(
+                "bar_1.0-1_binary",
+                queue_entry="bar_1.0-1_binary_%d" % verification_workers,
+            )
+            self.processUpload(uploadprocessor, upload_dir)
+            upload = uploadprocessor.last_processed_upload
+            self.assertTrue(upload.is_rejected)
+            rejection_messages.append(upload.rejection_message)
+            pop_notifications()
+        self.assertIn(
+            "with a time stamp too far in the past", rejection_messages[0]
+        )
+        self.assertEqual(rejection_messages[0], rejection_messages[1])
+
+        # With the usual policy, the binary upload verified in worker
+        # processes is accepted.
+        uploadprocessor._getPolicyForDistro = get_policy
+        upload_dir = self.queueUpload("bar_1.0-1_binary")
+        self.processUpload(uploadprocessor, upload_dir)
+        self.assertFalse(uploadprocessor.last_processed_upload.is_rejected)
+        self.assertEmailQueueLength(0)
+        queue_items = self.breezy.getPackageUploads(
+            status=PackageUploadStatus.NEW,
+            name="bar",
+            version="1.0-1",
+            exact_match=True,
+        )
+        self.assertEqual(1, queue_items.count())
+
     def testSourceUploadWithoutBinaryField(self):
         """Source uploads may omit the Binary field.
 
@@ -183,3 +183,22 @@ def findBuildCandidates(
             the given values of `virtualized`, `open_resources`, and
             `restricted_resources`.
         """
+
+    def findAllBuildCandidates():
+        """Find all candidate jobs for dispatch to idle builders.
+
+        Unlike `findBuildCandidates`, this does not filter by builder
+        properties or minimum scores, leaving callers to match candidates
+        to builders themselves.
+
+        :return: A list of `BuildCandidate` tuples for all waiting jobs,
+            highest score first.
+        """
+
+    def getMinimumScore(processor_name):
+        """Return the minimum score for dispatching jobs for a processor.
+
+        :param processor_name: A processor name, or None for jobs that are
+            not for any particular processor.
+        :return: An integer, or None if there is no minimum score.
+        """
@@ -4,6 +4,7 @@
 """Soyuz buildd worker manager logic."""
 
 __all__ = [
+    "BULK_CANDIDATE_SELECTION_FEATURE_FLAG",
     "BuilddManager",
     "BUILDD_MANAGER_LOG_NAME",
     "PrefetchedBuilderFactory",
@@ -11,6 +12,7 @@
 ]
 
 import datetime
+import heapq
 import logging
 import os.path
 import shutil
@@ -43,16 +45,24 @@
 from lp.buildmaster.interfaces.buildqueue import IBuildQueueSet
 from lp.buildmaster.interfaces.processor import IProcessorSet
 from lp.buildmaster.model.builder import Builder
-from lp.buildmaster.model.buildqueue import BuildQueue
+from lp.buildmaster.model.buildqueue import (
+    BuildQueue,
+    builder_constraints_match,
+)
 from lp.services.config import config
 from lp.services.database.bulk import dbify_value
 from lp.services.database.interfaces import IStore
 from lp.services.database.stormexpr import BulkUpdate, Values
+from lp.services.features import getFeatureFlag
 from lp.services.propertycache import get_property_cache
 from lp.services.statsd.interfaces.statsd_client import IStatsdClient
 
 BUILDD_MANAGER_LOG_NAME = "worker-scanner"
 
+# If set, find build candidates for all builder groups using a single query
+# per scan cycle.
+BULK_CANDIDATE_SELECTION_FEATURE_FLAG = "buildmaster.bulk_candidate_selection"
+
 
 # The number of times the scan of a builder can fail before we start
 # attributing it to the builder and job.
@@ -168,6 +178,99 @@ def pop(self, vitals):
             return None
 
 
+class BulkBuildCandidates(PrefetchedBuildCandidates):
+    """A set of build candidates for all builder groups at once.
+
+    Rather than querying separately for each builder group, this loads all
+    waiting build queue entries in a single query the first time any
+    builder needs a candidate, and sorts them into a heap for each builder
+    group.  A build queue entry may be a candidate for several builder
+    groups; once it has been popped for one group, it is skipped in the
+    others.
+    """
+
+    def __init__(self, all_vitals):
+        super().__init__(all_vitals)
+        self.loaded = False
+        self.popped = set()
+
+    def _addAllCandidates(self, candidates, minimum_scores):
+        """Sort candidates into heaps for each builder group.
+
+        :param candidates: A sequence of `BuildCandidate`s, in the order
+            used by `_getSortKey`.
+        :param minimum_scores: A dict mapping processor names (or None) to
+            minimum scores (or None).
+        """
+        builder_groups_by_platform = defaultdict(list)
+        for builder_group_key in self.builder_groups:
+            processor_name, virtualized, _, _ = builder_group_key
+            builder_groups_by_platform[(processor_name, virtualized)].append(
+                builder_group_key
+            )
+        for candidate in candidates:
+            builder_group_keys = builder_groups_by_platform.get(
+                (candidate.processor_name, candidate.virtualized)
+            )
+            if not builder_group_keys:
+                continue
+            minimum_score = minimum_scores.get(candidate.processor_name)
+            if minimum_score is not None and (
+                candidate.lastscore < minimum_score
+            ):
+                continue
+            sort_key = self._getSortKey(candidate)
+            for builder_group_key in builder_group_keys:
+                _, _, restricted_resources, open_resources = builder_group_key
+                if builder_constraints_match(
+                    candidate.builder_constraints,
+                    open_resources,
+                    restricted_resources,
+                ):
+                    # The candidates are already sorted, so appending keeps
+                    # each list a valid heap.
+                    self.candidates[builder_group_key].append(
+                        sort_key + (candidate.id,)
+                    )
+        self.loaded = True
+
+    def prefetchForBuilder(self, vitals):
+        """See `PrefetchedBuildCandidates`."""
+        if self.loaded:
+            return
+        bq_set = getUtility(IBuildQueueSet)
+        minimum_scores = {
+            processor_name: bq_set.getMinimumScore(processor_name)
+            for processor_name, _, _, _ in self.builder_groups
+        }
+        self._addAllCandidates(bq_set.findAllBuildCandidates(), minimum_scores)
+
+    def _popCandidateID(self, vitals):
+        best = None
+        for builder_group_key in self._getBuilderGroupKeys(vitals):
+            heap = self.candidates.get(builder_group_key)
+            if not heap:
+                continue
+            # Discard entries already popped for other builder groups.
+            while heap and heap[0][-1] in self.popped:
+                heapq.heappop(heap)
+            if heap and (best is None or heap[0] < best[0]):
+                best = heap[0], heap
+        if best is None:
+            return None
+        entry, heap = best
+        heapq.heappop(heap)
+        self.popped.add(entry[-1])
+        return entry[-1]
+
+    def pop(self, vitals):
+        """See `PrefetchedBuildCandidates`."""
+        candidate_id = self._popCandidateID(vitals)
+        if candidate_id is None:
+            return None
+        return getUtility(IBuildQueueSet).get(candidate_id)
+
+
 class BaseBuilderFactory:
     date_updated = None
 
@@ -195,6 +298,13 @@ def findBuildCandidate(self, vitals):
         """Find the next build candidate for this `BuilderVitals`, or None."""
         raise NotImplementedError
 
+    def isCancelling(self, vitals):
+        """Has cancellation been requested for this builder's current job?"""
+        return (
+            vitals.build_queue is not None
+            and vitals.build_queue.status == BuildQueueStatus.CANCELLING
+        )
+
     def acquireBuildCandidate(self, vitals, builder):
         """Acquire and return a build candidate in an atomic fashion.
 
@@ -270,6 +380,7 @@ def __init__(self, *args, **kwargs):
         # This needs to exist to avoid race conditions between
         # `updateStats` and `update`.
         self.vitals_map = {}
+        self.cancelling_builders = set()
 
     def update(self):
         """See `BaseBuilderFactory`."""
@@ -288,9 +399,18 @@ def update(self):
             b.name: extract_vitals_from_db(b, bq)
             for b, bq in builders_and_current_bqs
         }
-        self.candidates = PrefetchedBuildCandidates(
-            list(self.vitals_map.values())
-        )
+        # Record this now, since looking at the build queues later would
+        # need to reload them from the database.
+        self.cancelling_builders = {
+            b.name
+            for b, bq in builders_and_current_bqs
+            if bq is not None and bq.status == BuildQueueStatus.CANCELLING
+        }
+        if getFeatureFlag(BULK_CANDIDATE_SELECTION_FEATURE_FLAG):
+            candidates_factory = BulkBuildCandidates
+        else:
+            candidates_factory = PrefetchedBuildCandidates
+        self.candidates = candidates_factory(list(self.vitals_map.values()))
         transaction.abort()
         self.date_updated = datetime.datetime.utcnow()
 
@@ -315,6 +435,10 @@ def findBuildCandidate(self, vitals):
         self.candidates.prefetchForBuilder(vitals)
         return self.candidates.pop(vitals)
 
+    def isCancelling(self, vitals):
+        """See `BaseBuilderFactory`."""
+        return vitals.name in self.cancelling_builders
+
 
 def get_statsd_labels(builder, build):
     labels = {
@@ -486,6 +610,10 @@ class WorkerScanner:
     # algorithm for polling.
     SCAN_INTERVAL = 15
 
+    # The largest exponent used when backing off scans of builders that
+    # are steadily building; see `_scheduleNextScan`.
+    MAX_BACKOFF_EXPONENT = 8
+
     # The time before deciding that a cancelling builder has failed, in
     # seconds.  This should normally be a multiple of SCAN_INTERVAL, and
     # greater than abort_timeout in launchpad-buildd's worker BuildManager.
@@ -517,6 +645,16 @@ def __init__(
         self.date_cancel = None
         self.date_scanned = None
 
+        # Adaptive scheduling state: the builder's status and job as of the
+        # last scan, the number of consecutive scans that found it steadily
+        # building the same job, and the time before which we don't need
+        # to scan it again.
+        self.scan_phase = None
+        self._scanned_build_queue = None
+        self._backoff_scans = 0
+        self.date_next_scan = None
+        self._last_scan_start = None
+
         self.can_retry = True
 
         # The build and job failure counts are persisted, but we only really
@@ -559,8 +697,15 @@ def singleCycle(self):
             )
             return
 
+        if self._canSkipScan():
+            self.logger.debug(
+                "Skipping builder %s (backing off)" % self.builder_name
+            )
+            return
+
         self.logger.debug("Scanning builder %s" % self.builder_name)
 
+        scan_start = self._clock.seconds()
         try:
             yield self.scan()
 
@@ -569,11 +714,83 @@ def singleCycle(self):
             # failure counts, since the build might consistently break the
             # builder later in the build.
             self.scan_failure_count = 0
+            self._scheduleNextScan(scan_start)
         except Exception as e:
+            self.scan_phase = None
+            self._scheduleNextScan(scan_start)
             self._scanFailed(self.can_retry, e)
 
         self.logger.debug("Scan finished for builder %s" % self.builder_name)
         self.date_scanned = datetime.datetime.utcnow()
+        self._recordScanTimings(scan_start)
+
+    def _canSkipScan(self):
+        """Can we skip this scan cycle?
+
+        Scans of builders that are steadily building are backed off (see
+        `_scheduleNextScan`), but we scan promptly anyway if the builder's
+        job changed, the builder was disabled, or cancellation was
+        requested.  This only uses cached information from the builder
+        factory.
+        """
+        if (
+            self.date_next_scan is None
+            or self._clock.seconds() >= self.date_next_scan
+        ):
+            return False
+        vitals = self.builder_factory.getVitals(self.builder_name)
+        return (
+            vitals.builderok
+            and vitals.build_queue is not None
+            and vitals.build_queue is self._scanned_build_queue
+            and not self.builder_factory.isCancelling(vitals)
+        )
+
+    def _scheduleNextScan(self, scan_start):
+        """Decide when this builder next needs to be scanned.
+
+        A builder that is building the same job as on the previous scan
+        is in a steady state in which scanning only refreshes its log tail,
+        so the interval between its scans doubles each time up to
+        `config.builddmaster.max_scan_interval`.  Builders in any other
+        phase (idle, cleaning, finished and waiting to be collected,
+        aborting, or failing) are scanned every cycle.
+        """
+        max_interval = config.builddmaster.max_scan_interval
+        if (
+            max_interval > self.SCAN_INTERVAL
+            and self.scan_phase == "BuilderStatus.BUILDING"
+        ):
+            self._backoff_scans = min(
+                self._backoff_scans + 1, self.MAX_BACKOFF_EXPONENT
+            )
+            # The first steady scan keeps the normal interval.
+            delay = min(
+                max_interval,
+                self.SCAN_INTERVAL * 2 ** (self._backoff_scans - 1),
+            )
+            self.date_next_scan = scan_start + delay
+        else:
+            self._backoff_scans = 0
+            self.date_next_scan = None
+
+    def _recordScanTimings(self, scan_start):
+        """Send scan duration and interval timings to statsd."""
+        now = self._clock.seconds()
+        labels = {
+            "builder_name": self.builder_name,
+            "phase": (self.scan_phase or "none").replace("BuilderStatus.", ""),
+        }
+        self.statsd_client.timing(
+            "builders.scan_duration", (now - scan_start) * 1000, labels=labels
+        )
+        if self._last_scan_start is not None:
+            self.statsd_client.timing(
+                "builders.scan_interval",
+                (scan_start - self._last_scan_start) * 1000,
+                labels=labels,
+            )
+        self._last_scan_start = scan_start
 
     def _scanFailed(self, retry, exc):
         """Deal with failures encountered during the scan cycle.
@@ -730,6 +947,10 @@ def scan(self):
         interactor = self.interactor_factory()
         worker = self.worker_factory(vitals)
         self.can_retry = True
+        self.scan_phase = None
+        if vitals.build_queue is not self._scanned_build_queue:
+            self._backoff_scans = 0
+        self._scanned_build_queue = vitals.build_queue
 
         if vitals.build_queue is not None:
             if vitals.clean_status != BuilderCleanStatus.DIRTY:
@@ -769,6 +990,10 @@ def scan(self):
                 return
 
             yield self.checkCancellation(vitals, worker)
+            if vitals.build_queue.status == BuildQueueStatus.CANCELLING:
+                self.scan_phase = "cancelling"
+            else:
+                self.scan_phase = worker_status.get("builder_status")
 
             # The worker and DB agree on the builder's state.  Scan the
             # worker and get the logtail, or collect the build if it's
@@ -2,17 +2,20 @@
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 __all__ = [
+    "BuildCandidate",
     "BuildQueue",
     "BuildQueueSet",
+    "builder_constraints_match",
 ]
 
 import json
 import logging
+from collections import namedtuple
 from datetime import datetime, timezone
 from itertools import groupby
 from operator import attrgetter
 
-from storm.expr import SQL, Cast, Coalesce, Desc, Exists, Or
+from storm.expr import SQL, Cast, Coalesce, Desc, Exists, LeftJoin, Or
 from storm.properties import Bool, DateTime, Int, TimeDelta, Unicode
 from storm.references import Reference
 from storm.store import Store
@@ -59,6 +62,41 @@ def specific_build_farm_job_sources():
     return job_sources
 
 
+# A compact summary of a pending `BuildQueue`, for matching against
+# builders without loading the whole row.
+BuildCandidate = namedtuple(
+    "BuildCandidate",
+    (
+        "id",
+        "lastscore",
+        "processor_name",
+        "virtualized",
+        "builder_constraints",
+    ),
+)
+
+
+def builder_constraints_match(
+    builder_constraints, open_resources, restricted_resources
+):
+    """Can a builder with these resources build a job with these constraints?
+
+    This must match the resource conditions used in
+    `BuildQueueSet.findBuildCandidates`.
+    """
+    builder_constraints = builder_constraints or ()
+    resources = (open_resources or ()) + (restricted_resources or ())
+    # All constraints on the build queue entry must be satisfied by the
+    # builder's resources, and if the builder has any restricted resources
+    # then the build queue entry must specify all of them.
+    return all(
+        constraint in resources for constraint in builder_constraints
+    ) and all(
+        resource in builder_constraints
+        for resource in restricted_resources or ()
+    )
+
+
 @implementer(IBuildQueue)
 class BuildQueue(StormBase):
     __storm_table__ = "BuildQueue"
@@ -296,20 +334,11 @@ def _getWorkerScannerLogger(self):
         logger = logging.getLogger("worker-scanner")
         return logger
 
-    def findBuildCandidates(
-        self,
-        processor,
-        virtualized,
-        limit,
-        open_resources=None,
-        restricted_resources=None,
-    ):
-        """See `IBuildQueueSet`."""
+    def _getJobTypeConditions(self):
+        """Return conditions applied by specific build farm job types."""
         # Circular import.
         from lp.buildmaster.model.buildfarmjob import BuildFarmJob
 
-        logger = self._getWorkerScannerLogger()
-
         job_type_conditions = []
         job_sources = specific_build_farm_job_sources()
         for job_type, job_source in job_sources.items():
@@ -318,6 +347,11 @@ def findBuildCandidates(
                 job_type_conditions.append(
                     Or(BuildFarmJob.job_type != job_type, Exists(SQL(query)))
                 )
+        return job_type_conditions
+
+    def getMinimumScore(self, processor_name):
+        """See `IBuildQueueSet`."""
+        logger = self._getWorkerScannerLogger()
 
         def get_int_feature_flag(flag):
             value_str = getFeatureFlag(flag)
@@ -327,12 +361,11 @@ def get_int_feature_flag(flag):
                 except ValueError:
                     logger.error("invalid %s: %s", flag, value_str)
 
-        score_conditions = []
         minimum_scores = set()
-        if processor is not None:
+        if processor_name is not None:
             minimum_scores.add(
                 get_int_feature_flag(
-                    "buildmaster.minimum_score.%s" % processor.name
+                    "buildmaster.minimum_score.%s" % processor_name
                 )
             )
         minimum_scores.add(get_int_feature_flag("buildmaster.minimum_score"))
@@ -341,10 +374,26 @@ def get_int_feature_flag(flag):
         # supported by this builder, use the highest of them.  This is a bit
         # weird and not completely ideal, but it's a safe conservative
         # option and avoids substantially complicating the candidate query.
-        if minimum_scores:
-            score_conditions.append(
-                BuildQueue.lastscore >= max(minimum_scores)
-            )
+        return max(minimum_scores) if minimum_scores else None
+
+    def findBuildCandidates(
+        self,
+        processor,
+        virtualized,
+        limit,
+        open_resources=None,
+        restricted_resources=None,
+    ):
+        """See `IBuildQueueSet`."""
+        # Circular import.
+        from lp.buildmaster.model.buildfarmjob import BuildFarmJob
+
+        score_conditions = []
+        minimum_score = self.getMinimumScore(
+            processor.name if processor is not None else None
+        )
+        if minimum_score is not None:
+            score_conditions.append(BuildQueue.lastscore >= minimum_score)
 
         builder_constraints = Coalesce(
             BuildQueue.builder_constraints, Cast("[]", "jsonb")
@@ -381,7 +430,7 @@ def get_int_feature_flag(flag):
                 BuildQueue.processor == processor,
                 BuildQueue.virtualized == virtualized,
                 BuildQueue.builder == None,
-                *job_type_conditions,
+                *self._getJobTypeConditions(),
                 *score_conditions,
                 *resource_conditions,
             )
@@ -389,3 +438,32 @@ def get_int_feature_flag(flag):
             # PrefetchedBuildCandidates._getSortKey.
             .order_by(Desc(BuildQueue.lastscore), BuildQueue.id)[:limit]
         )
+
+    def findAllBuildCandidates(self):
+        """See `IBuildQueueSet`."""
+        # Circular imports.
+        from lp.buildmaster.model.buildfarmjob import BuildFarmJob
+        from lp.buildmaster.model.processor import Processor
+
+        store = IStore(BuildQueue)
+        rows = store.using(
+            BuildQueue,
+            LeftJoin(Processor, Processor.id == BuildQueue.processor_id),
+            BuildFarmJob,
+        ).find(
+            (
+                BuildQueue.id,
+                BuildQueue.lastscore,
+                Processor.name,
+                BuildQueue.virtualized,
+                BuildQueue.builder_constraints,
+            ),
+            BuildFarmJob.id == BuildQueue._build_farm_job_id,
+            BuildQueue.status == BuildQueueStatus.WAITING,
+            BuildQueue.builder == None,
+            *self._getJobTypeConditions(),
+        )
+        # This must match the ordering used in
+        # PrefetchedBuildCandidates._getSortKey.
+        rows = rows.order_by(Desc(BuildQueue.lastscore), BuildQueue.id)
+        return [BuildCandidate(*row) for row in rows]
@@ -415,6 +415,55 @@ def test_findBuildCandidates_honours_minimum_score(self):
                 logger.output,
             )
 
+    def test_findAllBuildCandidates(self):
+        # BuildQueueSet.findAllBuildCandidates returns a summary of all
+        # waiting builds for all processors, highest score first.
+        processors = [self.factory.makeProcessor() for _ in range(2)]
+        bq1 = self.factory.makeBinaryPackageBuild(
+            processor=processors[0]
+        ).queueBuild()
+        bq2 = self.factory.makeBinaryPackageBuild(
+            processor=processors[1]
+        ).queueBuild()
+        bq3 = self.factory.makeBinaryPackageBuild(
+            processor=processors[1]
+        ).queueBuild()
+        bq1.manualScore(50000)
+        bq2.manualScore(100000)
+        bq3.manualScore(50000)
+        building = self.factory.makeBinaryPackageBuild(
+            processor=processors[0]
+        ).queueBuild()
+        building.markAsBuilding(self.builders[0])
+        candidates = [
+            candidate
+            for candidate in self.bq_set.findAllBuildCandidates()
+            if candidate.processor_name in {p.name for p in processors}
+        ]
+        self.assertEqual(
+            [
+                (bq.id, bq.lastscore, bq.processor.name, bq.virtualized, None)
+                for bq in (bq2, bq1, bq3)
+            ],
+            [tuple(candidate) for candidate in candidates],
+        )
+
+    def test_getMinimumScore(self):
+        processor = self.factory.makeProcessor()
+        self.assertIsNone(self.bq_set.getMinimumScore(processor.name))
+        self.assertIsNone(self.bq_set.getMinimumScore(None))
+        with FeatureFixture({"buildmaster.minimum_score": "1000"}):
+            self.assertEqual(1000, self.bq_set.getMinimumScore(None))
+            self.assertEqual(1000, self.bq_set.getMinimumScore(processor.name))
+        with FeatureFixture(
+            {
+                "buildmaster.minimum_score": "1000",
+                "buildmaster.minimum_score.%s" % processor.name: "2000",
+            }
+        ):
+            self.assertEqual(1000, self.bq_set.getMinimumScore(None))
+            self.assertEqual(2000, self.bq_set.getMinimumScore(processor.name))
+
 
 class TestFindBuildCandidatesPPABase(TestFindBuildCandidatesBase):
     ppa_joe_private = False
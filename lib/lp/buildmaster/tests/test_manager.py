@@ -3,6 +3,7 @@
 
 """Tests for the renovated worker scanner aka BuilddManager."""
 
+import datetime
 import os
 import signal
 import time
@@ -27,6 +28,7 @@
 )
 from lp.buildmaster.interactor import (
     BuilderInteractor,
+    BuilderVitals,
     BuilderWorker,
     extract_vitals_from_db,
     shut_down_default_process_pool,
@@ -39,15 +41,18 @@
 from lp.buildmaster.interfaces.buildqueue import IBuildQueueSet
 from lp.buildmaster.manager import (
     BUILDER_FAILURE_THRESHOLD,
+    BULK_CANDIDATE_SELECTION_FEATURE_FLAG,
     JOB_RESET_THRESHOLD,
     SCAN_FAILURE_THRESHOLD,
     BuilddManager,
     BuilderFactory,
+    BulkBuildCandidates,
     PrefetchedBuilderFactory,
     WorkerScanner,
     judge_failure,
     recover_failure,
 )
+from lp.buildmaster.model.buildqueue import BuildCandidate
 from lp.buildmaster.tests.harness import BuilddManagerTestSetup
 from lp.buildmaster.tests.mock_workers import (
     BrokenWorker,
@@ -65,6 +70,7 @@
 )
 from lp.registry.interfaces.distribution import IDistributionSet
 from lp.services.config import config
+from lp.services.features.testing import FeatureFixture
 from lp.services.log.logger import BufferLogger
 from lp.services.statsd.tests import StatsMixin
 from lp.soyuz.interfaces.binarypackagebuild import IBinaryPackageBuildSet
@@ -1125,6 +1131,204 @@ def test_acquireBuildCandidate_marks_building(self):
         self.assertEqual(BuildQueueStatus.RUNNING, candidate.status)
 
 
+class TestPrefetchedBuilderFactoryBulkCandidates(TestPrefetchedBuilderFactory):
+    """Test `PrefetchedBuilderFactory` with bulk candidate selection."""
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(
+            FeatureFixture({BULK_CANDIDATE_SELECTION_FEATURE_FLAG: "on"})
+        )
+
+    def test_uses_bulk_candidates(self):
+        pbf = PrefetchedBuilderFactory()
+        pbf.update()
+        self.assertIsInstance(pbf.candidates, BulkBuildCandidates)
+
+    def test_findBuildCandidate_prefetches_all_groups(self):
+        # The first call to findBuildCandidate fetches candidates for all
+        # builder groups, so later calls for other groups only need to
+        # fetch the candidate by ID.
+        dases = [self.factory.makeDistroArchSeries() for _ in range(2)]
+        builders = [
+            self.factory.makeBuilder(processors=[das.processor])
+            for das in dases
+        ]
+        builder_names = [builder.name for builder in builders]
+        bqs = [
+            self.factory.makeBinaryPackageBuild(
+                distroarchseries=das
+            ).queueBuild()
+            for das in dases
+        ]
+        transaction.commit()
+        pbf = PrefetchedBuilderFactory()
+        pbf.update()
+
+        self.assertEqual(
+            bqs[0], pbf.findBuildCandidate(pbf.getVitals(builder_names[0]))
+        )
+        transaction.abort()
+        with StormStatementRecorder() as recorder:
+            candidate = pbf.findBuildCandidate(pbf.getVitals(builder_names[1]))
+        self.assertEqual(bqs[1], candidate)
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+
+    def test_findBuildCandidate_honours_resources(self):
+        das = self.factory.makeDistroArchSeries()
+        builders = [
+            self.factory.makeBuilder(
+                processors=[das.processor],
+                open_resources=open_resources,
+                restricted_resources=restricted_resources,
+            )
+            for open_resources, restricted_resources in (
+                (None, None),
+                (None, None),
+                (["large"], None),
+                (["large"], None),
+                (["large"], None),
+                (None, ["gpu"]),
+                (None, ["gpu"]),
+            )
+        ]
+        repository_plain, repository_large, repository_gpu = (
+            self.factory.makeGitRepository(builder_constraints=constraints)
+            for constraints in (None, ["large"], ["gpu"])
+        )
+        bq_plain, bq_large, bq_gpu = (
+            self.factory.makeCIBuild(
+                git_repository=repository, distro_arch_series=das
+            ).queueBuild()
+            for repository in (
+                repository_plain,
+                repository_large,
+                repository_gpu,
+            )
+        )
+        transaction.commit()
+        pbf = PrefetchedBuilderFactory()
+        pbf.update()
+
+        # Unlike the per-group queues, the bulk candidate queues don't
+        # overlap: once a candidate has been found for one builder group,
+        # it isn't offered to other builder groups in the same scan cycle.
+        for builder, bq in zip(
+            builders, [bq_plain, None, bq_large, None, None, bq_gpu, None]
+        ):
+            self.assertEqual(
+                bq, pbf.findBuildCandidate(pbf.getVitals(builder.name))
+            )
+
+
+def make_vitals(name, processor_names, virtualized=True, **kwargs):
+    return BuilderVitals(*([None] * len(BuilderVitals._fields)))._replace(
+        name=name,
+        processor_names=processor_names,
+        virtualized=virtualized,
+        **kwargs,
+    )
+
+
+class TestBulkBuildCandidates(TestCase):
+    """Test matching build candidates to builders without the database."""
+
+    def makeCandidate(
+        self,
+        id,
+        lastscore,
+        processor_name="amd64",
+        virtualized=True,
+        builder_constraints=None,
+    ):
+        return BuildCandidate(
+            id, lastscore, processor_name, virtualized, builder_constraints
+        )
+
+    def makeBulkBuildCandidates(self, all_vitals, candidates, **scores):
+        bulk_candidates = BulkBuildCandidates(all_vitals)
+        minimum_scores = {
+            processor_name: scores.get(processor_name)
+            for processor_name, _, _, _ in bulk_candidates.builder_groups
+        }
+        bulk_candidates._addAllCandidates(
+            sorted(candidates, key=bulk_candidates._getSortKey),
+            minimum_scores,
+        )
+        return bulk_candidates
+
+    def popAll(self, bulk_candidates, vitals):
+        ids = []
+        while True:
+            candidate_id = bulk_candidates._popCandidateID(vitals)
+            if candidate_id is None:
+                return ids
+            ids.append(candidate_id)
+
+    def test_orders_by_score_and_id(self):
+        vitals = make_vitals("builder", ["amd64"])
+        bulk_candidates = self.makeBulkBuildCandidates(
+            [vitals],
+            [
+                self.makeCandidate(1, 10),
+                self.makeCandidate(2, 20),
+                self.makeCandidate(3, 10),
+                self.makeCandidate(4, 10, processor_name=None),
+            ],
+        )
+        self.assertEqual([2, 1, 3, 4], self.popAll(bulk_candidates, vitals))
+
+    def test_matches_processor_and_virtualization(self):
+        amd64_virt = make_vitals("amd64-virt", ["amd64"])
+        amd64_nonvirt = make_vitals("amd64-nonvirt", ["amd64"], False)
+        multi = make_vitals("multi", ["amd64", "arm64"])
+        bulk_candidates = self.makeBulkBuildCandidates(
+            [amd64_virt, amd64_nonvirt, multi],
+            [
+                self.makeCandidate(1, 10),
+                self.makeCandidate(2, 20, virtualized=False),
+                self.makeCandidate(3, 30, processor_name="arm64"),
+                self.makeCandidate(4, 40, processor_name="riscv64"),
+                self.makeCandidate(5, 50),
+            ],
+        )
+        self.assertEqual([5, 1], self.popAll(bulk_candidates, amd64_virt))
+        self.assertEqual([3], self.popAll(bulk_candidates, multi))
+        self.assertEqual([2], self.popAll(bulk_candidates, amd64_nonvirt))
+
+    def test_honours_resources(self):
+        plain = make_vitals("plain", ["amd64"])
+        large = make_vitals("large", ["amd64"], open_resources=("large",))
+        gpu = make_vitals("gpu", ["amd64"], restricted_resources=("gpu",))
+        bulk_candidates = self.makeBulkBuildCandidates(
+            [plain, large, gpu],
+            [
+                self.makeCandidate(1, 10),
+                self.makeCandidate(2, 20, builder_constraints=["large"]),
+                self.makeCandidate(3, 30, builder_constraints=["gpu"]),
+                self.makeCandidate(
+                    4, 40, builder_constraints=["gpu", "large"]
+                ),
+            ],
+        )
+        self.assertEqual([3], self.popAll(bulk_candidates, gpu))
+        self.assertEqual([2, 1], self.popAll(bulk_candidates, large))
+        self.assertEqual([], self.popAll(bulk_candidates, plain))
+
+    def test_honours_minimum_scores(self):
+        vitals = make_vitals("builder", ["amd64", "arm64"])
+        bulk_candidates = self.makeBulkBuildCandidates(
+            [vitals],
+            [
+                self.makeCandidate(1, 10),
+                self.makeCandidate(2, 20),
+                self.makeCandidate(3, 10, processor_name="arm64"),
+            ],
+            amd64=15,
+        )
+        self.assertEqual([2, 3], self.popAll(bulk_candidates, vitals))
+
+
 class FakeBuilddManager:
     """A minimal fake version of `BuilddManager`."""
 
@@ -1148,6 +1352,7 @@ def getScanner(
         interactor=None,
         worker=None,
         behaviour=None,
+        clock=None,
     ):
         if builder_factory is None:
             builder_factory = MockBuilderFactory(
@@ -1165,11 +1370,65 @@ def getScanner(
             builder_factory,
             FakeBuilddManager(),
             BufferLogger(),
+            clock=clock,
             interactor_factory=FakeMethod(interactor),
             worker_factory=FakeMethod(worker),
             behaviour_factory=FakeMethod(behaviour),
         )
 
+    def getBuildingScanner(self, clock):
+        worker = BuildingWorker("trivial")
+        bq = FakeBuildQueue("trivial")
+        builder_factory = MockBuilderFactory(MockBuilder(), bq)
+        # Never skip scans because of a stale builder factory.
+        builder_factory.date_updated = datetime.datetime.max
+        scanner = self.getScanner(
+            builder_factory=builder_factory, worker=worker, clock=clock
+        )
+        return scanner, worker, bq
+
+    @defer.inlineCallbacks
+    def scanEvery(self, scanner, clock, times):
+        for _ in range(times):
+            yield scanner.singleCycle()
+            clock.advance(scanner.SCAN_INTERVAL)
+
+    @defer.inlineCallbacks
+    def test_steady_builds_scanned_every_cycle_by_default(self):
+        clock = task.Clock()
+        scanner, worker, _ = self.getBuildingScanner(clock)
+        yield self.scanEvery(scanner, clock, 4)
+        self.assertEqual(["status"] * 4, worker.call_log)
+
+    @defer.inlineCallbacks
+    def test_steady_builds_back_off(self):
+        # Scans of a builder that is steadily building the same job back
+        # off exponentially up to max_scan_interval.
+        self.pushConfig("builddmaster", max_scan_interval=60)
+        clock = task.Clock()
+        scanner, worker, _ = self.getBuildingScanner(clock)
+        scanned_at = []
+        for _ in range(12):
+            call_count = len(worker.call_log)
+            yield scanner.singleCycle()
+            if len(worker.call_log) > call_count:
+                scanned_at.append(clock.seconds())
+            clock.advance(scanner.SCAN_INTERVAL)
+        self.assertEqual([0, 15, 45, 105, 165], scanned_at)
+
+    @defer.inlineCallbacks
+    def test_cancellation_interrupts_backoff(self):
+        self.pushConfig("builddmaster", max_scan_interval=60)
+        clock = task.Clock()
+        scanner, worker, bq = self.getBuildingScanner(clock)
+        yield self.scanEvery(scanner, clock, 2)
+        yield scanner.singleCycle()
+        self.assertEqual(["status"] * 2, worker.call_log)
+        bq.id = 1
+        bq.status = BuildQueueStatus.CANCELLING
+        yield scanner.singleCycle()
+        self.assertEqual(["status"] * 3 + ["abort"], worker.call_log)
+
     @defer.inlineCallbacks
     def test_scan_with_job(self):
         # WorkerScanner.scan calls updateBuild() when a job is building.
@@ -7,8 +7,11 @@
     "GitAPI",
 ]
 
+import hashlib
 import logging
 import sys
+import threading
+import time
 import uuid
 import xmlrpc.client  # nosec B411
 from urllib.parse import quote
@@ -23,6 +26,7 @@
 from zope.security.interfaces import Unauthorized
 from zope.security.proxy import removeSecurityProxy
 
+from lp.app.enums import PUBLIC_INFORMATION_TYPES
 from lp.app.errors import NameLookupFailed
 from lp.app.validators import LaunchpadValidationError
 from lp.code.enums import (
@@ -58,6 +62,7 @@
 from lp.registry.interfaces.sourcepackagename import ISourcePackageNameSet
 from lp.services.auth.enums import AccessTokenScope
 from lp.services.auth.interfaces import IAccessTokenSet
+from lp.services.config import config
 from lp.services.features import getFeatureFlag
 from lp.services.identity.interfaces.account import AccountStatus
 from lp.services.macaroons.interfaces import (
@@ -65,6 +70,7 @@
     IMacaroonIssuer,
     IMacaroonVerificationResult,
 )
+from lp.services.macaroons.model import MacaroonVerificationResult
 from lp.services.webapp import LaunchpadXMLRPCView, canonical_url
 from lp.services.webapp.authorization import check_permission
 from lp.services.webapp.errorlog import ScriptRequest
@@ -73,6 +79,67 @@
 
 GIT_ASYNC_CREATE_REPO = "git.codehosting.async-create.enabled"
 
+# Translations of paths to public repositories for anonymous readers, and
+# the issuers of successfully-verified macaroons, are cached in each
+# process for codehosting.git_translate_path_cache_lifetime seconds.
+# Each cache is emptied if it grows beyond this many entries.
+MAX_CACHE_SIZE = 10000
+_anonymous_translations = {}
+_verified_macaroons = {}
+_cache_lock = threading.Lock()
+
+
+def _get_cached(cache, key):
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        value, expiry_time = entry
+        if time.monotonic() >= expiry_time:
+            del cache[key]
+            return None
+        return value
+
+
+def _set_cached(cache, key, value):
+    expiry_time = (
+        time.monotonic() + config.codehosting.git_translate_path_cache_lifetime
+    )
+    with _cache_lock:
+        if len(cache) >= MAX_CACHE_SIZE:
+            cache.clear()
+        cache[key] = (value, expiry_time)
+
+
+def clear_git_api_caches():
+    """Forget all cached path translations and macaroon verifications."""
+    with _cache_lock:
+        _anonymous_translations.clear()
+        _verified_macaroons.clear()
+
+
+def _get_anonymous_translation_state(repository):
+    """Return everything that affects anonymous translations of a path.
+
+    A cached anonymous translation of a path to this repository is only
+    used while this is unchanged, so changes to the repository's privacy,
+    name, owner, target, default status, or status take effect at once.
+    Changes elsewhere (such as renaming the owner) take effect when the
+    cached translation expires.
+    """
+    return (
+        repository.information_type,
+        repository.status,
+        repository.name,
+        repository.owner_id,
+        repository.project_id,
+        repository.distribution_id,
+        repository.sourcepackagename_id,
+        repository.oci_project_id,
+        repository.owner_default,
+        repository.target_default,
+    )
+
 
 def _get_requester_id(auth_params):
     """Get the requester ID from authentication parameters.
@@ -146,6 +213,18 @@ def __init__(self, *args, **kwargs):
         self.repository_set = getUtility(IGitRepositorySet)
 
     def _verifyMacaroon(self, macaroon_raw, repository=None, user=None):
+        cache_key = None
+        if config.codehosting.git_translate_path_cache_lifetime:
+            cache_key = (
+                hashlib.sha256(six.ensure_binary(macaroon_raw)).hexdigest(),
+                None if repository is None else repository.id,
+                None if user is None else user.id,
+            )
+            issuer_name = _get_cached(_verified_macaroons, cache_key)
+            if issuer_name is not None:
+                verified = MacaroonVerificationResult(issuer_name)
+                verified.user = NO_USER if user is None else user
+                return verified
         try:
             macaroon = Macaroon.deserialize(macaroon_raw)
         # XXX cjwatson 2019-04-23: Restrict exceptions once
@@ -169,6 +248,10 @@ def _verifyMacaroon(self, macaroon_raw, repository=None, user=None):
             else:
                 if verified.user != user:
                     raise faults.Unauthorized()
+            if cache_key is not None:
+                _set_cached(
+                    _verified_macaroons, cache_key, verified.issuer_name
+                )
         return verified
 
     def _verifyAccessToken(
@@ -513,14 +596,58 @@ def _createRepository(self, requester, path, clone_from=None):
             transaction.abort()
             raise
 
+    def _getCachedAnonymousTranslation(self, path):
+        """Return a cached anonymous read translation of 'path', or None."""
+        cached = _get_cached(_anonymous_translations, path)
+        if cached is None:
+            return None
+        repository_id, state, result = cached
+        repository = getUtility(IGitLookup).get(repository_id)
+        if repository is None or state != _get_anonymous_translation_state(
+            removeSecurityProxy(repository)
+        ):
+            return None
+        return dict(result)
+
+    def _cacheAnonymousTranslation(self, path, repository, result):
+        """Cache an anonymous read translation of a public repository."""
+        if (
+            repository.information_type not in PUBLIC_INFORMATION_TYPES
+            or repository.status != GitRepositoryStatus.AVAILABLE
+            or not result["readable"]
+        ):
+            return
+        _set_cached(
+            _anonymous_translations,
+            path,
+            (
+                repository.id,
+                _get_anonymous_translation_state(repository),
+                dict(result),
+            ),
+        )
+
     @return_fault
     def _translatePath(self, requester, path, permission, auth_params):
         if requester == LAUNCHPAD_ANONYMOUS:
             requester = None
+        use_cache = (
+            config.codehosting.git_translate_path_cache_lifetime
+            and requester is None
+            and permission == "read"
+            and auth_params.get("macaroon") is None
+            and auth_params.get("access-token") is None
+        )
+        if use_cache:
+            result = self._getCachedAnonymousTranslation(path)
+            if result is not None:
+                return result
         try:
             repo, result = self._performLookup(requester, path, auth_params)
             if repo and repo.status == GitRepositoryStatus.CREATING:
                 raise faults.GitRepositoryBeingCreated(path)
+            if use_cache and result is not None:
+                self._cacheAnonymousTranslation(path, repo, result)
 
             if (
                 result is None
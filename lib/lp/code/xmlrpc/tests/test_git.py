@@ -47,7 +47,11 @@
 )
 from lp.code.model.gitjob import GitRefScanJob
 from lp.code.tests.helpers import GitHostingFixture
-from lp.code.xmlrpc.git import GIT_ASYNC_CREATE_REPO
+from lp.code.xmlrpc.git import (
+    GIT_ASYNC_CREATE_REPO,
+    GitAPI,
+    clear_git_api_caches,
+)
 from lp.crafts.interfaces.craftrecipe import (
     CRAFT_RECIPE_ALLOW_CREATE,
     CRAFT_RECIPE_PRIVATE_FEATURE_FLAG,
@@ -1744,6 +1748,106 @@ def test_translatePath_anonymous_public_repository(self):
             None, path, repository, can_authenticate=True, writable=False
         )
 
+    def enableTranslatePathCache(self):
+        self.pushConfig("codehosting", git_translate_path_cache_lifetime=60)
+        clear_git_api_caches()
+        self.addCleanup(clear_git_api_caches)
+
+    def test_translatePath_anonymous_public_repository_cached(self):
+        # With git_translate_path_cache_lifetime set, anonymous
+        # translations of paths to public repositories are cached.
+        self.enableTranslatePathCache()
+        repository = self.factory.makeGitRepository()
+        path = "/%s" % repository.unique_name
+        self.assertTranslates(None, path, repository)
+        self.patch(GitAPI, "_performLookup", lambda *args: (None, None))
+        self.assertTranslates(None, path, repository)
+        # Other requesters don't use the cache.
+        self.assertGitRepositoryNotFound(self.factory.makePerson(), path)
+
+    def test_translatePath_anonymous_cache_checks_privacy(self):
+        # A cached anonymous translation is not used once the repository
+        # becomes private.
+        self.enableTranslatePathCache()
+        repository = removeSecurityProxy(self.factory.makeGitRepository())
+        path = "/%s" % repository.unique_name
+        self.assertTranslates(None, path, repository)
+        repository.transitionToInformationType(
+            InformationType.PRIVATESECURITY,
+            repository.owner,
+            verify_policy=False,
+        )
+        self.assertGitRepositoryNotFound(None, path)
+
+    def test_translatePath_anonymous_cache_checks_name(self):
+        # A cached anonymous translation is not used once the repository
+        # is renamed.
+        self.enableTranslatePathCache()
+        repository = removeSecurityProxy(self.factory.makeGitRepository())
+        path = "/%s" % repository.unique_name
+        self.assertTranslates(None, path, repository)
+        repository.setName("renamed", repository.owner)
+        self.assertGitRepositoryNotFound(None, path)
+
+    def test_translatePath_anonymous_private_repository_not_cached(self):
+        self.enableTranslatePathCache()
+        owner = self.factory.makePerson()
+        repository = removeSecurityProxy(
+            self.factory.makeGitRepository(
+                owner=owner, information_type=InformationType.USERDATA
+            )
+        )
+        path = "/%s" % repository.unique_name
+        self.assertTranslates(
+            owner, path, repository, writable=True, private=True
+        )
+        self.assertGitRepositoryNotFound(None, path)
+
+    def test_translatePath_user_macaroon_cached(self):
+        # With git_translate_path_cache_lifetime set, successful macaroon
+        # verifications are cached.
+        self.enableTranslatePathCache()
+        self.pushConfig("codehosting", git_macaroon_secret_key="some-secret")
+        requester = self.factory.makePerson()
+        repository = self.factory.makeGitRepository(owner=requester)
+        issuer = removeSecurityProxy(
+            getUtility(IMacaroonIssuer, "git-repository")
+        )
+        with person_logged_in(requester):
+            macaroon = issuer.issueMacaroon(repository, user=requester)
+            path = "/%s" % repository.unique_name
+        self.assertTranslates(
+            requester,
+            path,
+            repository,
+            permission="write",
+            macaroon_raw=macaroon.serialize(),
+            writable=True,
+        )
+        self.patch(
+            type(issuer), "verifyMacaroon", lambda *args, **kwargs: False
+        )
+        login(ANONYMOUS)
+        self.assertTranslates(
+            requester,
+            path,
+            repository,
+            permission="write",
+            macaroon_raw=macaroon.serialize(),
+            writable=True,
+        )
+        # The cached result only applies to the same macaroon, repository,
+        # and user.
+        other_repository = self.factory.makeGitRepository(owner=requester)
+        with person_logged_in(requester):
+            other_path = "/%s" % other_repository.unique_name
+        self.assertUnauthorized(
+            requester,
+            other_path,
+            permission="write",
+            macaroon_raw=macaroon.serialize(),
+        )
+
     def test_translatePath_owned(self):
         requester = self.factory.makePerson()
         repository = self.factory.makeGitRepository(owner=requester)
@@ -4,7 +4,9 @@
 """Implementation of the dynamic RewriteMap used to serve branches over HTTP.
 """
 
+import hashlib
 import time
+from collections import OrderedDict
 
 from breezy import urlutils
 from zope.component import getUtility
@@ -14,6 +16,8 @@
 from lp.code.interfaces.codehosting import BRANCH_ID_ALIAS_PREFIX
 from lp.codehosting.vfs import branch_id_to_path
 from lp.services.config import config
+from lp.services.memcache.interfaces import IMemcacheClient
+from lp.services.statsd.interfaces.statsd_client import IStatsdClient
 from lp.services.utils import iter_split
 from lp.services.webapp.adapter import (
     clear_request_started,
@@ -36,26 +40,90 @@ def __init__(self, logger, _now=None):
         else:
             self._now = _now
         self.logger = logger
-        self._cache = {}
+        # Maps branch unique names to (branch_id, inserted_time), and
+        # ("NOT-FOUND", location) to (None, inserted_time) for locations
+        # that did not match a branch; least recently used first.
+        self._cache = OrderedDict()
 
     def _codebrowse_url(self, path):
         return urlutils.join(config.codehosting.internal_codebrowse_root, path)
 
+    def _getCached(self, key, lifetime):
+        """Return the cached (branch_id, inserted_time) for 'key'.
+
+        Returns None if there is no entry younger than 'lifetime' seconds.
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if self._now() >= entry[1] + lifetime:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _setCached(self, key, branch_id, inserted_time):
+        """Cache 'branch_id' for 'key', evicting old entries if necessary."""
+        self._cache[key] = (branch_id, inserted_time)
+        self._cache.move_to_end(key)
+        while len(self._cache) > config.codehosting.branch_rewrite_cache_size:
+            self._cache.popitem(last=False)
+
+    def _getMemcacheKey(self, unique_name):
+        # Hash the unique name, since paths from requests may be too long
+        # or contain characters that memcached does not allow in keys.
+        return (
+            "%s:branch-rewrite:%s"
+            % (
+                config.instance_name,
+                hashlib.sha1(unique_name.encode("UTF-8")).hexdigest(),
+            )
+        ).encode("UTF-8")
+
+    def _getFromMemcache(self, location):
+        """Look up 'location' in the cache shared with other rewriters.
+
+        :return: A tuple of branch id and trailing path, or None.
+        """
+        memcache_client = getUtility(IMemcacheClient)
+        lifetime = config.codehosting.branch_rewrite_cache_lifetime
+        for first, second in iter_split(location[1:], "/"):
+            entry = memcache_client.get_json(
+                self._getMemcacheKey(first),
+                self.logger,
+                "branch rewrite for %s" % first,
+            )
+            if entry is None:
+                continue
+            branch_id, inserted_time = entry
+            if self._now() < inserted_time + lifetime:
+                self._setCached(first, branch_id, inserted_time)
+                return branch_id, second
+        return None
+
     def _getBranchIdAndTrailingPath(self, location):
         """Return the branch id and trailing path for 'location'.
 
         In addition this method returns whether the answer can from the cache
         or from the database.
         """
+        lifetime = config.codehosting.branch_rewrite_cache_lifetime
         for first, second in iter_split(location[1:], "/"):
-            if first in self._cache:
-                branch_id, inserted_time = self._cache[first]
-                if (
-                    self._now()
-                    < inserted_time
-                    + config.codehosting.branch_rewrite_cache_lifetime
-                ):
-                    return branch_id, second, "HIT"
+            entry = self._getCached(first, lifetime)
+            if entry is not None:
+                return entry[0], second, "HIT"
+        negative_lifetime = (
+            config.codehosting.branch_rewrite_negative_cache_lifetime
+        )
+        if negative_lifetime:
+            entry = self._getCached(("NOT-FOUND", location), negative_lifetime)
+            if entry is not None:
+                return None, None, "HIT"
+        use_memcache = config.codehosting.branch_rewrite_use_memcache
+        if use_memcache:
+            found = self._getFromMemcache(location)
+            if found is not None:
+                return found + ("MEMCACHE",)
         lookup = getUtility(IBranchLookup)
         branch, trailing = lookup.getByHostingPath(location.lstrip("/"))
         if branch is not None:
@@ -65,8 +133,18 @@ def _getBranchIdAndTrailingPath(self, location):
                 pass
             else:
                 unique_name = location[1 : -len(trailing)]
-                self._cache[unique_name] = (branch_id, self._now())
+                inserted_time = self._now()
+                self._setCached(unique_name, branch_id, inserted_time)
+                if use_memcache:
+                    getUtility(IMemcacheClient).set_json(
+                        self._getMemcacheKey(unique_name),
+                        [branch_id, inserted_time],
+                        expire=int(lifetime),
+                        logger=self.logger,
+                    )
                 return branch_id, trailing, "MISS"
+        if negative_lifetime:
+            self._setCached(("NOT-FOUND", location), None, self._now())
         return None, None, "MISS"
 
     def rewriteLine(self, resource_location):
@@ -130,6 +208,11 @@ def rewriteLine(self, resource_location):
                         r = self._codebrowse_url(resource_location)
         finally:
             clear_request_started()
+        if cached != "N/A":
+            getUtility(IStatsdClient).incr(
+                "codehosting.branch_rewrite.cache",
+                labels={"result": cached.lower()},
+            )
         self.logger.info(
             "%r -> %r (%fs, cache: %s)",
             resource_location,
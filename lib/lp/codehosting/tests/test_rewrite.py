@@ -17,6 +17,8 @@
 from lp.codehosting.vfs import branch_id_to_path
 from lp.services.config import config
 from lp.services.log.logger import BufferLogger
+from lp.services.memcache.testing import MemcacheFixture
+from lp.services.statsd.tests import StatsMixin
 from lp.testing import (
     FakeTime,
     TestCase,
@@ -28,7 +30,7 @@
 from lp.testing.layers import DatabaseFunctionalLayer, DatabaseLayer
 
 
-class TestBranchRewriter(TestCaseWithFactory):
+class TestBranchRewriter(StatsMixin, TestCaseWithFactory):
     layer = DatabaseFunctionalLayer
 
     def setUp(self):
@@ -246,6 +248,102 @@ def test_getBranchIdAndTrailingPath_cached(self):
         )
         self.assertEqual(id_path + ("HIT",), result)
 
+    def test_cache_evicts_least_recently_used(self):
+        # Only branch_rewrite_cache_size mappings are cached; the least
+        # recently used mapping is evicted first.
+        self.pushConfig("codehosting", branch_rewrite_cache_size=2)
+        rewriter = self.makeRewriter()
+        branches = [self.factory.makeAnyBranch() for _ in range(3)]
+        transaction.commit()
+        paths = ["/%s/.bzr/README" % branch.unique_name for branch in branches]
+        rewriter._getBranchIdAndTrailingPath(paths[0])
+        rewriter._getBranchIdAndTrailingPath(paths[1])
+        self.assertEqual(
+            "HIT", rewriter._getBranchIdAndTrailingPath(paths[0])[2]
+        )
+        rewriter._getBranchIdAndTrailingPath(paths[2])
+        self.assertEqual(2, len(rewriter._cache))
+        self.assertEqual(
+            ["HIT", "MISS"],
+            [
+                rewriter._getBranchIdAndTrailingPath(path)[2]
+                for path in paths[:2]
+            ],
+        )
+
+    def test_negative_cache(self):
+        # Locations that do not match a branch are cached for
+        # branch_rewrite_negative_cache_lifetime seconds.
+        self.pushConfig(
+            "codehosting", branch_rewrite_negative_cache_lifetime=5
+        )
+        rewriter = self.makeRewriter()
+        path = "/~nouser/noproduct"
+        self.assertEqual(
+            (None, None, "MISS"), rewriter._getBranchIdAndTrailingPath(path)
+        )
+        self.assertEqual(
+            (None, None, "HIT"), rewriter._getBranchIdAndTrailingPath(path)
+        )
+        self.fake_time.advance(5)
+        self.assertEqual(
+            (None, None, "MISS"), rewriter._getBranchIdAndTrailingPath(path)
+        )
+
+    def test_negative_cache_disabled(self):
+        rewriter = self.makeRewriter()
+        path = "/~nouser/noproduct"
+        rewriter._getBranchIdAndTrailingPath(path)
+        self.assertEqual(
+            (None, None, "MISS"), rewriter._getBranchIdAndTrailingPath(path)
+        )
+
+    def test_memcache_shares_mappings(self):
+        # With branch_rewrite_use_memcache set, a mapping looked up by one
+        # rewriter is available to others without a database query.
+        self.useFixture(MemcacheFixture())
+        self.pushConfig("codehosting", branch_rewrite_use_memcache=True)
+        branch = self.factory.makeAnyBranch()
+        transaction.commit()
+        path = "/%s/.bzr/README" % branch.unique_name
+        expected = (branch.id, "/.bzr/README")
+        self.assertEqual(
+            expected + ("MISS",),
+            self.makeRewriter()._getBranchIdAndTrailingPath(path),
+        )
+        rewriter = self.makeRewriter()
+        self.assertEqual(
+            expected + ("MEMCACHE",),
+            rewriter._getBranchIdAndTrailingPath(path),
+        )
+        self.assertEqual(
+            expected + ("HIT",), rewriter._getBranchIdAndTrailingPath(path)
+        )
+        # Shared mappings expire at the same time as local ones.
+        self.fake_time.advance(
+            config.codehosting.branch_rewrite_cache_lifetime
+        )
+        self.assertEqual(
+            expected + ("MISS",),
+            self.makeRewriter()._getBranchIdAndTrailingPath(path),
+        )
+
+    def test_rewriteLine_reports_cache_results(self):
+        self.setUpStats()
+        rewriter = self.makeRewriter()
+        branch = self.factory.makeAnyBranch()
+        transaction.commit()
+        rewriter.rewriteLine("/" + branch.unique_name + "/.bzr/README")
+        rewriter.rewriteLine("/" + branch.unique_name + "/.bzr/README")
+        rewriter.rewriteLine("/static/foo")
+        self.assertEqual(
+            [
+                "codehosting.branch_rewrite.cache,env=test,result=miss",
+                "codehosting.branch_rewrite.cache,env=test,result=hit",
+            ],
+            self.filterStatsdCallsByName("codehosting.branch_rewrite"),
+        )
+
     def test_branch_id_alias_private(self):
         # Private branches are not found at all (this is for anonymous access)
         owner = self.factory.makePerson()
@@ -232,6 +232,20 @@ class BulkPruner(TunableLoop):
     # See `TunableLoop`. May be overridden.
     maximum_chunk_size = 10000
 
+    @classmethod
+    def estimateBacklog(cls):
+        """Estimate how many rows this pruner will have to process.
+
+        This is the query planner's estimate of the number of rows
+        returned by `ids_to_prune_query`, so it is cheap to calculate
+        but may be inaccurate.
+        """
+        store = IPrimaryStore(cls.target_table_class)
+        plan = store.execute(
+            "EXPLAIN (FORMAT JSON) %s" % cls.ids_to_prune_query
+        ).get_one()[0]
+        return plan[0]["Plan"]["Plan Rows"]
+
     def getStore(self):
         """The primary Store for the table we are pruning.
 
@@ -246,6 +260,7 @@ def __init__(self, log, abort_time=None):
 
         self.store = self.getStore()
         self.target_table_name = self.target_table_class.__storm_table__
+        self.total_processed = 0
 
         self._unique_counter += 1
         self.cursor_name = (
@@ -259,7 +274,17 @@ def __init__(self, log, abort_time=None):
             % (self.cursor_name, self.ids_to_prune_query)
         )
 
-    _num_removed = None
+    _last_num_removed = None
+
+    @property
+    def _num_removed(self):
+        """The number of rows processed by the last iteration."""
+        return self._last_num_removed
+
+    @_num_removed.setter
+    def _num_removed(self, num_removed):
+        self._last_num_removed = num_removed
+        self.total_processed += num_removed
 
     def isDone(self):
         """See `ITunableLoop`."""
@@ -290,6 +315,120 @@ def cleanUp(self):
         self.store.execute("CLOSE %s" % self.cursor_name)
 
 
+class KeysetPruner(TunableLoop):
+    """An abstract ITunableLoop base class for pruners of huge tables.
+
+    `BulkPruner` calculates the full list of items to remove before it
+    removes any of them, and the database server holds that list until
+    the pruner finishes.  With a huge backlog this is slow to start and
+    expensive to keep.
+
+    Instead, this implementation walks the target table in ascending
+    order of its key, one batch of rows per iteration, and removes the
+    rows in each batch that match `prune_condition`.  Pruning starts
+    immediately and no state is kept on the server between iterations,
+    but every row in the table is visited, so this is best suited to
+    conditions that would need to scan most of the table anyway.
+    """
+
+    # The Storm database class for the table we are removing records
+    # from. Must be overridden.
+    target_table_class = None
+
+    # The column name in target_table we use as the key. It must be
+    # unique and indexed. May be overridden.
+    target_table_key = "id"
+
+    # An SQL condition that is true for rows of target_table that
+    # should be removed. Must be overridden.
+    prune_condition = None
+
+    # See `TunableLoop`. May be overridden.
+    maximum_chunk_size = 10000
+
+    @classmethod
+    def estimateBacklog(cls):
+        """Estimate how many rows this pruner will remove.
+
+        This is the query planner's estimate of the number of rows
+        matching `prune_condition`, so it is cheap to calculate but may
+        be inaccurate.
+        """
+        store = IPrimaryStore(cls.target_table_class)
+        plan = store.execute(
+            "EXPLAIN (FORMAT JSON) SELECT 1 FROM %s WHERE %s"
+            % (cls.target_table_class.__storm_table__, cls.prune_condition)
+        ).get_one()[0]
+        return plan[0]["Plan"]["Plan Rows"]
+
+    def getStore(self):
+        """The primary Store for the table we are pruning.
+
+        May be overridden.
+        """
+        return IPrimaryStore(self.target_table_class)
+
+    def __init__(self, log, abort_time=None):
+        super().__init__(log, abort_time)
+
+        self.store = self.getStore()
+        self.target_table_name = self.target_table_class.__storm_table__
+        self.total_processed = 0
+
+        # The largest key in the last batch, or None before the first
+        # batch.
+        self.last_key = None
+        self.done = False
+
+    def isDone(self):
+        """See `ITunableLoop`."""
+        return self.done
+
+    def __call__(self, chunk_size):
+        """See `ITunableLoop`."""
+        if self.last_key is None:
+            after_last_key, params = "TRUE", ()
+        else:
+            after_last_key = "%s > ?" % self.target_table_key
+            params = (self.last_key,)
+        last_key, num_removed = self.store.execute(
+            """
+            WITH batch AS (
+                SELECT %(key)s FROM %(table)s
+                WHERE %(after_last_key)s
+                ORDER BY %(key)s
+                LIMIT ?),
+            removed AS (
+                DELETE FROM %(table)s
+                WHERE
+                    %(key)s IN (SELECT %(key)s FROM batch)
+                    AND (%(condition)s)
+                RETURNING 1)
+            SELECT
+                (SELECT max(%(key)s) FROM batch),
+                (SELECT count(*) FROM removed)
+            """
+            % {
+                "key": self.target_table_key,
+                "table": self.target_table_name,
+                "after_last_key": after_last_key,
+                "condition": self.prune_condition,
+            },
+            params + (int(chunk_size + 0.5),),
+        ).get_one()
+        if last_key is None:
+            self.done = True
+        else:
+            self.last_key = last_key
+            self.total_processed += num_removed
+        transaction.commit()
+
+    def cleanUp(self):
+        """See `ITunableLoop`."""
+        # No state is held between iterations, so there is nothing to
+        # clean up.
+
+
 class LoginTokenPruner(BulkPruner):
     """Remove old LoginToken rows.
 
@@ -448,6 +587,7 @@ class UnlinkedAccountPruner(BulkPruner):
 class BugSummaryJournalRollup(TunableLoop):
     """Rollup BugSummaryJournal rows into BugSummary."""
 
+    tables = {"bugsummary", "bugsummaryjournal"}
     maximum_chunk_size = 5000
 
     def __init__(self, log, abort_time=None):
@@ -1052,11 +1192,13 @@ def __call__(self, chunk_size):
 
 
 class PersonPruner(TunableLoop):
+    tables = {"emailaddress", "person", "teamparticipation"}
     maximum_chunk_size = 1000
 
     def __init__(self, log, abort_time=None):
         super().__init__(log, abort_time)
         self.offset = 1
+        self.total_processed = 0
         self.store = IPrimaryStore(Person)
         self.log.debug("Creating LinkedPeople temporary table.")
         self.store.execute(
@@ -1201,6 +1343,7 @@ def __call__(self, chunk_size):
                 % people_ids
             )
             transaction.commit()
+            self.total_processed += len(people_ids.split(","))
             self.log.debug(
                 "Deleted the following unlinked people: %s" % people_ids
             )
@@ -1367,6 +1510,7 @@ class SnapBuildJobPruner(BulkPruner):
 class WebhookJobPruner(TunableLoop):
     """Prune `WebhookJobs` that finished more than a month ago."""
 
+    tables = {"job", "webhookjob"}
     maximum_chunk_size = 5000
 
     @property
@@ -1395,6 +1539,7 @@ def isDone(self):
 class BugHeatUpdater(TunableLoop):
     """A `TunableLoop` for bug heat calculations."""
 
+    tables = {"bug"}
     maximum_chunk_size = 5000
 
     def __init__(self, log, abort_time=None):
@@ -1443,6 +1588,7 @@ def __call__(self, chunk_size):
             heat=SQL("calculate_bug_heat(Bug.id)"), heat_last_updated=UTC_NOW
         )
         transaction.commit()
+        self.total_processed += len(outdated_bug_ids)
 
 
 class BugWatchActivityPruner(BulkPruner):
@@ -1552,6 +1698,7 @@ def __call__(self, chunk_size):
 class UnusedPOTMsgSetPruner(TunableLoop):
     """Cleans up unused POTMsgSets."""
 
+    tables = {"potmsgset", "translationmessage", "translationtemplateitem"}
     done = False
     offset = 0
     maximum_chunk_size = 50000
@@ -1854,8 +2001,6 @@ class ArchiveSubscriptionExpirer(BulkPruner):
 
     maximum_chunk_size = 1000
 
-    _num_removed = None
-
     def __call__(self, chunk_size):
         """See `ITunableLoop`."""
         chunk_size = int(chunk_size + 0.5)
@@ -2317,8 +2462,31 @@ def __call__(self, chunk_size):
         transaction.commit()
 
 
+def get_loop_tables(tunable_loop_class):
+    """Return the names of the tables that a tunable loop writes to.
+
+    Loops may list these in a `tables` attribute, and a `BulkPruner` or
+    `KeysetPruner` writes to its target table.  A loop with no known
+    tables is not considered to conflict with any other loop.
+    """
+    tables = getattr(tunable_loop_class, "tables", None)
+    if tables is None and issubclass(
+        tunable_loop_class, (BulkPruner, KeysetPruner)
+    ):
+        tables = {tunable_loop_class.target_table_class.__storm_table__}
+    return {table.lower() for table in tables or ()}
+
+
 class BaseDatabaseGarbageCollector(LaunchpadCronScript):
-    """Abstract base class to run a collection of TunableLoops."""
+    """Abstract base class to run a collection of TunableLoops.
+
+    Loops are run in several threads, each with its own database
+    connection, but two loops that write to the same tables (see
+    `get_loop_tables`) are never run at the same time.  Loops that can
+    estimate their backlog (see `BulkPruner.estimateBacklog`) are run
+    largest backlog first, and loops that count the rows they process
+    in `total_processed` have their throughput logged.
+    """
 
     script_name = None  # Script name for locking and database user. Override.
     tunable_loops = None  # Collection of TunableLoops. Override.
@@ -2394,6 +2562,12 @@ def main(self):
         tunable_loops = list(self.tunable_loops)
         if self.options.experimental:
             tunable_loops.extend(self.experimental_tunable_loops)
+        tunable_loops = self.order_by_backlog(tunable_loops)
+
+        # Guards tunable_loops and the tables being written to by
+        # running loops.
+        self.scheduler_lock = threading.Lock()
+        self.running_tables = set()
 
         threads = set()
         for count in range(0, self.options.threads):
@@ -2429,6 +2603,64 @@ def main(self):
             self.logger.error("%d tasks failed.", self.failure_count)
             raise SilentLaunchpadScriptFailure(self.failure_count)
 
+    def order_by_backlog(self, tunable_loops):
+        """Order tunable loops so that the largest backlogs come first.
+
+        Loops that cannot estimate their backlog keep their relative
+        order, after any loops with a non-empty backlog.
+        """
+        backlogs = {}
+        for tunable_loop_class in tunable_loops:
+            estimate_backlog = getattr(
+                tunable_loop_class, "estimateBacklog", None
+            )
+            if estimate_backlog is None:
+                continue
+            loop_name = tunable_loop_class.__name__
+            try:
+                backlogs[tunable_loop_class] = estimate_backlog()
+            except Exception:
+                self.logger.exception(
+                    "Unable to estimate backlog of %s", loop_name
+                )
+                transaction.abort()
+                continue
+            self.logger.debug2(
+                "%s has an estimated backlog of %d rows.",
+                loop_name,
+                backlogs[tunable_loop_class],
+            )
+        # Don't hold a transaction open while the loops run.
+        transaction.abort()
+        return sorted(
+            tunable_loops,
+            key=lambda tunable_loop_class: -backlogs.get(
+                tunable_loop_class, 0
+            ),
+        )
+
+    def pop_runnable_loop(self, tunable_loops):
+        """Remove and return the next loop that can run now.
+
+        A loop cannot run while another loop is writing to any of the
+        same tables.  Returns None if no queued loop can run yet.
+
+        The caller must hold `scheduler_lock`.
+        """
+        for index, tunable_loop_class in enumerate(tunable_loops):
+            tables = get_loop_tables(tunable_loop_class)
+            if not (tables & self.running_tables):
+                self.running_tables.update(tables)
+                return tunable_loops.pop(index)
+        return None
+
+    def release_loop_tables(self, tunable_loop_class):
+        """Allow other loops to write to a finished loop's tables."""
+        with self.scheduler_lock:
+            self.running_tables.difference_update(
+                get_loop_tables(tunable_loop_class)
+            )
+
     def get_remaining_script_time(self):
         return self.start_time + self.script_timeout - time.time()
 
@@ -2451,6 +2683,19 @@ def get_loop_logger(self, loop_name):
         loop_logger.addFilter(PrefixFilter(loop_name))
         return loop_logger
 
+    def log_loop_throughput(self, loop_logger, tunable_loop, seconds):
+        """Log how many rows a tunable loop processed, and how quickly."""
+        total_processed = getattr(tunable_loop, "total_processed", None)
+        if total_processed is None:
+            return
+        loop_logger.info(
+            "%s processed %d rows in %0.3f seconds (%0.1f rows/s).",
+            tunable_loop.__class__.__name__,
+            total_processed,
+            seconds,
+            total_processed / max(seconds, 0.001),
+        )
+
     def get_loop_abort_time(self, num_remaining_tasks):
         # How long until the task should abort.
         if self.options.abort_task is not None:
@@ -2497,13 +2742,14 @@ def run_tasks_in_thread(self, tunable_loops):
                 )
                 break
 
-            try:
-                tunable_loop_class = tunable_loops.pop(0)
-            except IndexError:
-                # We catch the exception rather than checking the
-                # length first to avoid race conditions with other
-                # threads.
-                break
+            with self.scheduler_lock:
+                if not tunable_loops:
+                    break
+                tunable_loop_class = self.pop_runnable_loop(tunable_loops)
+            if tunable_loop_class is None:
+                # Every remaining task conflicts with a running task.
+                time.sleep(0.3)  # Avoid spinning.
+                continue
 
             loop_name = tunable_loop_class.__name__
 
@@ -2520,6 +2766,7 @@ def run_tasks_in_thread(self, tunable_loops):
                 loop_lock.acquire()
                 loop_logger.debug("Acquired lock %s.", loop_lock_path)
             except LockAlreadyAcquired:
+                self.release_loop_tables(tunable_loop_class)
                 # If the lock cannot be acquired, but we have plenty
                 # of time remaining, just put the task back to the
                 # end of the queue.
@@ -2529,7 +2776,8 @@ def run_tasks_in_thread(self, tunable_loops):
                         loop_lock_path,
                     )
                     time.sleep(0.3)  # Avoid spinning.
-                    tunable_loops.append(tunable_loop_class)
+                    with self.scheduler_lock:
+                        tunable_loops.append(tunable_loop_class)
                 # Otherwise, emit a warning and skip the task.
                 else:
                     loop_logger.warning(
@@ -2554,14 +2802,22 @@ def run_tasks_in_thread(self, tunable_loops):
                 if self._maximum_chunk_size is not None:
                     tunable_loop.maximum_chunk_size = self._maximum_chunk_size
 
+                loop_start = time.time()
                 try:
                     tunable_loop.run()
                     loop_logger.debug("%s completed successfully.", loop_name)
                 except Exception:
                     loop_logger.exception("Unhandled exception")
                     self.failure_count += 1
+                else:
+                    self.log_loop_throughput(
+                        loop_logger,
+                        tunable_loop,
+                        time.time() - loop_start,
+                    )
 
             finally:
+                self.release_loop_tables(tunable_loop_class)
                 loop_lock.release()
                 loop_logger.debug("Released lock %s.", loop_lock_path)
                 transaction.abort()
@@ -78,12 +78,14 @@
     DuplicateSessionPruner,
     FrequentDatabaseGarbageCollector,
     HourlyDatabaseGarbageCollector,
+    KeysetPruner,
     LoginTokenPruner,
     OpenIDConsumerAssociationPruner,
     ProductVCSPopulator,
     UnusedPOTMsgSetPruner,
     UnusedSessionPruner,
     UpdatePPASigningKeyFingerprintToRSA4096Key,
+    get_loop_tables,
     load_garbo_job_state,
     save_garbo_job_state,
 )
@@ -104,6 +106,7 @@
 from lp.services.job.interfaces.job import JobStatus
 from lp.services.job.model.job import Job
 from lp.services.librarian.model import TimeLimitedToken
+from lp.services.looptuner import LoopTuner, TunableLoop
 from lp.services.messages.interfaces.message import IMessageSet
 from lp.services.messages.model.message import Message
 from lp.services.openid.model.openidconsumer import OpenIDConsumerNonce
@@ -190,6 +193,12 @@ class BulkFooPruner(BulkPruner):
     maximum_chunk_size = 2
 
 
+class BulkFooKeysetPruner(KeysetPruner):
+    target_table_class = BulkFoo
+    prune_condition = "id < 5"
+    maximum_chunk_size = 2
+
+
 class TestBulkPruner(TestCase):
     layer = ZopelessDatabaseLayer
 
@@ -257,6 +266,172 @@ def test_bulkpruner(self):
         while not pruner.isDone():
             pruner(chunk_size)
 
+    def test_bulkpruner_counts_rows(self):
+        num_to_prune = self.store.find(BulkFoo, BulkFoo.id < 5).count()
+        pruner = BulkFooPruner(self.log)
+        while not pruner.isDone():
+            pruner(2)
+        pruner.cleanUp()
+        self.assertEqual(num_to_prune, pruner.total_processed)
+
+    def test_bulkpruner_estimates_backlog(self):
+        # The backlog is only the query planner's estimate, but it is
+        # never empty for a query that might return rows.
+        self.assertThat(BulkFooPruner.estimateBacklog(), GreaterThan(0))
+
+
+class TestKeysetPruner(TestCase):
+    layer = ZopelessDatabaseLayer
+
+    def setUp(self):
+        super().setUp()
+
+        self.store = IPrimaryStore(CommercialSubscription)
+        self.store.execute("CREATE TABLE BulkFoo (id serial PRIMARY KEY)")
+
+        for _ in range(10):
+            self.store.add(BulkFoo())
+
+        self.log = logging.getLogger("garbo")
+
+    def test_keysetpruner(self):
+        pruner = BulkFooKeysetPruner(self.log)
+        self.assertFalse(pruner.isDone())
+
+        # Each iteration visits chunk_size rows in key order, and only
+        # removes those that match the condition.
+        pruner(3)
+        transaction.abort()
+        self.assertEqual(3, pruner.last_key)
+        self.assertEqual(
+            [4, 5, 6, 7, 8, 9, 10],
+            sorted(self.store.find(BulkFoo.id)),
+        )
+        self.assertFalse(pruner.isDone())
+
+        while not pruner.isDone():
+            pruner(3)
+        transaction.abort()
+        pruner.cleanUp()
+
+        self.assertEqual(
+            [5, 6, 7, 8, 9, 10], sorted(self.store.find(BulkFoo.id))
+        )
+        self.assertEqual(4, pruner.total_processed)
+
+    def test_keysetpruner_estimates_backlog(self):
+        self.assertThat(BulkFooKeysetPruner.estimateBacklog(), GreaterThan(0))
+
+
+class RecordingLoop(TunableLoop):
+    """A loop that records when it runs, without using the database."""
+
+    tuner_class = LoopTuner
+    maximum_chunk_size = 1
+    events = None
+
+    def __init__(self, log, abort_time=None):
+        super().__init__(log, abort_time)
+        self.total_processed = 0
+
+    def isDone(self):
+        return self.total_processed > 0
+
+    def __call__(self, chunk_size):
+        loop_name = self.__class__.__name__
+        self.events.append(("start", loop_name))
+        time.sleep(0.1)
+        self.events.append(("end", loop_name))
+        self.total_processed += 1
+
+
+class FooLoop(RecordingLoop):
+    tables = {"foo"}
+
+
+class OtherFooLoop(RecordingLoop):
+    tables = {"Foo", "bar"}
+
+
+class BazLoop(RecordingLoop):
+    tables = {"baz"}
+
+
+class SmallBacklogLoop(RecordingLoop):
+    @classmethod
+    def estimateBacklog(cls):
+        return 10
+
+
+class LargeBacklogLoop(RecordingLoop):
+    @classmethod
+    def estimateBacklog(cls):
+        return 1000
+
+
+class TestGarboScheduling(TestCase):
+    layer = LaunchpadZopelessLayer
+
+    def setUp(self):
+        super().setUp()
+        self.log = logging.getLogger("garbo")
+        self.log.addHandler(logging.NullHandler())
+        self.log.propagate = 0
+        self.log_buffer = io.StringIO()
+        self.log.addHandler(logging.StreamHandler(self.log_buffer))
+        self.events = []
+        self.patch(RecordingLoop, "events", self.events)
+
+    def makeCollector(self, tunable_loops, test_args=()):
+        self.patch(
+            DailyDatabaseGarbageCollector, "tunable_loops", tunable_loops
+        )
+        collector = DailyDatabaseGarbageCollector(test_args=list(test_args))
+        collector.logger = self.log
+        return collector
+
+    def test_get_loop_tables(self):
+        self.assertEqual({"foo", "bar"}, get_loop_tables(OtherFooLoop))
+        self.assertEqual({"bulkfoo"}, get_loop_tables(BulkFooPruner))
+        self.assertEqual({"bulkfoo"}, get_loop_tables(BulkFooKeysetPruner))
+        self.assertEqual(set(), get_loop_tables(RecordingLoop))
+
+    def test_conflicting_loops_do_not_overlap(self):
+        # Loops that write to the same table run one after the other,
+        # even when there are enough threads to run them all at once.
+        switch_dbuser("garbo_daily")
+        self.makeCollector(
+            [FooLoop, OtherFooLoop, BazLoop], test_args=["--threads", "3"]
+        ).main()
+        self.assertEqual(
+            [
+                ("start", "FooLoop"),
+                ("end", "FooLoop"),
+                ("start", "OtherFooLoop"),
+                ("end", "OtherFooLoop"),
+            ],
+            [event for event in self.events if event[1] != "BazLoop"],
+        )
+        self.assertIn(("end", "BazLoop"), self.events)
+
+    def test_order_by_backlog(self):
+        # Loops with the largest estimated backlog are run first.
+        collector = self.makeCollector([])
+        self.assertEqual(
+            [LargeBacklogLoop, SmallBacklogLoop, FooLoop, BazLoop],
+            collector.order_by_backlog(
+                [FooLoop, SmallBacklogLoop, BazLoop, LargeBacklogLoop]
+            ),
+        )
+
+    def test_logs_throughput(self):
+        switch_dbuser("garbo_daily")
+        self.makeCollector([FooLoop]).main()
+        self.assertIn(
+            "[FooLoop] FooLoop processed 1 rows in ",
+            self.log_buffer.getvalue(),
+        )
+
 
 class TestSessionPruner(TestCase):
     layer = ZopelessDatabaseLayer
@@ -2,9 +2,12 @@
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 import gzip
+import multiprocessing
 import os
 import struct
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 
 import six
 from contrib import apachelog
@@ -18,6 +21,13 @@
 
 parser = apachelog.parser(apachelog.formats["extended"])
 
+# When parsing in worker processes, uncompressed log files are split into
+# byte ranges of roughly this size.
+RANGE_SIZE = 64 * 1024 * 1024
+
+# State set up in each worker process by _initialize_worker.
+_worker_state = {}
+
 
 def get_files_to_parse(file_paths):
     """Return an iterator of file and position where reading should start.
@@ -72,93 +82,163 @@ def get_fd_and_file_size(file_path):
     return fd, file_size
 
 
-def parse_file(fd, start_position, logger, get_download_key, parsed_lines=0):
-    """Parse the given file starting on the given position.
+def get_country_code_getter():
+    """Return a function that finds the country code for an IP address.
 
-    parsed_lines accepts the number of lines that have been parsed during
-    previous calls to this function so they can be taken into account against
-    max_parsed_lines.  The total number of parsed lines is then returned so it
-    can be passed back to future calls to this function.
+    The same hosts tend to appear many times in a log file, so lookups are
+    memoised.
+    """
+    geoip = getUtility(IGeoIP)
+    return lru_cache(maxsize=config.launchpad.logparser_geoip_cache_size)(
+        geoip.getCountryCodeByAddr
+    )
 
-    Return a dictionary mapping file_ids (from the librarian) to days to
-    countries to number of downloads.
+
+def parse_line(line_text, get_download_key, get_country_code, downloads):
+    """Count the download recorded in a log line, if there is one.
+
+    :param downloads: A dictionary mapping download keys to days to
+        countries to number of downloads, which is updated in place.
+    """
+    host, date, status, request = get_host_date_status_and_request(line_text)
+
+    if status != "200":
+        return
+
+    method, path = get_method_and_path(request)
+
+    if method != "GET":
+        return
+
+    download_key = get_download_key(path)
+
+    if download_key is None:
+        # Not a file or request that we care about.
+        return
+
+    # Get the dict containing this file's downloads.
+    if download_key not in downloads:
+        downloads[download_key] = {}
+    file_downloads = downloads[download_key]
+
+    # Get the dict containing these day's downloads for this file.
+    day = get_day(date)
+    if day not in file_downloads:
+        file_downloads[day] = {}
+    daily_downloads = file_downloads[day]
+
+    country_code = get_country_code(host)
+    if country_code not in daily_downloads:
+        daily_downloads[country_code] = 0
+    daily_downloads[country_code] += 1
+
+
+def merge_downloads(downloads, other_downloads):
+    """Add the download counts in `other_downloads` to `downloads`."""
+    for download_key, other_file_downloads in other_downloads.items():
+        file_downloads = downloads.setdefault(download_key, {})
+        for day, other_daily_downloads in other_file_downloads.items():
+            daily_downloads = file_downloads.setdefault(day, {})
+            for country_code, count in other_daily_downloads.items():
+                daily_downloads[country_code] = (
+                    daily_downloads.get(country_code, 0) + count
+                )
+
+
+def _parse_lines(
+    fd,
+    start_position,
+    end_position,
+    get_download_key,
+    get_country_code,
+    parsed_lines=0,
+    max_parsed_lines=None,
+):
+    """Parse the lines of a file starting on the given position.
+
+    If `end_position` is None, parse up to the end of the file, except for
+    the last line (see `parse_file`).  Otherwise, parse the lines that
+    start before `end_position`.
+
+    Return a dictionary of downloads as for `parse_file`, the position
+    where parsing stopped, the total number of parsed lines, and an error
+    message if parsing stopped early because of an error, or None.
     """
     # Seek file to given position, read all lines.
     fd.seek(start_position)
     next_line = fd.readline()
 
     parsed_bytes = start_position
-
-    geoip = getUtility(IGeoIP)
     downloads = {}
 
-    # Check for an optional max_parsed_lines config option.
-    max_parsed_lines = getattr(
-        config.launchpad, "logparser_max_parsed_lines", None
-    )
-
     while next_line:
         if max_parsed_lines is not None and parsed_lines >= max_parsed_lines:
             break
+        if end_position is not None and parsed_bytes >= end_position:
+            break
 
         line = next_line
         line_text = six.ensure_text(line, errors="replace")
 
-        # Always skip the last line as it may be truncated since we're
-        # rsyncing live logs, unless there is only one line for us to
-        # parse, in which case This probably means we're dealing with a
-        # logfile that has been rotated already, so it should be safe to
-        # parse its last line.
-        try:
-            next_line = next(fd)
-        except StopIteration:
-            if parsed_lines > 0:
-                break
+        if end_position is not None:
+            next_line = fd.readline()
+        else:
+            # Always skip the last line as it may be truncated since we're
+            # rsyncing live logs, unless there is only one line for us to
+            # parse, in which case This probably means we're dealing with a
+            # logfile that has been rotated already, so it should be safe to
+            # parse its last line.
+            try:
+                next_line = next(fd)
+            except StopIteration:
+                if parsed_lines > 0:
+                    break
 
         try:
             parsed_lines += 1
             parsed_bytes += len(line)
-            host, date, status, request = get_host_date_status_and_request(
-                line_text
+            parse_line(
+                line_text, get_download_key, get_country_code, downloads
             )
+        except Exception as e:
+            # We return an error here but leave the parsed_bytes
+            # unchanged so that in the next run, the remaining
+            # lines in the log file, if any, are parsed without
+            # getting stuck at the same broken line till the log
+            # file in question is rotated out.
+            error = 'Error (%s) while parsing "%s"' % (e, line_text)
+            return downloads, parsed_bytes, parsed_lines, error
 
-            if status != "200":
-                continue
+    return downloads, parsed_bytes, parsed_lines, None
 
-            method, path = get_method_and_path(request)
 
-            if method != "GET":
-                continue
+def parse_file(fd, start_position, logger, get_download_key, parsed_lines=0):
+    """Parse the given file starting on the given position.
 
-            download_key = get_download_key(path)
+    parsed_lines accepts the number of lines that have been parsed during
+    previous calls to this function so they can be taken into account against
+    max_parsed_lines.  The total number of parsed lines is then returned so it
+    can be passed back to future calls to this function.
 
-            if download_key is None:
-                # Not a file or request that we care about.
-                continue
+    Return a dictionary mapping file_ids (from the librarian) to days to
+    countries to number of downloads.
+    """
+    # Check for an optional max_parsed_lines config option.
+    max_parsed_lines = getattr(
+        config.launchpad, "logparser_max_parsed_lines", None
+    )
 
-            # Get the dict containing this file's downloads.
-            if download_key not in downloads:
-                downloads[download_key] = {}
-            file_downloads = downloads[download_key]
-
-            # Get the dict containing these day's downloads for this file.
-            day = get_day(date)
-            if day not in file_downloads:
-                file_downloads[day] = {}
-            daily_downloads = file_downloads[day]
-
-            country_code = geoip.getCountryCodeByAddr(host)
-            if country_code not in daily_downloads:
-                daily_downloads[country_code] = 0
-            daily_downloads[country_code] += 1
-        except Exception as e:
-            # We log an error here but leave the parsed_bytes
-            # unchanged so that in the next run, the remaining
-            # lines in the log file, if any, are parsed without
-            # getting stuck at the same broken line till the log
-            # file in question is rotated out.
-            logger.error('Error (%s) while parsing "%s"' % (e, line_text))
-            break
+    downloads, parsed_bytes, parsed_lines, error = _parse_lines(
+        fd,
+        start_position,
+        None,
+        get_download_key,
+        get_country_code_getter(),
+        parsed_lines=parsed_lines,
+        max_parsed_lines=max_parsed_lines,
+    )
+    if error is not None:
+        logger.error(error)
 
     if parsed_lines > 0:
         logger.info(
@@ -169,6 +249,152 @@ def parse_file(fd, start_position, logger, get_download_key, parsed_lines=0):
     return downloads, parsed_bytes, parsed_lines
 
 
+def _initialize_worker(get_download_key):
+    """Set up a worker process for `parse_files`."""
+    _worker_state["get_download_key"] = get_download_key
+    _worker_state["get_country_code"] = get_country_code_getter()
+
+
+def _parse_range(file_path, start_position, end_position):
+    """Parse part of a log file in a worker process.
+
+    See `_parse_lines`.
+    """
+    fd, _ = get_fd_and_file_size(file_path)
+    with fd:
+        return _parse_lines(
+            fd,
+            start_position,
+            end_position,
+            _worker_state["get_download_key"],
+            _worker_state["get_country_code"],
+        )
+
+
+def _get_last_line_start(fd, start_position, file_size):
+    """Return the position where the last line of a file starts.
+
+    Only the part of the file after `start_position` is considered.
+    """
+    # A trailing newline belongs to the last line.
+    end = file_size - 1
+    block_size = 64 * 1024
+    while end > start_position:
+        block_start = max(start_position, end - block_size)
+        fd.seek(block_start)
+        block = fd.read(end - block_start)
+        index = block.rfind(b"\n")
+        if index >= 0:
+            return block_start + index + 1
+        end = block_start
+    return start_position
+
+
+def _split_file(fd, start_position, end_position):
+    """Split part of a file into ranges of whole lines.
+
+    :return: A list of (start, end) positions.
+    """
+    boundaries = [start_position]
+    for position in range(
+        start_position + RANGE_SIZE, end_position, RANGE_SIZE
+    ):
+        # Move forward to the start of the next line.
+        fd.seek(position - 1)
+        fd.readline()
+        boundary = fd.tell()
+        if boundaries[-1] < boundary < end_position:
+            boundaries.append(boundary)
+    boundaries.append(end_position)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _get_ranges(fd, start_position):
+    """Return the ranges of a file to parse in worker processes.
+
+    Uncompressed files are split into several ranges, ending where
+    `parse_file` would stop.  Compressed files can't be read from the
+    middle efficiently, so they are parsed in one go, by a worker that
+    decides where to stop in the same way as `parse_file`.
+    """
+    if isinstance(fd, gzip.GzipFile):
+        return [(start_position, None)]
+    file_size = os.fstat(fd.fileno()).st_size
+    if start_position >= file_size:
+        return []
+    end_position = _get_last_line_start(fd, start_position, file_size)
+    if end_position == start_position:
+        # There is only one line for us to parse, which parse_file would
+        # parse too.
+        end_position = file_size
+    return _split_file(fd, start_position, end_position)
+
+
+def parse_files(files, logger, get_download_key, workers):
+    """Parse several log files using a pool of worker processes.
+
+    Each file is parsed as `parse_file` would parse it, without a maximum
+    number of lines.  Uncompressed files are split into several ranges
+    that are parsed in parallel; the results for each range are merged in
+    order, and merging stops at the first range that stopped early so that
+    the returned position is where parsing should resume next time.
+
+    :param files: A list of (fd, start_position) pairs, as returned by
+        `get_files_to_parse`.
+    :param get_download_key: A function to get the download key for a
+        path.  It is passed to forked worker processes without pickling.
+    :param workers: The number of worker processes to use.
+    :return: An iterator of (fd, downloads, parsed_bytes, parsed_lines)
+        for each file, in the same order as `files`.
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_initialize_worker,
+        initargs=(get_download_key,),
+    ) as executor:
+        jobs = []
+        for fd, start_position in files:
+            futures = [
+                (
+                    start_position,
+                    end_position,
+                    executor.submit(
+                        _parse_range, fd.name, start_position, end_position
+                    ),
+                )
+                for start_position, end_position in _get_ranges(
+                    fd, start_position
+                )
+            ]
+            jobs.append((fd, start_position, futures))
+
+        for fd, parsed_bytes, futures in jobs:
+            downloads = {}
+            parsed_lines = 0
+            for start_position, end_position, future in futures:
+                (
+                    range_downloads,
+                    parsed_bytes,
+                    range_parsed_lines,
+                    error,
+                ) = future.result()
+                merge_downloads(downloads, range_downloads)
+                parsed_lines += range_parsed_lines
+                if error is not None:
+                    logger.error(error)
+                    break
+                if end_position is not None and parsed_bytes < end_position:
+                    # The file was truncated while we were parsing it.
+                    break
+            if parsed_lines > 0:
+                logger.info(
+                    "Parsed %d lines resulting in %d download stats."
+                    % (parsed_lines, len(downloads))
+                )
+            yield fd, downloads, parsed_bytes, parsed_lines
+
+
 def create_or_update_parsedlog_entry(first_line, parsed_bytes):
     """Create or update the ParsedApacheLog with the given first_line."""
     first_line = six.ensure_text(first_line, errors="replace")
@@ -13,6 +13,7 @@
     create_or_update_parsedlog_entry,
     get_files_to_parse,
     parse_file,
+    parse_files,
 )
 from lp.services.config import config
 from lp.services.scripts.base import LaunchpadCronScript
@@ -64,6 +65,26 @@ def getDownloadCountUpdater(self, file_id):
         """
         raise NotImplementedError
 
+    def _parseFilesSerially(self, files_to_parse):
+        """Parse log files one at a time in this process.
+
+        :return: An iterator of (fd, downloads, parsed_bytes, parsed_lines)
+            for each file that was parsed.
+        """
+        parsed_lines = 0
+        max_parsed_lines = getattr(
+            config.launchpad, "logparser_max_parsed_lines", None
+        )
+        max_is_set = max_parsed_lines is not None
+        for fd, position in files_to_parse:
+            # If we've used up our budget of lines to process, stop.
+            if max_is_set and parsed_lines >= max_parsed_lines:
+                break
+            downloads, parsed_bytes, parsed_lines = parse_file(
+                fd, position, self.logger, self.getDownloadKey
+            )
+            yield fd, downloads, parsed_bytes, parsed_lines
+
     def main(self):
         self.setUpUtilities()
 
@@ -81,18 +102,17 @@ def main(self):
         )
 
         country_set = getUtility(ICountrySet)
-        parsed_lines = 0
+        workers = config.launchpad.logparser_workers
         max_parsed_lines = getattr(
             config.launchpad, "logparser_max_parsed_lines", None
         )
-        max_is_set = max_parsed_lines is not None
-        for fd, position in files_to_parse:
-            # If we've used up our budget of lines to process, stop.
-            if max_is_set and parsed_lines >= max_parsed_lines:
-                break
-            downloads, parsed_bytes, parsed_lines = parse_file(
-                fd, position, self.logger, self.getDownloadKey
+        if workers > 1 and max_parsed_lines is None:
+            parsed_files = parse_files(
+                files_to_parse, self.logger, self.getDownloadKey, workers
             )
+        else:
+            parsed_files = self._parseFilesSerially(files_to_parse)
+        for fd, downloads, parsed_bytes, _ in parsed_files:
             # Use a while loop here because we want to pop items from the dict
             # in order to free some memory as we go along. This is a good
             # thing here because the downloads dict may get really huge.
@@ -10,14 +10,17 @@
 
 from fixtures import TempDir
 
+from lp.services.apachelogparser import base
 from lp.services.apachelogparser.base import (
     create_or_update_parsedlog_entry,
+    get_country_code_getter,
     get_day,
     get_fd_and_file_size,
     get_files_to_parse,
     get_host_date_status_and_request,
     get_method_and_path,
     parse_file,
+    parse_files,
 )
 from lp.services.apachelogparser.model.parsedapachelog import ParsedApacheLog
 from lp.services.config import config
@@ -481,6 +484,79 @@ def test_max_parsed_lines_exceeded(self):
             [("/9096290/me-tv-icon-14x14.png", {date: {"AU": 1}})],
         )
 
+    def test_country_codes_are_memoised(self):
+        # Looking up the country for the same host again uses a cache.
+        get_country_code = get_country_code_getter()
+        self.assertEqual("AU", get_country_code("121.44.28.210"))
+        self.assertEqual("AU", get_country_code("121.44.28.210"))
+        self.assertEqual(1, get_country_code.cache_info().hits)
+
+    def _parseFiles(self, file_paths):
+        """Parse files with `parse_files` and with `parse_file`.
+
+        Return a list of results from each of them, after checking that
+        they logged the same messages.
+        """
+        # Split uncompressed files into several ranges.
+        self.patch(base, "RANGE_SIZE", 300)
+        files = [get_fd_and_file_size(path)[0] for path in file_paths]
+        for fd in files:
+            self.addCleanup(fd.close)
+        results = [
+            tuple(result)
+            for _, *result in parse_files(
+                [(fd, 0) for fd in files],
+                self.logger,
+                get_path_download_key,
+                2,
+            )
+        ]
+        log = self.logger.getLogBuffer()
+        self.logger.clearLogBuffer()
+        expected_results = [
+            parse_file(fd, 0, self.logger, get_path_download_key)
+            for fd in files
+        ]
+        self.assertEqual(self.logger.getLogBuffer(), log)
+        return results, expected_results
+
+    def test_parse_files(self):
+        # parse_files parses log files in worker processes with the same
+        # results as parse_file, including where to resume parsing.
+        results, expected_results = self._parseFiles(
+            [
+                os.path.join(here, "apache-log-files", name)
+                for name in (
+                    "launchpadlibrarian.net.access-log",
+                    "launchpadlibrarian.net.access-log.1.gz",
+                    "librarian-oneline.log",
+                )
+            ]
+        )
+        self.assertEqual(expected_results, results)
+        self.assertEqual(
+            {datetime(2008, 6, 13): {"AR": 1, "JP": 1}},
+            results[0][0]["/8196569/mediumubuntulogo.png"],
+        )
+
+    def test_parse_files_stops_at_error(self):
+        # If a line can't be parsed, the lines after it are not counted,
+        # even if other workers parsed them.
+        good_line = self.sample_line % dict(status="200", method="GET")
+        path = os.path.join(self.useFixture(TempDir()).path, "access-log")
+        write_file(
+            path,
+            "\n".join(
+                [good_line] * 3 + ["Not a log"] + [good_line] * 5
+            ).encode("UTF-8"),
+        )
+        results, expected_results = self._parseFiles([path])
+        self.assertEqual(expected_results, results)
+        [(downloads, parsed_bytes, parsed_lines)] = results
+        self.assertEqual(4, parsed_lines)
+        self.assertEqual((len(good_line) + 1) * 3 + 10, parsed_bytes)
+        self.assertIn("Error", self.logger.getLogBuffer())
+
 
 class TestParsedFilesDetection(TestCase):
     """Test the detection of already parsed logs."""
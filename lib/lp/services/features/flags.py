@@ -88,6 +88,17 @@
             "",
             "",
         ),
+        (
+            "buildmaster.bulk_candidate_selection",
+            "boolean",
+            (
+                "Find build candidates for all builder groups using a "
+                "single query per buildd-manager scan cycle."
+            ),
+            "",
+            "",
+            "",
+        ),
         (
             "code.ajax_revision_diffs.enabled",
             "boolean",
@@ -12,11 +12,13 @@
 ]
 
 import re
+import time
 from collections import defaultdict, namedtuple
 
 import six
-from storm.locals import Desc
+from storm.locals import Count, Desc, Max
 
+from lp.services.config import config
 from lp.services.features.model import FeatureFlag, getFeatureStore
 from lp.services.webapp import adapter
 
@@ -103,9 +105,27 @@ def parseRules(self, text_form):
 
 
 class StormFeatureRuleSource(FeatureRuleSource):
-    """Access feature rules stored in the database via Storm."""
-
-    def getAllRulesAsTuples(self):
+    """Access feature rules stored in the database via Storm.
+
+    `getAllRulesAsDict` is cached for the whole process, since it is called
+    at least once for almost every request and job.  The cache is keyed by
+    a cheap "generation" query on the FeatureFlag table (the number of rows
+    and the latest modification date: `setAllRules` replaces every row), and
+    that query is itself only repeated every
+    `config.launchpad.feature_rules_check_interval` seconds.
+    """
+
+    # (generation, rules, time of last generation check), shared by all
+    # instances.  The tuple is only ever replaced, never mutated, so that
+    # threads may share it without locking.
+    _cache = None
+
+    @classmethod
+    def invalidateCache(cls):
+        """Forget the cached rules, forcing a reload on the next lookup."""
+        StormFeatureRuleSource._cache = None
+
+    def _requestExpired(self):
         try:
             # This LBYL may look odd but it is needed. Rendering OOPSes and
             # timeouts also looks up flags, but doing such a lookup can
@@ -118,6 +138,42 @@ def getAllRulesAsTuples(self):
             # have no rules).
             adapter.get_request_remaining_seconds()
         except adapter.RequestExpired:
+            return True
+        return False
+
+    def _getGeneration(self):
+        """Return a value that changes whenever the rules change."""
+        return (
+            getFeatureStore()
+            .find((Count(), Max(FeatureFlag.date_modified)))
+            .one()
+        )
+
+    def getAllRulesAsDict(self):
+        """See `FeatureRuleSource`.
+
+        The returned dictionary is shared, and must not be modified.
+        """
+        cache = self._cache
+        now = time.monotonic()
+        interval = config.launchpad.feature_rules_check_interval
+        if cache is not None and now - cache[2] < interval:
+            return cache[1]
+        if self._requestExpired():
+            # Stale rules are better than none.
+            return cache[1] if cache is not None else {}
+        generation = self._getGeneration()
+        if cache is not None and cache[0] == generation:
+            rules = cache[1]
+        else:
+            rules = {}
+            for flag, scope, priority, value in self.getAllRulesAsTuples():
+                rules.setdefault(flag, []).append((scope, priority, value))
+        StormFeatureRuleSource._cache = (generation, rules, now)
+        return rules
+
+    def getAllRulesAsTuples(self):
+        if self._requestExpired():
             return
         store = getFeatureStore()
         rs = store.find(FeatureFlag).order_by(
@@ -134,6 +190,7 @@ def setAllRules(self, new_rules):
         # XXX: would be slightly better to only update rules as necessary so
         # we keep timestamps, and to avoid the direct sql etc -- mbp 20100924
         store = getFeatureStore()
+        self.invalidateCache()
         store.execute("DELETE FROM FeatureFlag")
         for flag, scope, priority, value in new_rules:
             store.add(
@@ -145,6 +202,7 @@ def setAllRules(self, new_rules):
                 )
             )
         store.flush()
+        self.invalidateCache()
 
 
 class MemoryFeatureRuleSource(FeatureRuleSource):
@@ -5,13 +5,16 @@
 
 import os
 
+from testtools.matchers import Equals
+
 from lp.services.features import getFeatureFlag, install_feature_controller
 from lp.services.features.flags import FeatureController
 from lp.services.features.rulesource import (
     MemoryFeatureRuleSource,
     StormFeatureRuleSource,
 )
-from lp.testing import TestCase, layers
+from lp.testing import StormStatementRecorder, TestCase, layers
+from lp.testing.matchers import HasQueryCount
 
 notification_name = "notification.global.text"
 notification_value = "\N{SNOWMAN} stormy Launchpad weather ahead"
@@ -254,6 +257,44 @@ def makeSource(self):
         return StormFeatureRuleSource()
 
 
+class TestStormFeatureRuleSourceCache(TestCase):
+    layer = layers.DatabaseFunctionalLayer
+
+    def setUp(self):
+        super().setUp()
+        StormFeatureRuleSource.invalidateCache()
+        self.addCleanup(StormFeatureRuleSource.invalidateCache)
+        StormFeatureRuleSource().setAllRules(test_rules_list)
+
+    def test_unchanged_rules_are_not_reloaded(self):
+        # Once the rules are cached, each lookup only needs to check
+        # whether they have changed.
+        expected = StormFeatureRuleSource().getAllRulesAsDict()
+        with StormStatementRecorder() as recorder:
+            rules = StormFeatureRuleSource().getAllRulesAsDict()
+        self.assertIs(expected, rules)
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+
+    def test_setAllRules_invalidates_cache(self):
+        source = StormFeatureRuleSource()
+        source.getAllRulesAsDict()
+        source.setAllRules([("ui.icing", "default", 100, "6.0")])
+        self.assertEqual(
+            {"ui.icing": [("default", 100, "6.0")]},
+            StormFeatureRuleSource().getAllRulesAsDict(),
+        )
+
+    def test_check_interval(self):
+        # Within the check interval, the cached rules are used without
+        # querying the database at all.
+        self.pushConfig("launchpad", feature_rules_check_interval=3600)
+        expected = StormFeatureRuleSource().getAllRulesAsDict()
+        with StormStatementRecorder() as recorder:
+            rules = StormFeatureRuleSource().getAllRulesAsDict()
+        self.assertIs(expected, rules)
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+
+
 class TestMemoryFeatureRuleSource(FeatureRuleSourceTestsMixin, TestCase):
     layer = layers.FunctionalLayer
 
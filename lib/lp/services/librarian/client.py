@@ -535,6 +535,10 @@ def _getURLForDownload(self, aliasID):
             self._internal_download_url, self._getPathForAlias(aliasID)
         )
 
+    def getDownloadURLForAlias(self, aliasID):
+        """See `IFileDownloadClient`."""
+        return self._getURLForDownload(aliasID)
+
     def getFileByAlias(
         self, aliasID, timeout=LIBRARIAN_SERVER_DEFAULT_TIMEOUT
     ):
@@ -543,6 +547,12 @@ def getFileByAlias(
         if url is None:
             # File has been deleted
             return None
+        return self.getFileByDownloadURL(url, aliasID, timeout=timeout)
+
+    def getFileByDownloadURL(
+        self, url, aliasID, timeout=LIBRARIAN_SERVER_DEFAULT_TIMEOUT
+    ):
+        """See `IFileDownloadClient`."""
         try_until = time.time() + timeout
         request = get_current_browser_request()
         timeline = get_request_timeline(request)
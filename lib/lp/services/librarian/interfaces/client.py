@@ -122,6 +122,32 @@ def getFileByAlias(aliasID, timeout=LIBRARIAN_SERVER_DEFAULT_TIMEOUT):
             unreachable or returns an 5xx HTTPError.
         """
 
+    def getDownloadURLForAlias(aliasID):
+        """Returns the internal URL from which to download the given file.
+
+        :param aliasID: The alias ID identifying the file.
+        :return: A URL suitable for `getFileByDownloadURL`, or None if the
+            file has been deleted.
+        :raises DownloadFailed: If the alias is not found.
+        """
+
+    def getFileByDownloadURL(
+        url, aliasID, timeout=LIBRARIAN_SERVER_DEFAULT_TIMEOUT
+    ):
+        """Returns a file-like object to read the file at a download URL.
+
+        Unlike `getFileByAlias`, this does not use the database, so it may
+        be called from a thread other than the one that looked up `url`.
+
+        :param url: A URL returned by `getDownloadURLForAlias`.
+        :param aliasID: The alias ID identifying the file.
+        :param timeout: As for `getFileByAlias`.
+        :return: A file-like object to read the file contents from.
+        :raises LookupError: If the file is not found on the server.
+        :raises LibrarianServerError: If the librarian server is
+            unreachable or returns an 5xx HTTPError.
+        """
+
 
 class ILibrarianClient(IFileUploadClient, IFileDownloadClient):
     """Interface for the librarian client."""
@@ -2,6 +2,7 @@
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 import hashlib
+import io
 import os
 import shutil
 import tempfile
@@ -23,6 +24,7 @@
 from lp.services.database.postgresql import ConnectionString
 from lp.services.features import getFeatureFlag
 from lp.services.librarianserver import swift
+from lp.services.librarianserver.swiftcache import get_swift_cache
 
 __all__ = [
     "DigestMismatchError",
@@ -30,6 +32,7 @@
     "LibraryFileUpload",
     "DuplicateFileIDError",
     "WrongDatabaseError",
+    "is_local_stream",
     # _relFileLocation needed by other modules in this package.
     # Listed here to keep the import pedant happy
     "_relFileLocation",
@@ -107,8 +110,37 @@ def hasFile(self, fileid):
     CHUNK_SIZE = StaticProducer.bufferSize
 
     @defer.inlineCallbacks
-    def open(self, fileid):
+    def open(self, fileid, offset=0, length=None, size=None, sha256=None):
+        """Open a stored file for reading.
+
+        :param fileid: The `LibraryFileContent` ID.
+        :param offset: Start reading at this byte offset.
+        :param length: If not None, stop reading after this many bytes.
+            The caller must ensure that the range lies within the file.
+        :param size: The expected size of the file, if known.
+        :param sha256: The expected SHA-256 of the file, if known.  Files
+            fetched from Swift are only added to the local Swift cache (if
+            configured) if `size` and `sha256` are given.
+        :return: A Deferred firing with a stream, or None if the file
+            cannot be found.  The stream's `read` method may return a
+            Deferred.
+        """
+        if length is not None or offset:
+            if length is None:
+                range_header = "bytes=%d-" % offset
+            else:
+                range_header = "bytes=%d-%d" % (offset, offset + length - 1)
+            request_headers = {"Range": range_header}
+        else:
+            request_headers = None
         if getFeatureFlag("librarian.swift.enabled"):
+            # Hot files may be in our local cache.
+            cache = get_swift_cache()
+            if cache is not None:
+                stream = cache.open(fileid)
+                if stream is not None:
+                    return self._openRange(stream, offset, length)
+
             # Log our attempt.
             self.swift_download_attempts += 1
 
@@ -118,6 +150,12 @@ def open(self, fileid):
                         self.swift_download_attempts, self.swift_download_fails
                     )
                 )
+                if cache is not None:
+                    log.msg(
+                        "Swift cache: {} hits, {} misses, {} bytes".format(
+                            cache.hits, cache.misses, cache.total_size
+                        )
+                    )
 
             # First, try and stream the file from Swift.  Try the newest
             # configured instance first.
@@ -132,10 +170,33 @@ def open(self, fileid):
                         container,
                         name,
                         resp_chunk_size=self.CHUNK_SIZE,
+                        headers=request_headers,
                     )
-                    return TxSwiftStream(
+                    if (
+                        request_headers is not None
+                        and "content-range" not in headers
+                    ):
+                        # Swift ignored the Range header and is sending
+                        # the whole object.  This shouldn't happen, but
+                        # we must not serve the wrong bytes if it does.
+                        swift_connection.close()
+                        swift_download_fail = True
+                        log.msg(
+                            "Swift ignored Range request for %s/%s"
+                            % (container, name)
+                        )
+                        continue
+                    stream = TxSwiftStream(
                         connection_pool, swift_connection, chunks
                     )
+                    if (
+                        cache is not None
+                        and request_headers is None
+                        and size is not None
+                        and sha256 is not None
+                    ):
+                        stream = cache.wrap(fileid, stream, size, sha256)
+                    return stream
                 except swiftclient.ClientException as x:
                     if x.http_status == 404:
                         connection_pool.put(swift_connection)
@@ -154,7 +215,15 @@ def open(self, fileid):
 
         path = self._fileLocation(fileid)
         if os.path.exists(path):
-            return open(path, "rb")
+            return self._openRange(open(path, "rb"), offset, length)
+
+    def _openRange(self, stream, offset, length):
+        """Restrict a local file stream to a byte range."""
+        if offset:
+            stream.seek(offset)
+        if length is not None:
+            stream = FileRange(stream, length)
+        return stream
 
     def _fileLocation(self, fileid):
         return os.path.join(self.directory, _relFileLocation(str(fileid)))
@@ -196,6 +265,42 @@ def read(self, size):
         return return_chunk
 
 
+def is_local_stream(stream):
+    """Is `stream` a synchronous stream of a local file?
+
+    Such streams are returned by `LibrarianStorage.open` for files on
+    local disk or in the local Swift cache; streams from Swift itself
+    return Deferreds from `read`.
+    """
+    return isinstance(stream, (io.BufferedReader, FileRange))
+
+
+class FileRange:
+    """Read at most a given number of bytes from a file.
+
+    This lets a range of a local file be streamed in the same way as a
+    range fetched from Swift, by reading until EOF.
+    """
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self._remaining = length
+
+    @property
+    def closed(self):
+        return self._stream.closed
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._stream.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._stream.close()
+
+
 class LibraryFileUpload:
     """A file upload from a client."""
 
@@ -0,0 +1,228 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A local read-through disk cache for files stored in Swift."""
+
+__all__ = [
+    "CachingStream",
+    "SwiftCache",
+    "get_swift_cache",
+]
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from twisted.internet import defer
+from twisted.python import log
+
+from lp.services.config import config
+
+# Prefix for partially-written cache files.
+TEMPORARY_PREFIX = ".tmp-"
+
+# One cache per directory, shared by all the storages in this process.
+_caches = {}
+
+
+def get_swift_cache():
+    """Return the configured `SwiftCache`, or None if it is disabled."""
+    directory = config.librarian_server.swift_cache_directory
+    max_size = config.librarian_server.swift_cache_size
+    if not directory or not max_size:
+        return None
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = SwiftCache(directory, max_size)
+    else:
+        cache.max_size = max_size
+    return cache
+
+
+class SwiftCache:
+    """A size-bounded least-recently-used cache of Swift objects on disk.
+
+    Files are keyed by `LibraryFileContent` ID.  A file is added to the
+    cache while it is streamed from Swift for the first time, and only if
+    the whole file was read and it matched its expected size and SHA-256
+    checksum.  Recency is recorded in file modification times, so that it
+    survives restarts.
+
+    Each cache directory must only be used by a single process.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Maps content IDs to sizes, least recently used first.
+        self._entries = OrderedDict()
+        self._total_size = 0
+        self._scan()
+
+    def _scan(self):
+        """Load the existing contents of the cache directory."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(TEMPORARY_PREFIX):
+                # Left over from an interrupted download.
+                os.unlink(path)
+                continue
+            try:
+                fileid = int(name)
+            except ValueError:
+                continue
+            st = os.stat(path)
+            found.append((st.st_mtime, fileid, st.st_size))
+        for _, fileid, size in sorted(found):
+            self._entries[fileid] = size
+            self._total_size += size
+        self._evict()
+
+    @property
+    def total_size(self):
+        """The total size in bytes of the cached files."""
+        return self._total_size
+
+    def _path(self, fileid):
+        return os.path.join(self.directory, str(fileid))
+
+    def open(self, fileid):
+        """Open a cached file, or return None if it is not cached."""
+        if fileid not in self._entries:
+            self.misses += 1
+            return None
+        path = self._path(fileid)
+        try:
+            stream = open(path, "rb")
+        except FileNotFoundError:
+            # Someone else removed it.
+            self._remove(fileid)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(fileid)
+        os.utime(path)
+        return stream
+
+    def wrap(self, fileid, stream, size, sha256):
+        """Wrap a stream from Swift so that it populates the cache.
+
+        :param fileid: The `LibraryFileContent` ID.
+        :param stream: A stream of the whole file.
+        :param size: The expected size of the file.
+        :param sha256: The expected SHA-256 of the file, as a hex string.
+        :return: A stream to read instead of `stream`.
+        """
+        if size > self.max_size:
+            return stream
+        return CachingStream(self, fileid, stream, size, sha256)
+
+    def _makeTemporaryFile(self):
+        return tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=TEMPORARY_PREFIX, delete=False
+        )
+
+    def _add(self, fileid, temporary_path, size):
+        os.rename(temporary_path, self._path(fileid))
+        if fileid in self._entries:
+            self._total_size -= self._entries[fileid]
+        self._entries[fileid] = size
+        self._entries.move_to_end(fileid)
+        self._total_size += size
+        self._evict()
+
+    def _remove(self, fileid):
+        size = self._entries.pop(fileid, None)
+        if size is None:
+            return
+        self._total_size -= size
+        try:
+            os.unlink(self._path(fileid))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self._total_size > self.max_size and self._entries:
+            self._remove(next(iter(self._entries)))
+
+
+class CachingStream:
+    """A stream from Swift that copies what it reads into a `SwiftCache`."""
+
+    def __init__(self, cache, fileid, stream, size, sha256):
+        self._cache = cache
+        self._fileid = fileid
+        self._stream = stream
+        self._size = size
+        self._sha256 = sha256
+        self._hash = hashlib.sha256()
+        self._written = 0
+        try:
+            self._cache_file = cache._makeTemporaryFile()
+        except OSError as e:
+            log.msg("Failed to create Swift cache file: %s" % e)
+            self._cache_file = None
+
+    @property
+    def closed(self):
+        return self._stream.closed
+
+    @defer.inlineCallbacks
+    def read(self, size):
+        data = yield self._stream.read(size)
+        if self._cache_file is not None:
+            if data:
+                try:
+                    self._cache_file.write(data)
+                except OSError as e:
+                    log.msg("Failed to write Swift cache file: %s" % e)
+                    self._discard()
+                else:
+                    self._hash.update(data)
+                    self._written += len(data)
+            elif size:
+                self._commit()
+        return data
+
+    def _commit(self):
+        """Add the cache file to the cache if it is complete and valid."""
+        cache_file = self._cache_file
+        self._cache_file = None
+        cache_file.close()
+        if (
+            self._written != self._size
+            or self._hash.hexdigest() != self._sha256
+        ):
+            log.msg(
+                "Not caching Swift object %d: expected %d bytes with "
+                "SHA-256 %s, got %d bytes with SHA-256 %s"
+                % (
+                    self._fileid,
+                    self._size,
+                    self._sha256,
+                    self._written,
+                    self._hash.hexdigest(),
+                )
+            )
+            os.unlink(cache_file.name)
+            return
+        try:
+            self._cache._add(self._fileid, cache_file.name, self._written)
+        except OSError as e:
+            log.msg("Failed to add Swift cache file: %s" % e)
+
+    def _discard(self):
+        if self._cache_file is not None:
+            self._cache_file.close()
+            os.unlink(self._cache_file.name)
+            self._cache_file = None
+
+    def close(self):
+        # An incomplete download is not cached.
+        self._discard()
+        self._stream.close()
@@ -130,6 +130,16 @@ def getFileByAlias(
         alias.checkCommitted()
         return io.BytesIO(alias.content_bytes)
 
+    def getDownloadURLForAlias(self, aliasID):
+        """See `IFileDownloadClient`."""
+        return self.getURLForAlias(aliasID)
+
+    def getFileByDownloadURL(
+        self, url, aliasID, timeout=LIBRARIAN_SERVER_DEFAULT_TIMEOUT
+    ):
+        """See `IFileDownloadClient`."""
+        return self.getFileByAlias(aliasID, timeout=timeout)
+
     def pretendCommit(self):
         """Pretend that there's been a commit.
 
@@ -20,6 +20,7 @@
     DuplicateFileIDError,
     LibrarianStorage,
     LibraryFileUpload,
+    is_local_stream,
 )
 from lp.services.log.logger import DevNullLogger
 from lp.testing import TestCase
@@ -255,6 +256,78 @@ def test_fetch_with_close_at_end_does_not_reuse_connection(self):
         # SwiftStream.close doesn't know that.
         self.assertEqual(0, len(swift.connection_pools[-1]._pool))
 
+    @defer.inlineCallbacks
+    def test_range_fetch(self):
+        # A range of a file can be fetched from Swift without fetching the
+        # rest of the file, and the connection is reused afterwards.
+        data = bytes(range(256)) * (self.storage.CHUNK_SIZE // 64)
+        newfile = self.storage.startAddFile("file", len(data))
+        newfile.mimetype = "text/plain"
+        newfile.append(data)
+        lfc_id, _ = newfile.store()
+        self.moveToSwift(lfc_id)
+        offset = self.storage.CHUNK_SIZE + 17
+        length = self.storage.CHUNK_SIZE
+        stream = yield self.storage.open(lfc_id, offset, length)
+        self.assertIsNotNone(stream)
+        self.assertFalse(is_local_stream(stream))
+        chunks = []
+        while True:
+            chunk = yield stream.read(self.storage.CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual(data[offset : offset + length], b"".join(chunks))
+        self.assertEqual(1, len(swift.connection_pools[-1]._pool))
+
+    @defer.inlineCallbacks
+    def test_range_fetch_from_disk(self):
+        # A range of a file that is not yet in Swift is read from disk.
+        data = bytes(range(256)) * 4
+        newfile = self.storage.startAddFile("file", len(data))
+        newfile.mimetype = "text/plain"
+        newfile.append(data)
+        lfc_id, _ = newfile.store()
+        stream = yield self.storage.open(lfc_id, 100, 300)
+        self.assertTrue(is_local_stream(stream))
+        self.assertEqual(data[100:400], stream.read(1000))
+        self.assertEqual(b"", stream.read(1000))
+        stream.close()
+        self.assertTrue(stream.closed)
+
+    @defer.inlineCallbacks
+    def test_swift_cache(self):
+        # If a local Swift cache is configured, complete fetches from Swift
+        # populate it, and later fetches are served from it.
+        self.pushConfig(
+            "librarian_server",
+            swift_cache_directory=self.useFixture(TempDir()).path,
+            swift_cache_size=self.storage.CHUNK_SIZE * 10,
+        )
+        data = b"x" * (self.storage.CHUNK_SIZE * 4 + 1)
+        newfile = self.storage.startAddFile("file", len(data))
+        newfile.mimetype = "text/plain"
+        newfile.append(data)
+        lfc_id, _ = newfile.store()
+        self.moveToSwift(lfc_id)
+        sha256 = hashlib.sha256(data).hexdigest()
+        for _ in range(2):
+            stream = yield self.storage.open(
+                lfc_id, size=len(data), sha256=sha256
+            )
+            chunks = []
+            while True:
+                chunk = yield stream.read(self.storage.CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            stream.close()
+            self.assertEqual(data, b"".join(chunks))
+        self.assertEqual(1, self.storage.swift_download_attempts)
+        # Ranges can be served from the cache too.
+        stream = yield self.storage.open(lfc_id, 10, 20)
+        self.assertEqual(data[10:30], stream.read(100))
+
     @defer.inlineCallbacks
     def test_multiple_swift_instances(self):
         # If multiple Swift instances are configured, LibrarianStorage tries
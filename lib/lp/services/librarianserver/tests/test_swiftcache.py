@@ -0,0 +1,117 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the local Swift cache."""
+
+import hashlib
+import os
+from io import BytesIO
+
+from fixtures import TempDir
+from testtools.twistedsupport import AsynchronousDeferredRunTest
+from twisted.internet import defer
+
+from lp.services.librarianserver.swiftcache import (
+    TEMPORARY_PREFIX,
+    SwiftCache,
+    get_swift_cache,
+)
+from lp.testing import TestCase
+
+
+class TestSwiftCache(TestCase):
+    run_tests_with = AsynchronousDeferredRunTest.make_factory(timeout=30)
+
+    def setUp(self):
+        super().setUp()
+        self.directory = self.useFixture(TempDir()).path
+
+    @defer.inlineCallbacks
+    def readAll(self, stream, chunk_size=3):
+        chunks = []
+        while True:
+            chunk = yield stream.read(chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        stream.close()
+        return b"".join(chunks)
+
+    @defer.inlineCallbacks
+    def populate(self, cache, fileid, data, sha256=None):
+        if sha256 is None:
+            sha256 = hashlib.sha256(data).hexdigest()
+        stream = cache.wrap(fileid, BytesIO(data), len(data), sha256)
+        read_data = yield self.readAll(stream)
+        self.assertEqual(data, read_data)
+
+    @defer.inlineCallbacks
+    def test_populate_and_hit(self):
+        cache = SwiftCache(self.directory, 100)
+        self.assertIsNone(cache.open(1))
+        yield self.populate(cache, 1, b"some data")
+        stream = cache.open(1)
+        self.assertEqual(b"some data", stream.read())
+        stream.close()
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        self.assertEqual(9, cache.total_size)
+        self.assertEqual(["1"], os.listdir(self.directory))
+
+    @defer.inlineCallbacks
+    def test_checksum_mismatch_not_cached(self):
+        cache = SwiftCache(self.directory, 100)
+        yield self.populate(cache, 1, b"some data", sha256="0" * 64)
+        self.assertIsNone(cache.open(1))
+        self.assertEqual([], os.listdir(self.directory))
+
+    @defer.inlineCallbacks
+    def test_incomplete_read_not_cached(self):
+        cache = SwiftCache(self.directory, 100)
+        data = b"some data"
+        stream = cache.wrap(
+            1, BytesIO(data), len(data), hashlib.sha256(data).hexdigest()
+        )
+        yield stream.read(4)
+        stream.close()
+        self.assertIsNone(cache.open(1))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_too_large_not_wrapped(self):
+        cache = SwiftCache(self.directory, 5)
+        stream = BytesIO(b"some data")
+        self.assertIs(stream, cache.wrap(1, stream, 9, "0" * 64))
+
+    @defer.inlineCallbacks
+    def test_evicts_least_recently_used(self):
+        cache = SwiftCache(self.directory, 10)
+        yield self.populate(cache, 1, b"aaaa")
+        yield self.populate(cache, 2, b"bbbb")
+        cache.open(1).close()
+        yield self.populate(cache, 3, b"cccc")
+        self.assertIsNone(cache.open(2))
+        self.assertIsNotNone(cache.open(1))
+        self.assertIsNotNone(cache.open(3))
+        self.assertEqual(8, cache.total_size)
+        self.assertEqual(["1", "3"], sorted(os.listdir(self.directory)))
+
+    @defer.inlineCallbacks
+    def test_reloads_existing_contents(self):
+        cache = SwiftCache(self.directory, 100)
+        yield self.populate(cache, 1, b"some data")
+        with open(os.path.join(self.directory, TEMPORARY_PREFIX + "x"), "w"):
+            pass
+        cache = SwiftCache(self.directory, 100)
+        self.assertEqual(9, cache.total_size)
+        self.assertEqual(b"some data", cache.open(1).read())
+        self.assertEqual(["1"], os.listdir(self.directory))
+
+    def test_get_swift_cache(self):
+        self.assertIsNone(get_swift_cache())
+        self.pushConfig(
+            "librarian_server",
+            swift_cache_directory=self.directory,
+            swift_cache_size=1000,
+        )
+        cache = get_swift_cache()
+        self.assertEqual(self.directory, cache.directory)
+        self.assertIs(cache, get_swift_cache())
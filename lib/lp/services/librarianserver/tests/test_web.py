@@ -38,7 +38,11 @@
 from lp.services.librarian.interfaces.client import DownloadFailed
 from lp.services.librarian.model import LibraryFileAlias, TimeLimitedToken
 from lp.services.librarianserver.storage import LibrarianStorage
-from lp.services.librarianserver.web import LibraryFileAliasResource
+from lp.services.librarianserver.web import (
+    MAX_BYTE_RANGES,
+    LibraryFileAliasResource,
+    parse_byte_ranges,
+)
 from lp.services.macaroons.interfaces import IMacaroonIssuer
 from lp.testing import TestCaseWithFactory
 from lp.testing.dbuser import dbuser, switch_dbuser
@@ -318,6 +322,103 @@ def test_headers(self):
         # And we should have a correct Last-Modified header too.
         self.assertEqual(last_modified_header, "Tue, 30 Jan 2001 13:45:59 GMT")
 
+    def addSampleFile(self, sample_data):
+        client = LibrarianClient()
+        file_alias_id = client.addFile(
+            "sample",
+            len(sample_data),
+            BytesIO(sample_data),
+            contentType="text/plain",
+            allow_zero_length=True,
+        )
+        url = client.getURLForAlias(file_alias_id)
+        self.commit()
+        return url
+
+    def test_single_range(self):
+        # A request for a single byte range returns just those bytes.
+        url = self.addSampleFile(b"0123456789")
+        response = requests.get(url, headers={"Range": "bytes=2-5"})
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(b"2345", response.content)
+        self.assertEqual("bytes 2-5/10", response.headers["Content-Range"])
+        self.assertEqual("bytes", response.headers["Accept-Ranges"])
+        self.assertEqual("text/plain", response.headers["Content-Type"])
+
+    def test_suffix_range(self):
+        url = self.addSampleFile(b"0123456789")
+        response = requests.get(url, headers={"Range": "bytes=-3"})
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(b"789", response.content)
+        self.assertEqual("bytes 7-9/10", response.headers["Content-Range"])
+
+    def test_multiple_ranges(self):
+        # A request for several byte ranges returns a multipart response.
+        url = self.addSampleFile(b"0123456789")
+        response = requests.get(url, headers={"Range": "bytes=0-1,6-"})
+        self.assertEqual(206, response.status_code)
+        content_type = response.headers["Content-Type"]
+        self.assertTrue(content_type.startswith("multipart/byteranges; "))
+        boundary = content_type.split('boundary="')[1].rstrip('"')
+        self.assertEqual(
+            (
+                "\r\n--%(b)s\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Range: bytes 0-1/10\r\n\r\n"
+                "01"
+                "\r\n--%(b)s\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Range: bytes 6-9/10\r\n\r\n"
+                "6789"
+                "\r\n--%(b)s--\r\n" % {"b": boundary}
+            ).encode("ASCII"),
+            response.content,
+        )
+        self.assertEqual(
+            str(len(response.content)), response.headers["Content-Length"]
+        )
+
+    def test_unsatisfiable_range(self):
+        url = self.addSampleFile(b"0123456789")
+        response = requests.get(url, headers={"Range": "bytes=10-"})
+        self.assertEqual(416, response.status_code)
+        self.assertEqual("bytes */10", response.headers["Content-Range"])
+
+    def test_range_on_empty_file(self):
+        # No range of an empty file is satisfiable.
+        url = self.addSampleFile(b"")
+        for range_header in ("bytes=0-", "bytes=-5"):
+            response = requests.get(url, headers={"Range": range_header})
+            self.assertEqual(416, response.status_code)
+            self.assertEqual("bytes */0", response.headers["Content-Range"])
+
+    def test_invalid_range_ignored(self):
+        # A syntactically-invalid Range header is ignored.
+        url = self.addSampleFile(b"0123456789")
+        response = requests.get(url, headers={"Range": "bytes=5-2"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b"0123456789", response.content)
+
+    def test_if_range(self):
+        # If-Range only allows a partial response if the file has not
+        # changed since the given date.
+        url = self.addSampleFile(b"0123456789")
+        last_modified = requests.get(url).headers["Last-Modified"]
+        response = requests.get(
+            url, headers={"Range": "bytes=2-5", "If-Range": last_modified}
+        )
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(b"2345", response.content)
+        response = requests.get(
+            url,
+            headers={
+                "Range": "bytes=2-5",
+                "If-Range": "Tue, 30 Jan 2001 13:45:59 GMT",
+            },
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b"0123456789", response.content)
+
     @defer.inlineCallbacks
     def test_http_proxy_used_when_configured(self):
         # When an HTTP proxy is configured and the requested file is missing
@@ -357,6 +458,7 @@ def test_http_proxy_used_when_configured(self):
                 datetime.now(timezone.utc),
                 100,
                 False,
+                None,
             )
             yield resource._cb_getFileAlias(file_data, b"test.txt", request)
 
@@ -637,6 +739,40 @@ class LibrarianZopelessWebMacaroonTestCase(
     layer = ZopelessAppServerLayer
 
 
+class TestParseByteRanges(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual([(0, 3)], parse_byte_ranges(b"bytes=0-3", 10))
+        self.assertEqual([(2, 9)], parse_byte_ranges(b"bytes=2-", 10))
+        self.assertEqual([(7, 9)], parse_byte_ranges(b"bytes=-3", 10))
+        self.assertEqual([(0, 9)], parse_byte_ranges(b"bytes=-30", 10))
+        self.assertEqual([(8, 9)], parse_byte_ranges(b"bytes=8-100", 10))
+        self.assertEqual(
+            [(0, 0), (9, 9)], parse_byte_ranges(b"bytes=0-0, -1", 10)
+        )
+
+    def test_unsatisfiable(self):
+        self.assertEqual([], parse_byte_ranges(b"bytes=10-", 10))
+        self.assertEqual([], parse_byte_ranges(b"bytes=-0", 10))
+        self.assertEqual([], parse_byte_ranges(b"bytes=0-", 0))
+        self.assertEqual([], parse_byte_ranges(b"bytes=-5", 0))
+        self.assertEqual([(1, 2)], parse_byte_ranges(b"bytes=20-,1-2", 10))
+
+    def test_invalid(self):
+        self.assertIsNone(parse_byte_ranges(b"items=0-1", 10))
+        self.assertIsNone(parse_byte_ranges(b"bytes", 10))
+        self.assertIsNone(parse_byte_ranges(b"bytes=5-2", 10))
+        self.assertIsNone(parse_byte_ranges(b"bytes=a-b", 10))
+        self.assertIsNone(parse_byte_ranges(b"bytes=-", 10))
+        self.assertIsNone(parse_byte_ranges(b"bytes=1", 10))
+
+    def test_too_many_ranges(self):
+        self.assertIsNone(
+            parse_byte_ranges(
+                b"bytes=" + b",".join([b"0-0"] * (MAX_BYTE_RANGES + 1)), 10
+            )
+        )
+
+
 class DeletedContentTestCase(unittest.TestCase):
     layer = LaunchpadZopelessLayer
 
@@ -1,8 +1,10 @@
 # Copyright 2009-2023 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
+import os
 import time
 from datetime import datetime
+from functools import partial
 from urllib.parse import urlparse
 
 import six
@@ -25,6 +27,7 @@
 from lp.services.database import read_transaction, write_transaction
 from lp.services.librarian.client import url_path_quote
 from lp.services.librarian.utils import guess_librarian_encoding
+from lp.services.librarianserver.storage import is_local_stream
 
 defaultResource = static.Data(
     b"""
@@ -45,10 +48,92 @@
 fourOhFour = resource.NoResource("No such resource")
 
 
+# Requests for more byte ranges than this are served in full, to avoid
+# making an excessive number of backend requests for a single response.
+MAX_BYTE_RANGES = 50
+
+
 class NotFound(Exception):
     pass
 
 
+def parse_byte_ranges(range_header, size):
+    """Parse an HTTP Range header for a file of a given size.
+
+    Modelled after `twisted.web.static.File._parseRangeHeader`, but also
+    resolves the ranges against the file size.
+
+    :param range_header: The value of the Range header, as bytes.
+    :param size: The size of the file in bytes.
+    :return: None if the header is invalid or unsupported and so should be
+        ignored; otherwise a list of satisfiable (start, end) pairs, where
+        `end` is inclusive.  The list is empty if no range is satisfiable.
+    """
+    unit, sep, value = range_header.partition(b"=")
+    if not sep or unit.strip().lower() != b"bytes":
+        return None
+    ranges = []
+    for spec in value.split(b","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = (part.strip() for part in spec.partition(b"-"))
+        if not sep or (first and not first.isdigit()):
+            return None
+        if last and not last.isdigit():
+            return None
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+        elif last:
+            # A suffix range: the last N bytes of the file.  An empty file
+            # has no last bytes, so no suffix range on it is satisfiable.
+            if int(last) == 0 or size == 0:
+                continue
+            ranges.append((max(0, size - int(last)), size - 1))
+        else:
+            return None
+    if len(ranges) > MAX_BYTE_RANGES:
+        return None
+    return ranges
+
+
+def posix_timestamp(modification_time):
+    """Convert a UTC datetime to a POSIX timestamp (in local time)."""
+    offset = datetime.utcnow() - datetime.now()
+    local_modification_time = modification_time - offset
+    return time.mktime(local_modification_time.timetuple())
+
+
+def get_byte_ranges(request, size, modification_time):
+    """Return the byte ranges requested for a file, if any.
+
+    :return: None if the whole file should be returned; otherwise a
+        (possibly empty) list as returned by `parse_byte_ranges`.
+    """
+    if request.method != b"GET":
+        return None
+    range_header = request.getHeader(b"range")
+    if range_header is None:
+        return None
+    if_range = request.getHeader(b"if-range")
+    if if_range is not None:
+        # We don't send entity tags, so If-Range can only match our
+        # Last-Modified date; anything else means that the client's copy
+        # is out of date and it needs the whole file.
+        last_modified = http.datetimeToString(
+            posix_timestamp(modification_time)
+        )
+        if if_range.strip() != last_modified:
+            return None
+    return parse_byte_ranges(range_header, size)
+
+
 class LibraryFileResource(resource.Resource):
     def __init__(self, storage, upstreamHost, upstreamPort):
         resource.Resource.__init__(self)
@@ -207,6 +292,7 @@ def _getFileAlias(self, aliasID, token, path):
                 alias.date_created,
                 alias.content.filesize,
                 alias.restricted,
+                alias.content.sha256,
             )
         except LookupError:
             raise NotFound
@@ -233,6 +319,7 @@ def _cb_getFileAlias(self, results, filename, request):
             date_created,
             size,
             restricted,
+            sha256,
         ) = results
         # Return a 404 if the filename in the URL is incorrect. This offers
         # a crude form of access control (stuff we care about can have
@@ -244,12 +331,30 @@ def _cb_getFileAlias(self, results, filename, request):
             )
             return fourOhFour
 
-        stream = yield self.storage.open(dbcontentID)
+        ranges = get_byte_ranges(request, size, date_created)
+        if ranges:
+            # Only fetch the bytes we need, starting with the first range.
+            start, end = ranges[0]
+            stream = yield self.storage.open(
+                dbcontentID, start, end - start + 1
+            )
+        else:
+            stream = yield self.storage.open(
+                dbcontentID, size=size, sha256=sha256
+            )
         if stream is not None:
             # XXX: Brad Crittenden 2007-12-05 bug=174204: When encodings are
             # stored as part of a file's metadata this logic will be replaced.
             encoding, mimetype = guess_librarian_encoding(dbfilename, mimetype)
-            file = File(mimetype, encoding, date_created, stream, size)
+            file = File(
+                mimetype,
+                encoding,
+                date_created,
+                stream,
+                size,
+                ranges=ranges,
+                open_range=partial(self.storage.open, dbcontentID),
+            )
             # Set our caching headers. Public Librarian files can be
             # cached forever, while private ones mustn't be at all.
             request.setHeader(
@@ -297,21 +402,39 @@ def render_GET(self, request):
 class File(resource.Resource):
     isLeaf = True
 
-    def __init__(self, contentType, encoding, modification_time, stream, size):
+    def __init__(
+        self,
+        contentType,
+        encoding,
+        modification_time,
+        stream,
+        size,
+        ranges=None,
+        open_range=None,
+    ):
+        """Construct a `File`.
+
+        :param stream: A stream of the file's contents, or of the first
+            range in `ranges` if that is non-empty.
+        :param ranges: None to return the whole file, or a list of
+            (start, end) byte ranges as returned by `parse_byte_ranges`.
+        :param open_range: A callable taking an offset and a length and
+            returning a Deferred that fires with a stream of that range of
+            the file; used to fetch the second and subsequent ranges.
+        """
         resource.Resource.__init__(self)
-        # Have to convert the UTC datetime to POSIX timestamp (localtime)
-        offset = datetime.utcnow() - datetime.now()
-        local_modification_time = modification_time - offset
-        self._modification_time = time.mktime(
-            local_modification_time.timetuple()
-        )
+        self._modification_time = posix_timestamp(modification_time)
         self.type = contentType
         self.encoding = encoding
         self.stream = stream
         self.size = size
+        self.ranges = ranges
+        self.open_range = open_range
 
-    def _setContentHeaders(self, request):
-        request.setHeader(b"content-length", intToBytes(self.size))
+    def _setContentHeaders(self, request, size=None):
+        if size is None:
+            size = self.size
+        request.setHeader(b"content-length", intToBytes(size))
         if self.type:
             request.setHeader(
                 b"content-type", six.ensure_binary(self.type, "ASCII")
@@ -321,9 +444,47 @@ def _setContentHeaders(self, request):
                 b"content-encoding", six.ensure_binary(self.encoding, "ASCII")
             )
 
+    def _contentRange(self, start, end):
+        return b"bytes %d-%d/%d" % (start, end, self.size)
+
+    def _makeMultipartParts(self):
+        """Build the part headers for a multipart/byteranges response.
+
+        :return: A tuple of the boundary, a list of (part header, start,
+            end) tuples, and the total content length.
+        """
+        boundary = b"%x%x" % (int(time.time() * 1000000), os.getpid())
+        parts = []
+        content_length = 0
+        for start, end in self.ranges:
+            part_header = b"\r\n--" + boundary + b"\r\n"
+            if self.type:
+                part_header += (
+                    b"Content-Type: "
+                    + six.ensure_binary(self.type, "ASCII")
+                    + b"\r\n"
+                )
+            part_header += (
+                b"Content-Range: " + self._contentRange(start, end) + b"\r\n"
+            )
+            part_header += b"\r\n"
+            parts.append((part_header, start, end))
+            content_length += len(part_header) + end - start + 1
+        content_length += len(b"\r\n--" + boundary + b"--\r\n")
+        return boundary, parts, content_length
+
+    def _makeProducer(self, request):
+        """Make a producer for our (single) stream."""
+        if is_local_stream(self.stream):
+            # Local files can be read synchronously, so let the transport
+            # pull data as fast as it can send it, as `static.File` does,
+            # rather than bouncing each chunk through the reactor.
+            return static.NoRangeStaticProducer(request, self.stream)
+        return FileProducer(request, self.stream)
+
     def render_GET(self, request):
         """See `Resource`."""
-        request.setHeader(b"accept-ranges", b"none")
+        request.setHeader(b"accept-ranges", b"bytes")
 
         if request.setLastModified(self._modification_time) is http.CACHED:
             # `setLastModified` also sets the response code for us, so if
@@ -339,18 +500,42 @@ def render_GET(self, request):
             self.stream.close()
             return b""
 
-        # static.File has HTTP range support, which would be nice to have.
-        # Unfortunately, static.File isn't a good match for producing data
-        # dynamically by fetching it from Swift. The librarian used to sit
-        # behind Squid, which took care of this, but it no longer does. I
-        # think we will need to cargo-cult the byte-range support and three
-        # Producer implementations from static.File, making the small
-        # modifications to cope with self.fileObject.read maybe returning a
-        # Deferred, and the static.File.makeProducer method to return the
-        # correct producer.
-        self._setContentHeaders(request)
-        request.setResponseCode(http.OK)
-        producer = FileProducer(request, self.stream)
+        if self.ranges is None:
+            self._setContentHeaders(request)
+            request.setResponseCode(http.OK)
+            producer = self._makeProducer(request)
+        elif not self.ranges:
+            self.stream.close()
+            request.setResponseCode(http.REQUESTED_RANGE_NOT_SATISFIABLE)
+            request.setHeader(b"content-range", b"bytes */%d" % self.size)
+            request.setHeader(b"content-length", b"0")
+            return b""
+        elif len(self.ranges) == 1:
+            start, end = self.ranges[0]
+            self._setContentHeaders(request, size=end - start + 1)
+            request.setResponseCode(http.PARTIAL_CONTENT)
+            request.setHeader(b"content-range", self._contentRange(start, end))
+            producer = self._makeProducer(request)
+        else:
+            boundary, parts, content_length = self._makeMultipartParts()
+            request.setResponseCode(http.PARTIAL_CONTENT)
+            request.setHeader(b"content-length", intToBytes(content_length))
+            request.setHeader(
+                b"content-type",
+                b'multipart/byteranges; boundary="%s"' % boundary,
+            )
+            if self.encoding:
+                request.setHeader(
+                    b"content-encoding",
+                    six.ensure_binary(self.encoding, "ASCII"),
+                )
+            producer = MultipleRangeFileProducer(
+                request,
+                self.stream,
+                parts,
+                self.open_range,
+                b"\r\n--" + boundary + b"--\r\n",
+            )
         producer.start()
 
         return server.NOT_DONE_YET
@@ -385,9 +570,21 @@ def _produceFromStream(self):
             if data:
                 self.request.write(data)
             else:
-                self.request.unregisterProducer()
-                self.request.finish()
-                self.stopProducing()
+                more = yield self._nextStream()
+                if not self.producing:
+                    return
+                if not more:
+                    self.request.unregisterProducer()
+                    self.request.finish()
+                    self.stopProducing()
+
+    def _nextStream(self):
+        """Move on to the next stream once the current one is exhausted.
+
+        :return: True (or a Deferred firing with True) if there is more
+            data to produce.
+        """
+        return False
 
     def resumeProducing(self):
         """See `IPushProducer`."""
@@ -398,10 +595,67 @@ def resumeProducing(self):
     def stopProducing(self):
         """See `IProducer`."""
         self.producing = False
-        self.stream.close()
+        if self.stream is not None:
+            self.stream.close()
         self.request = None
 
 
+class MultipleRangeFileProducer(FileProducer):
+    """Produce a multipart/byteranges response body.
+
+    Each range is streamed separately, so that only the requested bytes
+    are fetched from storage.
+    """
+
+    def __init__(self, request, stream, parts, open_range, trailer):
+        """Construct a `MultipleRangeFileProducer`.
+
+        :param stream: A stream of the first range.
+        :param parts: A list of (part header, start, end) tuples.
+        :param open_range: A callable taking an offset and a length and
+            returning a Deferred that fires with a stream of that range.
+        :param trailer: The final multipart boundary.
+        """
+        super().__init__(request, stream)
+        self.parts = list(parts)
+        self.open_range = open_range
+        self.trailer = trailer
+        self._wrote_first_header = False
+
+    @defer.inlineCallbacks
+    def _produceFromStream(self):
+        if not self._wrote_first_header and self.request:
+            self._wrote_first_header = True
+            self.request.write(self.parts.pop(0)[0])
+        yield super()._produceFromStream()
+
+    @defer.inlineCallbacks
+    def _nextStream(self):
+        self.stream.close()
+        self.stream = None
+        if not self.parts:
+            self.request.write(self.trailer)
+            return False
+        part_header, start, end = self.parts.pop(0)
+        self.request.write(part_header)
+        stream = yield self.open_range(start, end - start + 1)
+        if self.request is None:
+            # stopProducing was called while we were waiting.
+            if stream is not None:
+                stream.close()
+            return False
+        if stream is None:
+            # The headers have already been sent, so all we can do is drop
+            # the connection.
+            log.msg("Content missing from storage during ranged response")
+            self.request.unregisterProducer()
+            self.request.loseConnection()
+            self.stopProducing()
+            return False
+        self.stream = stream
+        return True
+
+
 class DigestSearchResource(resource.Resource):
     def __init__(self, storage):
         self.storage = storage
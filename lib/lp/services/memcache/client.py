@@ -46,6 +46,20 @@ def set(self, key, value, expire=0, logger=None):
                 logger.exception("Cannot set %s in memcached: %s" % (key, e))
             return False
 
+    def add(self, key, value, expire=0, logger=None):
+        """Set a key in memcached only if it is not already set.
+
+        Server failures are disregarded.
+        """
+        try:
+            return super().add(key, value, expire=expire, noreply=False)
+        except MemcacheClientError:
+            raise
+        except (MemcacheError, OSError) as e:
+            if logger is not None:
+                logger.exception("Cannot add %s to memcached: %s" % (key, e))
+            return False
+
     def delete(self, key, logger=None):
         """Set a key in memcached, disregarding server failures."""
         try:
@@ -47,6 +47,11 @@ def set(self, key, val, expire=0, logger=None):
         self._cache[key] = (val, expire)
         return 1
 
+    def add(self, key, val, expire=0, logger=None):
+        if self.get(key) is not None:
+            return False
+        return self.set(key, val, expire=expire)
+
     def delete(self, key, logger=None):
         self._cache.pop(key, None)
         return 1
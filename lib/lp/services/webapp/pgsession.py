@@ -6,6 +6,8 @@
 import hashlib
 import io
 import pickle
+import threading
+import time
 from collections.abc import MutableMapping
 from datetime import datetime
 
@@ -16,6 +18,8 @@
 from zope.component import getUtility
 from zope.interface import implementer
 
+from lp.services.config import config
+from lp.services.memcache.interfaces import IMemcacheClient
 from lp.services.webapp.interfaces import (
     IClientIdManager,
     ISessionData,
@@ -28,6 +32,15 @@
 HOURS = 60 * MINUTES
 DAYS = 24 * HOURS
 
+# Writes to the session database are committed immediately (its connection
+# is in autocommit mode), so a request that read session data from the
+# database just before another request changed it could otherwise put the
+# old data back in memcache.  To prevent that, each change replaces the
+# copy in memcache with this marker for a while, and copies are only ever
+# added to memcache if nothing is there already.
+SESSION_MEMCACHE_TOMBSTONE = "changed"
+SESSION_MEMCACHE_TOMBSTONE_LIFETIME = 1 * MINUTES
+
 
 class Python2FriendlyUnpickler(pickle._Unpickler):
     """An unpickler that handles Python 2 datetime objects.
@@ -93,6 +106,45 @@ class PGSessionDataContainer(PGSessionBase):
     session_data_table_name = "SessionData"
     session_pkg_data_table_name = "SessionPkgData"
 
+    def __init__(self):
+        self._last_accessed_lock = threading.Lock()
+        self._accessed_client_ids = set()
+        self._last_accessed_flush_time = None
+
+    def updateLastAccessed(self, store, hashed_client_id):
+        """Record that a session has been accessed.
+
+        Each session's last access time is updated in the database if it
+        is out of date.  If
+        `config.launchpad.session_last_accessed_flush_interval` is set,
+        sessions are only updated at most that often, in bulk.
+        """
+        interval = config.launchpad.session_last_accessed_flush_interval
+        if interval:
+            now = time.monotonic()
+            with self._last_accessed_lock:
+                self._accessed_client_ids.add(hashed_client_id)
+                if (
+                    self._last_accessed_flush_time is not None
+                    and now < self._last_accessed_flush_time + interval
+                ):
+                    return
+                hashed_client_ids = sorted(self._accessed_client_ids)
+                self._accessed_client_ids = set()
+                self._last_accessed_flush_time = now
+        else:
+            hashed_client_ids = [hashed_client_id]
+        query = """
+            UPDATE %s SET last_accessed = CURRENT_TIMESTAMP
+            WHERE client_id IN (%s)
+                AND last_accessed < CURRENT_TIMESTAMP - '%d seconds'::interval
+            """ % (
+            self.session_data_table_name,
+            ", ".join("?" * len(hashed_client_ids)),
+            self.resolution,
+        )
+        store.execute(query, tuple(hashed_client_ids), noresult=True)
+
     def __getitem__(self, client_id):
         """See `ISessionDataContainer`."""
         return PGSessionData(self, client_id)
@@ -118,16 +170,9 @@ def __init__(self, session_data_container, client_id):
         ).hexdigest()
 
         # Update the last access time in the db if it is out of date
-        table_name = session_data_container.session_data_table_name
-        query = """
-            UPDATE %s SET last_accessed = CURRENT_TIMESTAMP
-            WHERE client_id = ?
-                AND last_accessed < CURRENT_TIMESTAMP - '%d seconds'::interval
-            """ % (
-            table_name,
-            session_data_container.resolution,
+        session_data_container.updateLastAccessed(
+            self.store, self.hashed_client_id
         )
-        self.store.execute(query, (self.hashed_client_id,), noresult=True)
 
     def _ensureClientId(self):
         if self._have_ensured_client_id:
@@ -204,24 +249,74 @@ def __init__(self, session_data, product_id):
 
     _data_cache = None
 
+    @property
+    def _memcache_key(self):
+        """The memcache key for this data, or None if not using memcache."""
+        if not config.launchpad.session_memcache_lifetime:
+            return None
+        return (
+            "%s:session:%s:%s"
+            % (
+                config.instance_name,
+                self.session_data.hashed_client_id,
+                self.product_id,
+            )
+        ).encode("UTF-8")
+
     def _populate(self):
+        memcache_key = self._memcache_key
+        pickled_values = None
+        if memcache_key is not None:
+            pickled_values = getUtility(IMemcacheClient).get(memcache_key)
+            if pickled_values == SESSION_MEMCACHE_TOMBSTONE:
+                # This data was changed recently; read it from the
+                # database, and leave the marker alone.
+                memcache_key = None
+                pickled_values = None
+        if pickled_values is None:
+            query = (
+                """
+                SELECT key, pickle FROM %s WHERE client_id = ?
+                    AND product_id = ?
+                """
+                % self.table_name
+            )
+            result = self.store.execute(
+                query, (self.session_data.hashed_client_id, self.product_id)
+            )
+            pickled_values = {
+                key: bytes(pickled_value) for key, pickled_value in result
+            }
+            # Don't fill memcache with empty data for anonymous visitors.
+            # If the data has been changed since we read it, then the
+            # marker left by the change means that this does nothing.
+            if memcache_key is not None and pickled_values:
+                getUtility(IMemcacheClient).add(
+                    memcache_key,
+                    pickled_values,
+                    expire=config.launchpad.session_memcache_lifetime,
+                )
         self._data_cache = {}
-        query = (
-            """
-            SELECT key, pickle FROM %s WHERE client_id = ?
-                AND product_id = ?
-            """
-            % self.table_name
-        )
-        result = self.store.execute(
-            query, (self.session_data.hashed_client_id, self.product_id)
-        )
-        for key, pickled_value in result:
-            value = Python2FriendlyUnpickler(
-                io.BytesIO(bytes(pickled_value))
-            ).load()
+        for key, pickled_value in pickled_values.items():
+            value = Python2FriendlyUnpickler(io.BytesIO(pickled_value)).load()
             self._data_cache[key] = value
 
+    def _invalidateMemcache(self):
+        """Forget any copy of this data in memcache.
+
+        This must be called after changing the data in the database.  The
+        copy is replaced with a marker that stops other requests that read
+        the old data from the database from adding it back to memcache.
+        """
+        memcache_key = self._memcache_key
+        if memcache_key is None:
+            return
+        getUtility(IMemcacheClient).set(
+            memcache_key,
+            SESSION_MEMCACHE_TOMBSTONE,
+            expire=SESSION_MEMCACHE_TOMBSTONE_LIFETIME,
+        )
+
     def __getitem__(self, key):
         return self._data_cache[key]
 
@@ -241,6 +336,7 @@ def __setitem__(self, key, value):
             ),
             noresult=True,
         )
+        self._invalidateMemcache()
 
         # Store the value in the cache too
         self._data_cache[key] = value
@@ -274,6 +370,7 @@ def __delitem__(self, key):
             ),
             noresult=True,
         )
+        self._invalidateMemcache()
 
     def __iter__(self):
         return iter(self._data_cache)
@@ -5,12 +5,18 @@
 
 import hashlib
 from datetime import datetime
+from unittest import mock
 
 from zope.publisher.browser import TestRequest
 from zope.security.management import endInteraction, newInteraction
 
+from lp.services.memcache.testing import MemcacheFixture
 from lp.services.webapp.interfaces import ISessionData, ISessionDataContainer
-from lp.services.webapp.pgsession import PGSessionData, PGSessionDataContainer
+from lp.services.webapp.pgsession import (
+    SESSION_MEMCACHE_TOMBSTONE,
+    PGSessionData,
+    PGSessionDataContainer,
+)
 from lp.testing import TestCase
 from lp.testing.layers import LaunchpadFunctionalLayer, LaunchpadLayer
 
@@ -210,3 +216,145 @@ def test_datetime_compatibility(self):
         pkgdata = session[product_id]
         self.assertEqual(expected_datetime, pkgdata["logintime"])
         self.assertEqual(expected_datetime, pkgdata["last_write"])
+
+    def makeRecentlyAccessed(self, client_id, accessed=True):
+        """Make a session, and set whether it was accessed recently."""
+        hashed_client_id = hashlib.sha256(client_id.encode()).hexdigest()
+        store = self.sdc.store
+        store.execute(
+            "SELECT ensure_session_client_id(?)",
+            (hashed_client_id,),
+            noresult=True,
+        )
+        store.execute(
+            """
+            UPDATE SessionData SET last_accessed = %s
+            WHERE client_id = ?
+            """
+            % (
+                "CURRENT_TIMESTAMP"
+                if accessed
+                else "CURRENT_TIMESTAMP - '1 day'::interval"
+            ),
+            (hashed_client_id,),
+            noresult=True,
+        )
+        return hashed_client_id
+
+    def getRecentlyAccessed(self):
+        """Return the hashed IDs of recently-accessed sessions."""
+        result = self.sdc.store.execute(
+            """
+            SELECT client_id FROM SessionData
+            WHERE last_accessed > CURRENT_TIMESTAMP - '1 hour'::interval
+            """
+        )
+        return {row[0] for row in result}
+
+    def test_last_accessed_updated(self):
+        hashed_client_id = self.makeRecentlyAccessed("Client Id", False)
+        self.sdc["Client Id"]
+        self.assertEqual({hashed_client_id}, self.getRecentlyAccessed())
+
+    def test_last_accessed_batched(self):
+        # With session_last_accessed_flush_interval set, last access times
+        # are updated at most that often, for all sessions at once.
+        self.pushConfig("launchpad", session_last_accessed_flush_interval=60)
+        hashed_client_ids = [
+            self.makeRecentlyAccessed("Client Id #%d" % i, False)
+            for i in range(3)
+        ]
+        self.sdc["Client Id #0"]
+        self.assertEqual({hashed_client_ids[0]}, self.getRecentlyAccessed())
+        self.makeRecentlyAccessed("Client Id #0", False)
+        self.sdc["Client Id #0"]
+        self.sdc["Client Id #1"]
+        self.assertEqual(set(), self.getRecentlyAccessed())
+        self.sdc._last_accessed_flush_time -= 60
+        self.sdc["Client Id #2"]
+        self.assertEqual(set(hashed_client_ids), self.getRecentlyAccessed())
+
+    def startNewRequest(self):
+        endInteraction()
+        self.request = TestRequest()
+        newInteraction(self.request)
+
+    def test_memcache(self):
+        # With session_memcache_lifetime set, session data is read from
+        # memcache where possible.
+        memcache = self.useFixture(MemcacheFixture())
+        self.pushConfig("launchpad", session_memcache_lifetime=60)
+        client_id = "Client Id"
+        product_id = "Product Id"
+        self.sdc[client_id][product_id]["key"] = "value"
+        # Changes leave a marker in memcache for a while, during which the
+        # data is read from the database.  Let it expire.
+        memcache.clear()
+        self.startNewRequest()
+        self.assertEqual("value", self.sdc[client_id][product_id]["key"])
+
+        # Remove the data from the database behind memcache's back.
+        store = self.sdc.store
+        store.execute("DELETE FROM SessionPkgData", noresult=True)
+        self.startNewRequest()
+        pkgdata = self.sdc[client_id][product_id]
+        self.assertEqual("value", pkgdata["key"])
+
+        # Changing the data invalidates the copy in memcache, and the rest
+        # of the request sees the change.
+        pkgdata["other"] = "other value"
+        self.assertEqual(
+            {"other": "other value"}, dict(self.sdc[client_id][product_id])
+        )
+        self.startNewRequest()
+        self.assertEqual(
+            {"other": "other value"}, dict(self.sdc[client_id][product_id])
+        )
+
+    def test_memcache_late_fill(self):
+        # A request that read session data from the database before
+        # another request changed it cannot put the old data back in
+        # memcache afterwards.
+        memcache = self.useFixture(MemcacheFixture())
+        self.pushConfig("launchpad", session_memcache_lifetime=60)
+        client_id = "Client Id"
+        product_id = "Product Id"
+        self.sdc[client_id][product_id]["key"] = "old value"
+        # Let the marker left by that change expire.
+        memcache.clear()
+
+        # One request reads the old data from the database, but is slow to
+        # add it to memcache.
+        self.startNewRequest()
+        late_fills = []
+        with mock.patch.object(
+            memcache,
+            "add",
+            side_effect=lambda *args, **kwargs: late_fills.append(
+                (args, kwargs)
+            ),
+        ):
+            self.assertEqual(
+                "old value", self.sdc[client_id][product_id]["key"]
+            )
+        self.assertEqual(1, len(late_fills))
+
+        # Meanwhile, another request changes the data.
+        self.startNewRequest()
+        self.sdc[client_id][product_id]["key"] = "new value"
+
+        # The late fill does not overwrite the change.
+        for args, kwargs in late_fills:
+            memcache.add(*args, **kwargs)
+        memcache_key = self.sdc[client_id][product_id]._memcache_key
+        self.assertEqual(
+            SESSION_MEMCACHE_TOMBSTONE, memcache.get(memcache_key)
+        )
+        self.startNewRequest()
+        self.assertEqual("new value", self.sdc[client_id][product_id]["key"])
+
+        # Once the marker expires, the new data is cached as usual.
+        memcache.clear()
+        self.startNewRequest()
+        self.assertEqual("new value", self.sdc[client_id][product_id]["key"])
+        self.assertIsInstance(memcache.get(memcache_key), dict)
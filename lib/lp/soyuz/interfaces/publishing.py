@@ -1349,7 +1349,11 @@ def getActiveArchSpecificPublications(
         """
 
     def getSourcesForPublishing(
-        archive, distroseries=None, pocket=None, component=None
+        archive,
+        distroseries=None,
+        pocket=None,
+        component=None,
+        skip_preload_ids=None,
     ):
         """Get source publications which are published in a given context.
 
@@ -1357,6 +1361,10 @@ def getSourcesForPublishing(
         :param distroseries: The `DistroSeries` to search, or None.
         :param pocket: The `PackagePublishingPocket` to search, or None.
         :param component: The `Component` to search, or None.
+        :param skip_preload_ids: If not None, a set of publication IDs for
+            which the caller does not need publisher-relevant objects
+            preloaded (for example, because it has cached their index
+            stanzas).
         :return: A result set of `SourcePackagePublishingHistory` objects in
             the given context and with the `PUBLISHED` status, ordered by
             source package name, with associated publisher-relevant objects
@@ -1364,7 +1372,11 @@ def getSourcesForPublishing(
         """
 
     def getBinariesForPublishing(
-        archive, distroarchseries=None, pocket=None, component=None
+        archive,
+        distroarchseries=None,
+        pocket=None,
+        component=None,
+        skip_preload_ids=None,
     ):
         """Get binary publications which are published in a given context.
 
@@ -1372,6 +1384,10 @@ def getBinariesForPublishing(
         :param distroarchseries: The `DistroArchSeries` to search, or None.
         :param pocket: The `PackagePublishingPocket` to search, or None.
         :param component: The `Component` to search, or None.
+        :param skip_preload_ids: If not None, a set of publication IDs for
+            which the caller does not need publisher-relevant objects
+            preloaded (for example, because it has cached their index
+            stanzas).
         :return: A result set of `BinaryPackagePublishingHistory` objects in
             the given context and with the `PUBLISHED` status, ordered by
             binary package name, with associated publisher-relevant objects
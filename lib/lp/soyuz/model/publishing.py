@@ -2114,7 +2114,12 @@ def getActiveArchSpecificPublications(
         )
 
     def getSourcesForPublishing(
-        self, archive, distroseries=None, pocket=None, component=None
+        self,
+        archive,
+        distroseries=None,
+        pocket=None,
+        component=None,
+        skip_preload_ids=None,
     ):
         """See `IPublishingSet`."""
         clauses = [
@@ -2143,6 +2148,10 @@ def getSourcesForPublishing(
         def eager_load(spphs):
             # Preload everything which will be used by archivepublisher's
             # build_source_stanza_fields.
+            if skip_preload_ids is not None:
+                spphs = [
+                    spph for spph in spphs if spph.id not in skip_preload_ids
+                ]
             bulk.load_related(Section, spphs, ["section_id"])
             sprs = bulk.load_related(
                 SourcePackageRelease, spphs, ["sourcepackagerelease_id"]
@@ -2174,7 +2183,12 @@ def eager_load(spphs):
         return DecoratedResultSet(spphs, pre_iter_hook=eager_load)
 
     def getBinariesForPublishing(
-        self, archive, distroarchseries=None, pocket=None, component=None
+        self,
+        archive,
+        distroarchseries=None,
+        pocket=None,
+        component=None,
+        skip_preload_ids=None,
     ):
         """See `IPublishingSet`."""
         clauses = [
@@ -2204,6 +2218,10 @@ def getBinariesForPublishing(
         def eager_load(bpphs):
             # Preload everything which will be used by archivepublisher's
             # build_binary_stanza_fields.
+            if skip_preload_ids is not None:
+                bpphs = [
+                    bpph for bpph in bpphs if bpph.id not in skip_preload_ids
+                ]
             bulk.load_related(Section, bpphs, ["section_id"])
             bprs = bulk.load_related(
                 BinaryPackageRelease, bpphs, ["binarypackagerelease_id"]
@@ -308,9 +308,13 @@ def getFullLanguageCode():
     def getFullLanguageName():
         """Return the language name."""
 
-    def getTranslationRows():
+    def getTranslationRows(potmsgsets=None):
         """Return exportable rows of translation data.
 
+        :param potmsgsets: An optional dict mapping IDs to all the
+            `POTMsgSet`s of this file's template (including obsolete ones),
+            to avoid fetching them again when exporting several files from
+            the same template.
         :return: a list of `VPOExport` objects.
         """
 
@@ -415,6 +419,14 @@ def getBatch(starting_id, batch_size):
         if the end of the table has been reached.
         """
 
+    def updateStatistics(pofiles):
+        """Update the cached statistics for many `POFile`s at once.
+
+        This is equivalent to calling `IPOFile.updateStatistics` on each
+        of `pofiles`, but recounts all of them in a constant number of
+        queries.
+        """
+
     def getPOFilesWithTranslationCredits(untranslated=False):
         """Get POFiles with potential translation credits messages.
 
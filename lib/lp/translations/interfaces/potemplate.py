@@ -536,6 +536,19 @@ def createMessageSetFromText(
         :return: The newly created message set.
         """
 
+    def getSharedPOTMsgSetsByMsgIDs(keys):
+        """Find existing shared POTMsgSets for many messages at once.
+
+        This finds the same POTMsgSets as `getOrCreateSharedPOTMsgSet`
+        would, but does not create any.
+
+        :param keys: An iterable of (msgid_singular, msgid_plural, context)
+            tuples, where msgid_singular is a `POMsgID` and msgid_plural
+            is a `POMsgID` or None.
+        :return: A dict mapping (msgid_singular ID, msgid_plural ID,
+            context) to the POTMsgSet for each message that was found.
+        """
+
     def getOrCreateSharedPOTMsgSet(
         singular_text,
         plural_text,
@@ -249,7 +249,11 @@ def validateTranslations(translations):
         """
 
     def submitSuggestion(
-        pofile, submitter, new_translations, from_import=False
+        pofile,
+        submitter,
+        new_translations,
+        from_import=False,
+        potranslations=None,
     ):
         """Submit a suggested translation for this message.
 
@@ -260,6 +264,9 @@ def submitSuggestion(
         Setting from_import to true will prevent karma assignment and
         set the origin of the created message to SCM instead of
         ROSETTAWEB.
+        potranslations may be a dict mapping translation strings to
+        POTranslations that have already been looked up, to save
+        looking them up again.
         """
 
     def dismissAllSuggestions(pofile, reviewer, lock_timestamp):
@@ -11,6 +11,7 @@
     "POFileToTranslationFileDataAdapter",
 ]
 
+from collections import defaultdict
 from datetime import datetime, timezone
 
 from storm.expr import (
@@ -36,6 +37,7 @@
 
 from lp.app.interfaces.launchpad import ILaunchpadCelebrities
 from lp.registry.interfaces.person import validate_public_person
+from lp.services.database.bulk import load_related
 from lp.services.database.constants import UTC_NOW
 from lp.services.database.interfaces import IPrimaryStore, IStore
 from lp.services.database.sqlbase import flush_database_updates, quote
@@ -81,6 +83,227 @@
 )
 
 
+def _group_pofiles_by_side(pofiles):
+    """Group POFiles by the translation side of their templates.
+
+    :return: A list of (`ITranslationSideTraits`, list of `POFile`s).
+    """
+    side_traits_set = getUtility(ITranslationSideTraitsSet)
+    pofiles_by_side = defaultdict(list)
+    for pofile in pofiles:
+        side_traits = side_traits_set.getForTemplate(pofile.potemplate)
+        pofiles_by_side[side_traits.side].append(pofile)
+    return [
+        (side_traits_set.getTraits(side), side_pofiles)
+        for side, side_pofiles in pofiles_by_side.items()
+    ]
+
+
+def _get_statistics_parameters(pofiles):
+    """Describe POFiles for the bulk statistics queries.
+
+    :return: An SQL VALUES list of (pofile, potemplate, language,
+        plural_forms) rows, where plural_forms is the number of plural forms
+        that a translation of a plural message must have to be complete.
+    """
+    rows = []
+    for pofile in pofiles:
+        pluralforms = pofile.language.pluralforms
+        if pluralforms is not None and pluralforms > 1:
+            plural_forms = pofile.plural_forms
+        else:
+            plural_forms = 1
+        rows.append(
+            "(%s)"
+            % ", ".join(
+                quote(value)
+                for value in (
+                    pofile.id,
+                    pofile.potemplate_id,
+                    pofile.language_id,
+                    plural_forms,
+                )
+            )
+        )
+    return "VALUES %s" % ", ".join(rows)
+
+
+def _get_complete_plural_forms_condition(table_name):
+    """Implement ITranslationMessage.is_complete in SQL for bulk queries.
+
+    This is equivalent to `POFile._getCompletePluralFormsConditions`, but
+    takes the number of plural forms from the "Params" table of the bulk
+    statistics queries.
+    """
+    plurals_query = " AND ".join(
+        "(Params.plural_forms <= %(plural_form)d OR "
+        "%(table_name)s.msgstr%(plural_form)d IS NOT NULL)"
+        % {"plural_form": plural_form, "table_name": table_name}
+        for plural_form in range(1, TranslationConstants.MAX_PLURAL_FORMS)
+    )
+    return (
+        "%(table_name)s.msgstr0 IS NOT NULL AND "
+        "(POTMsgSet.msgid_plural IS NULL OR (%(plurals_query)s))"
+        % {"table_name": table_name, "plurals_query": plurals_query}
+    )
+
+
+def count_translations(pofiles):
+    """Count `currentcount`, `updatescount`, and `rosettacount` in bulk.
+
+    This uses one query for each translation side, however many POFiles
+    there are.
+
+    :param pofiles: A sequence of `POFile`s.
+    :return: A dict mapping POFile IDs to (currentcount, updatescount,
+        rosettacount).
+    """
+    counts = {
+        pofile.id: {"this_side_only": 0, "different": 0, "same": 0}
+        for pofile in pofiles
+    }
+    for side_traits, side_pofiles in _group_pofiles_by_side(pofiles):
+        params = {
+            "params": _get_statistics_parameters(side_pofiles),
+            "flag": side_traits.flag_name,
+            "other_flag": side_traits.other_side_traits.flag_name,
+            "has_msgstrs": _get_complete_plural_forms_condition("Current"),
+            "has_other_msgstrs": _get_complete_plural_forms_condition("Other"),
+        }
+        # The "distinct on" combined with the "order by potemplate nulls
+        # last" makes diverged messages mask their shared equivalents.
+        query = (
+            """
+            WITH Params(pofile, potemplate, language, plural_forms) AS (
+                %(params)s
+            )
+            SELECT pofile, has_other_msgstrs, same_on_both_sides, count(*)
+            FROM (
+                SELECT
+                    DISTINCT ON (Params.pofile, TTI.potmsgset)
+                    Params.pofile,
+                    %(has_other_msgstrs)s AS has_other_msgstrs,
+                    (Other.id = Current.id) AS same_on_both_sides
+                FROM Params
+                JOIN TranslationTemplateItem AS TTI ON
+                    TTI.potemplate = Params.potemplate
+                JOIN POTMsgSet ON POTMsgSet.id = TTI.potmsgset
+                JOIN TranslationMessage AS Current ON
+                    Current.potmsgset = TTI.potmsgset AND
+                    Current.language = Params.language AND
+                    COALESCE(Current.potemplate, Params.potemplate) =
+                        Params.potemplate AND
+                    Current.%(flag)s IS TRUE
+                LEFT OUTER JOIN TranslationMessage AS Other ON
+                    Other.potmsgset = TTI.potmsgset AND
+                    Other.language = Params.language AND
+                    Other.%(other_flag)s IS TRUE AND
+                    Other.potemplate IS NULL
+                WHERE
+                    TTI.sequence > 0 AND
+                    %(has_msgstrs)s
+                ORDER BY
+                    Params.pofile,
+                    TTI.potmsgset,
+                    Current.potemplate NULLS LAST
+            ) AS translated_messages
+            GROUP BY pofile, has_other_msgstrs, same_on_both_sides
+            """
+            % params
+        )
+        for row in IStore(POFile).execute(query):
+            pofile_id, has_other_msgstrs, same_on_both_sides, count = row
+            if not has_other_msgstrs:
+                counts[pofile_id]["this_side_only"] += count
+            elif same_on_both_sides:
+                counts[pofile_id]["same"] += count
+            else:
+                counts[pofile_id]["different"] += count
+
+    return {
+        pofile_id: (
+            count["same"],
+            count["different"],
+            count["different"] + count["this_side_only"],
+        )
+        for pofile_id, count in counts.items()
+    }
+
+
+def count_new_suggestions(pofiles):
+    """Count messages with new suggestions in bulk.
+
+    This uses one query for each translation side, however many POFiles
+    there are.
+
+    :param pofiles: A sequence of `POFile`s.
+    :return: A dict mapping POFile IDs to `unreviewed_count`.
+    """
+    counts = {pofile.id: 0 for pofile in pofiles}
+    suggestion_nonempty = "COALESCE(%s) IS NOT NULL" % ", ".join(
+        [
+            "Suggestion.msgstr%d" % form
+            for form in range(TranslationConstants.MAX_PLURAL_FORMS)
+        ]
+    )
+    for side_traits, side_pofiles in _group_pofiles_by_side(pofiles):
+        params = {
+            "params": _get_statistics_parameters(side_pofiles),
+            "flag": side_traits.flag_name,
+            "suggestion_nonempty": suggestion_nonempty,
+        }
+        # The "distinct on" combined with the "order by potemplate nulls
+        # last" makes diverged messages mask their shared equivalents.
+        query = (
+            """
+            WITH Params(pofile, potemplate, language, plural_forms) AS (
+                %(params)s
+            )
+            SELECT pofile, count(*)
+            FROM (
+                SELECT DISTINCT ON (Params.pofile, TTI.potmsgset)
+                    Params.pofile
+                FROM Params
+                JOIN TranslationTemplateItem TTI ON
+                    TTI.potemplate = Params.potemplate
+                LEFT OUTER JOIN TranslationMessage AS Current ON
+                    Current.potmsgset = TTI.potmsgset AND
+                    Current.language = Params.language AND
+                    COALESCE(Current.potemplate, Params.potemplate) =
+                        Params.potemplate AND
+                    Current.%(flag)s IS TRUE
+                WHERE
+                    TTI.sequence > 0 AND
+                    EXISTS (
+                        SELECT *
+                        FROM TranslationMessage Suggestion
+                        WHERE
+                            Suggestion.potmsgset = TTI.potmsgset AND
+                            Suggestion.language = Params.language AND
+                            Suggestion.%(flag)s IS FALSE AND
+                            %(suggestion_nonempty)s AND
+                            Suggestion.date_created > COALESCE(
+                                Current.date_reviewed,
+                                Current.date_created,
+                                TIMESTAMP 'epoch') AND
+                            COALESCE(
+                                Suggestion.potemplate, Params.potemplate) =
+                                    Params.potemplate
+                    )
+                ORDER BY
+                    Params.pofile,
+                    TTI.potmsgset,
+                    Current.potemplate NULLS LAST
+            ) AS messages_with_suggestions
+            GROUP BY pofile
+            """
+            % params
+        )
+        for pofile_id, count in IStore(POFile).execute(query):
+            counts[pofile_id] = count
+    return counts
+
+
 class POFileMixIn(RosettaStats):
     """Base class for `POFile` and `PlaceholderPOFile`.
 
@@ -855,76 +1078,7 @@ def _countTranslations(self):
             # database.
             return 0, 0, 0
 
-        side_traits = getUtility(ITranslationSideTraitsSet).getForTemplate(
-            self.potemplate
-        )
-        complete_plural_clause_this_side = " AND ".join(
-            self._getCompletePluralFormsConditions(table_name="Current")
-        )
-        complete_plural_clause_other_side = " AND ".join(
-            self._getCompletePluralFormsConditions(table_name="Other")
-        )
-        params = {
-            "potemplate": quote(self.potemplate.id),
-            "language": quote(self.language.id),
-            "flag": side_traits.flag_name,
-            "other_flag": side_traits.other_side_traits.flag_name,
-            "has_msgstrs": complete_plural_clause_this_side,
-            "has_other_msgstrs": complete_plural_clause_other_side,
-        }
-        # The "distinct on" combined with the "order by potemplate nulls
-        # last" makes diverged messages mask their shared equivalents.
-        query = (
-            """
-            SELECT has_other_msgstrs, same_on_both_sides, count(*)
-            FROM (
-                SELECT
-                    DISTINCT ON (TTI.potmsgset)
-                    %(has_other_msgstrs)s AS has_other_msgstrs,
-                    (Other.id = Current.id) AS same_on_both_sides
-                FROM TranslationTemplateItem AS TTI
-                JOIN POTMsgSet ON POTMsgSet.id = TTI.potmsgset
-                JOIN TranslationMessage AS Current ON
-                    Current.potmsgset = TTI.potmsgset AND
-                    Current.language = %(language)s AND
-                    COALESCE(Current.potemplate, %(potemplate)s) =
-                        %(potemplate)s AND
-                    Current.%(flag)s IS TRUE
-                LEFT OUTER JOIN TranslationMessage AS Other ON
-                    Other.potmsgset = TTI.potmsgset AND
-                    Other.language = %(language)s AND
-                    Other.%(other_flag)s IS TRUE AND
-                    Other.potemplate IS NULL
-                WHERE
-                    TTI.potemplate = %(potemplate)s AND
-                    TTI.sequence > 0 AND
-                    %(has_msgstrs)s
-                ORDER BY
-                    TTI.potmsgset,
-                    Current.potemplate NULLS LAST
-            ) AS translated_messages
-            GROUP BY has_other_msgstrs, same_on_both_sides
-            """
-            % params
-        )
-
-        this_side_only = 0
-        translated_differently = 0
-        translated_same = 0
-        for row in IStore(self).execute(query):
-            (has_other_msgstrs, same_on_both_sides, count) = row
-            if not has_other_msgstrs:
-                this_side_only += count
-            elif same_on_both_sides:
-                translated_same += count
-            else:
-                translated_differently += count
-
-        return (
-            translated_same,
-            translated_differently,
-            translated_differently + this_side_only,
-        )
+        return count_translations([self])[self.id]
 
     def _countNewSuggestions(self):
         """Count messages with new suggestions."""
@@ -934,61 +1088,7 @@ def _countNewSuggestions(self):
             # database.
             return 0
 
-        flag_name = (
-            getUtility(ITranslationSideTraitsSet)
-            .getForTemplate(self.potemplate)
-            .flag_name
-        )
-        suggestion_nonempty = "COALESCE(%s) IS NOT NULL" % ", ".join(
-            [
-                "Suggestion.msgstr%d" % form
-                for form in range(TranslationConstants.MAX_PLURAL_FORMS)
-            ]
-        )
-        params = {
-            "language": quote(self.language.id),
-            "potemplate": quote(self.potemplate.id),
-            "flag": flag_name,
-            "suggestion_nonempty": suggestion_nonempty,
-        }
-        # The "distinct on" combined with the "order by potemplate nulls
-        # last" makes diverged messages mask their shared equivalents.
-        query = (
-            """
-            SELECT count(*)
-            FROM (
-                SELECT DISTINCT ON (TTI.potmsgset) *
-                FROM TranslationTemplateItem TTI
-                LEFT OUTER JOIN TranslationMessage AS Current ON
-                    Current.potmsgset = TTI.potmsgset AND
-                    Current.language = %(language)s AND
-                    COALESCE(Current.potemplate, %(potemplate)s) =
-                        %(potemplate)s AND
-                    Current.%(flag)s IS TRUE
-                WHERE
-                    TTI.potemplate = %(potemplate)s AND
-                    TTI.sequence > 0 AND
-                    EXISTS (
-                        SELECT *
-                        FROM TranslationMessage Suggestion
-                        WHERE
-                            Suggestion.potmsgset = TTI.potmsgset AND
-                            Suggestion.language = %(language)s AND
-                            Suggestion.%(flag)s IS FALSE AND
-                            %(suggestion_nonempty)s AND
-                            Suggestion.date_created > COALESCE(
-                                Current.date_reviewed,
-                                Current.date_created,
-                                TIMESTAMP 'epoch') AND
-                            COALESCE(Suggestion.potemplate, %(potemplate)s) =
-                                %(potemplate)s
-                    )
-                ORDER BY TTI.potmsgset, Current.potemplate NULLS LAST
-            ) AS messages_with_suggestions
-        """
-            % params
-        )
-        return IStore(self).execute(query).get_one()[0]
+        return count_new_suggestions([self])[self.id]
 
     def updateStatistics(self):
         """See `IPOFile`."""
@@ -1252,19 +1352,24 @@ def export(self, ignore_obsolete=False, force_utf8=False):
 
         return file_content
 
-    def _selectRows(self, where=None, ignore_obsolete=True):
+    def _selectRows(self, where=None, ignore_obsolete=True, potmsgsets=None):
         """Select translation message data.
 
         Diverged messages come before shared ones.  The exporter relies
         on this.
+
+        :param potmsgsets: An optional dict mapping IDs to all the
+            `POTMsgSet`s of this file's template, for callers exporting
+            several files from the same template.
         """
         # Avoid circular import.
         from lp.translations.model.vpoexport import VPOExport
 
-        # Prefetch all POTMsgSets for this template in one go.
-        potmsgsets = {}
-        for potmsgset in self.potemplate.getPOTMsgSets(ignore_obsolete):
-            potmsgsets[potmsgset.id] = potmsgset
+        if potmsgsets is None:
+            # Prefetch all POTMsgSets for this template in one go.
+            potmsgsets = {}
+            for potmsgset in self.potemplate.getPOTMsgSets(ignore_obsolete):
+                potmsgsets[potmsgset.id] = potmsgset
 
         # Names of columns that are selected and passed (in this order) to
         # the VPOExport constructor.
@@ -1352,7 +1457,7 @@ def _selectRows(self, where=None, ignore_obsolete=True):
             export_data.setRefs(self, potmsgsets)
             yield export_data
 
-    def getTranslationRows(self):
+    def getTranslationRows(self, potmsgsets=None):
         """See `IVPOExportSet`."""
         # Only fetch rows that belong to this POFile and are "interesting":
         # they must either be in the current template (sequence != 0, so not
@@ -1363,7 +1468,9 @@ def getTranslationRows(self):
         )
         flag = traits.flag_name
         where = "TranslationTemplateItem.sequence <> 0 OR %s IS TRUE" % flag
-        return self._selectRows(ignore_obsolete=False, where=where)
+        return self._selectRows(
+            ignore_obsolete=False, where=where, potmsgsets=potmsgsets
+        )
 
     def getChangedRows(self):
         """See `IVPOExportSet`."""
@@ -1544,7 +1651,7 @@ def prepareTranslationCredits(self, potmsgset):
         """See `IPOFile`."""
         return None
 
-    def getTranslationRows(self):
+    def getTranslationRows(self, potmsgsets=None):
         """See `IPOFile`."""
         return []
 
@@ -1627,6 +1734,33 @@ def getBatch(self, starting_id, batch_size):
             .order_by(POFile.id)[:batch_size]
         )
 
+    def updateStatistics(self, pofiles):
+        """See `IPOFileSet`."""
+        # Avoid circular imports.
+        from lp.services.worlddata.model.language import Language
+        from lp.translations.model.potemplate import POTemplate
+
+        pofiles = [removeSecurityProxy(pofile) for pofile in pofiles]
+        load_related(POTemplate, pofiles, ["potemplate_id"])
+        load_related(Language, pofiles, ["language_id"])
+        nonempty_pofiles = []
+        for pofile in pofiles:
+            if pofile.potemplate.messageCount() == 0:
+                pofile.potemplate.updateMessageCount()
+            # If the template is empty, as it is when it is first created,
+            # we know the answers without querying the database.
+            if pofile.potemplate.messageCount() != 0:
+                nonempty_pofiles.append(pofile)
+        translation_counts = count_translations(nonempty_pofiles)
+        suggestion_counts = count_new_suggestions(nonempty_pofiles)
+        for pofile in pofiles:
+            (
+                pofile.currentcount,
+                pofile.updatescount,
+                pofile.rosettacount,
+            ) = translation_counts.get(pofile.id, (0, 0, 0))
+            pofile.unreviewed_count = suggestion_counts.get(pofile.id, 0)
+
     def getPOFilesWithTranslationCredits(self, untranslated=False):
         """See `IPOFileSet`."""
         # Avoid circular imports.
@@ -1668,9 +1802,9 @@ def getPOFilesWithTranslationCredits(self, untranslated=False):
 class POFileToTranslationFileDataAdapter:
     """Adapter from `IPOFile` to `ITranslationFileData`."""
 
-    def __init__(self, pofile):
+    def __init__(self, pofile, potmsgsets=None):
         self._pofile = pofile
-        self.messages = self._getMessages()
+        self.messages = self._getMessages(potmsgsets=potmsgsets)
         self.format = pofile.potemplate.source_file_format
 
     @cachedproperty
@@ -1774,7 +1908,7 @@ def header(self):
 
         return translation_header
 
-    def _getMessages(self, changed_rows_only=False):
+    def _getMessages(self, changed_rows_only=False, potmsgsets=None):
         """Return a list of `ITranslationMessageData` for the `IPOFile`
         adapted."""
         pofile = self._pofile
@@ -1784,7 +1918,7 @@ def _getMessages(self, changed_rows_only=False):
         if changed_rows_only:
             rows = pofile.getChangedRows()
         else:
-            rows = pofile.getTranslationRows()
+            rows = pofile.getTranslationRows(potmsgsets=potmsgsets)
 
         messages = []
         diverged_messages = set()
@@ -20,6 +20,7 @@
 from lp.services.job.interfaces.job import IRunnableJob
 from lp.services.job.model.job import Job
 from lp.services.job.runner import BaseRunnableJob
+from lp.translations.interfaces.pofile import IPOFileSet
 from lp.translations.interfaces.pofilestatsjob import IPOFileStatsJobSource
 from lp.translations.interfaces.potemplate import IPOTemplateSet
 from lp.translations.model.pofile import POFile
@@ -60,7 +61,7 @@ def run(self):
         """See `IRunnableJob`."""
         logger = logging.getLogger()
         logger.info("Updating statistics for %s" % self.pofile.title)
-        self.pofile.updateStatistics()
+        pofiles = [self.pofile]
 
         # Next we have to find any POFiles that share translations with the
         # above POFile so we can update their statistics too.  To do that we
@@ -77,9 +78,12 @@ def run(self):
         # into the same language as the POFile this job is about.
         for template in shared_templates:
             pofile = template.getPOFileByLang(self.pofile.language.code)
-            if pofile is None:
+            if pofile is None or pofile == self.pofile:
                 continue
-            pofile.updateStatistics()
+            pofiles.append(pofile)
+
+        # Recount all of them together.
+        getUtility(IPOFileSet).updateStatistics(pofiles)
 
     @staticmethod
     def iterReady():
@@ -31,6 +31,23 @@ def new(cls, msgid):
         IStore(cls).add(pomsgid)
         return pomsgid
 
+    @classmethod
+    def getByMsgids(cls, keys):
+        """Return a dict mapping each of the given msgids to its POMsgID.
+
+        Msgids that are not found are left out of the result.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        rows = IStore(POMsgID).find(
+            POMsgID,
+            Func("sha1", POMsgID.msgid).is_in(
+                [Func("sha1", key) for key in keys]
+            ),
+        )
+        return {row.msgid: row for row in rows if row.msgid in keys}
+
     @classmethod
     def getByMsgid(cls, key):
         """Return a POMsgID object for the given msgid.
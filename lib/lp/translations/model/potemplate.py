@@ -725,6 +725,41 @@ def _getPOTMsgSetBy(
             .first()
         )
 
+    def getSharedPOTMsgSetsByMsgIDs(self, keys):
+        """See `IPOTemplate`."""
+        keys = {
+            (
+                msgid_singular.id,
+                None if msgid_plural is None else msgid_plural.id,
+                context,
+            )
+            for msgid_singular, msgid_plural, context in keys
+        }
+        if not keys:
+            return {}
+        rows = IStore(POTMsgSet).find(
+            POTMsgSet,
+            TranslationTemplateItem.potmsgset_id == POTMsgSet.id,
+            TranslationTemplateItem.potemplate_id.is_in(self._sharing_ids),
+            POTMsgSet.msgid_singular_id.is_in(
+                {msgid_singular_id for msgid_singular_id, _, _ in keys}
+            ),
+        )
+        # As in _getPOTMsgSetBy, prefer messages from this template.
+        rows = rows.order_by(
+            SQL("TranslationTemplateItem.potemplate <> ?", params=(self.id,))
+        )
+        potmsgsets = {}
+        for potmsgset in rows:
+            key = (
+                potmsgset.msgid_singular_id,
+                potmsgset.msgid_plural_id,
+                potmsgset.context,
+            )
+            if key in keys:
+                potmsgsets.setdefault(key, potmsgset)
+        return potmsgsets
+
     def hasMessageID(self, msgid_singular, msgid_plural, context=None):
         """See `IPOTemplate`."""
         return bool(
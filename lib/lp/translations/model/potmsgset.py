@@ -576,17 +576,26 @@ def validateTranslations(self, translations):
             self.singular_text, self.plural_text, translations, self.flags
         )
 
-    def _findPOTranslations(self, translations):
-        """Find all POTranslation records for passed `translations`."""
+    def _findPOTranslations(self, translations, known_potranslations=None):
+        """Find all POTranslation records for passed `translations`.
+
+        :param known_potranslations: An optional dict mapping translation
+            strings to POTranslations that have already been looked up.
+        """
+        if known_potranslations is None:
+            known_potranslations = {}
         potranslations = {}
         # Set all POTranslations we can have (up to MAX_PLURAL_FORMS)
         for pluralform in range(TranslationConstants.MAX_PLURAL_FORMS):
             translation = translations.get(pluralform)
             if translation is not None:
                 # Find or create a POTranslation for the specified text
-                potranslations[pluralform] = (
-                    POTranslation.getOrCreateTranslation(translation)
-                )
+                potranslation = known_potranslations.get(translation)
+                if potranslation is None:
+                    potranslation = POTranslation.getOrCreateTranslation(
+                        translation
+                    )
+                potranslations[pluralform] = potranslation
             else:
                 potranslations[pluralform] = None
         return potranslations
@@ -674,13 +683,20 @@ def _findMatchingTranslationMessage(
             return None
 
     def submitSuggestion(
-        self, pofile, submitter, new_translations, from_import=False
+        self,
+        pofile,
+        submitter,
+        new_translations,
+        from_import=False,
+        potranslations=None,
     ):
         """See `IPOTMsgSet`."""
         if self.is_translation_credit:
             # We don't support suggestions on credits messages.
             return None
-        potranslations = self._findPOTranslations(new_translations)
+        potranslations = self._findPOTranslations(
+            new_translations, potranslations
+        )
 
         existing_message = self._findMatchingTranslationMessage(
             pofile, potranslations, prefer_shared=True
@@ -31,6 +31,25 @@ def new(cls, translation):
         IStore(cls).add(potranslation)
         return potranslation
 
+    @classmethod
+    def getByTranslations(cls, keys):
+        """Return a dict mapping the given translations to POTranslations.
+
+        Translations that are not found are left out of the result.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        rows = IStore(POTranslation).find(
+            POTranslation,
+            Func("sha1", POTranslation.translation).is_in(
+                [Func("sha1", key) for key in keys]
+            ),
+        )
+        return {
+            row.translation: row for row in rows if row.translation in keys
+        }
+
     @classmethod
     def getByTranslation(cls, key):
         """Return a POTranslation object for the given translation."""
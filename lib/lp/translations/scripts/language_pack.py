@@ -12,6 +12,9 @@
 import os
 import sys
 import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from shutil import copyfileobj
 
 import transaction
@@ -21,6 +24,7 @@
 
 from lp.registry.interfaces.distribution import IDistributionSet
 from lp.registry.model.sourcepackagename import SourcePackageName
+from lp.services.config import config
 from lp.services.database.interfaces import IStore
 from lp.services.librarian.interfaces.client import (
     ILibrarianClient,
@@ -29,8 +33,18 @@
 from lp.services.tarfile_helpers import LaunchpadWriteTarFile
 from lp.translations.enums import LanguagePackType
 from lp.translations.interfaces.languagepack import ILanguagePackSet
+from lp.translations.interfaces.translationexporter import (
+    ITranslationExporter,
+)
+from lp.translations.interfaces.translationfileformat import (
+    TranslationFileFormat,
+)
 from lp.translations.interfaces.vpoexport import IVPOExportSet
+from lp.translations.model.pofile import POFileToTranslationFileDataAdapter
 from lp.translations.model.potemplate import POTemplate
+from lp.translations.utilities.translation_common_format import (
+    TranslationFileData,
+)
 
 
 def iter_sourcepackage_translationdomain_mapping(series):
@@ -48,6 +62,53 @@ def iter_sourcepackage_translationdomain_mapping(series):
     ).order_by(SourcePackageName.name, POTemplate.translation_domain)
 
 
+def make_translation_file_data(pofile, potmsgsets):
+    """Copy the data needed to export a POFile into a picklable object.
+
+    :param pofile: The `IPOFile` to export.
+    :param potmsgsets: A dict mapping IDs to all the `POTMsgSet`s of the
+        POFile's template.
+    :return: A `TranslationFileData` with an extra `format_name` attribute.
+    """
+    adapted = POFileToTranslationFileDataAdapter(pofile, potmsgsets)
+    translation_file = TranslationFileData()
+    translation_file.header = adapted.header
+    translation_file.messages = adapted.messages
+    translation_file.path = adapted.path
+    translation_file.translation_domain = adapted.translation_domain
+    translation_file.is_template = adapted.is_template
+    translation_file.language_code = adapted.language_code
+    translation_file.format_name = adapted.format.name
+    return translation_file
+
+
+def render_translation_file(translation_file, force_utf8):
+    """Render a translation file for a language pack.
+
+    This only takes picklable arguments and does not touch the database,
+    so it can be run in a worker process.
+
+    :param translation_file: A `TranslationFileData` as returned by
+        `make_translation_file_data`.
+    :param force_utf8: Whether to export the file as UTF-8.
+    :return: The contents of the exported file.
+    """
+    translation_file.format = TranslationFileFormat.items[
+        translation_file.format_name
+    ]
+    exported_file = getUtility(ITranslationExporter).exportTranslationFiles(
+        [translation_file],
+        # We don't want obsolete entries here, it makes no sense for a
+        # language pack.
+        ignore_obsolete=True,
+        force_utf8=force_utf8,
+    )
+    try:
+        return exported_file.read()
+    finally:
+        exported_file.close()
+
+
 def export(distroseries, component, update, force_utf8, logger):
     """Return a pair containing a filehandle from which the distribution's
     translations tarball can be read and the size of the tarball in bytes.
@@ -87,63 +148,120 @@ def export(distroseries, component, update, force_utf8, logger):
         distroseries, date, component, languagepack=True
     )
 
+    # If we have worker processes, this process fetches translations from
+    # the database and the workers render them.  Rendered files are added
+    # to the tarball in the same order as POFiles are fetched, and the
+    # number of files in flight is bounded to keep memory use flat.
+    export_workers = config.rosetta.language_pack_export_workers
+    executor = None
+    if export_workers is not None and export_workers > 1:
+        logger.debug(
+            "Rendering PO files using %d worker processes" % export_workers
+        )
+        executor = ProcessPoolExecutor(max_workers=export_workers)
+    pending = deque()
+
+    def add_rendered(pofile_id, path, render):
+        try:
+            archive.add_file(path, render())
+        except Exception:
+            logger.exception(
+                "Uncaught exception while exporting PO file %d" % pofile_id
+            )
+
+    def add_pending():
+        pofile_id, path, future = pending.popleft()
+        add_rendered(pofile_id, path, future.result)
+
     # Manual caching.  Fetch POTMsgSets in bulk per template, and cache
     # them across POFiles if subsequent POFiles belong to the same
     # template.
     cached_potemplate = None
-    cached_potmsgsets = []
+    cached_potmsgsets = {}
 
-    for index, pofile in enumerate(pofiles):
-        number = index + 1
-        logger.debug(
-            "Exporting PO file %d (%d/%d)" % (pofile.id, number, pofile_count)
-        )
-
-        potemplate = pofile.potemplate
-        if potemplate != cached_potemplate:
-            # Launchpad's StupidCache caches absolutely everything,
-            # which causes us to run out of memory.  We know at this
-            # point that we don't have useful references to potemplate's
-            # messages anymore, so remove them forcibly from the cache.
-            store = Store.of(potemplate)
-            for potmsgset in cached_potmsgsets:
-                store.invalidate(potmsgset.msgid_singular)
-                store.invalidate(potmsgset)
-
-            # Commit a transaction with every PO template and its
-            # PO files exported so we don't keep it open for too long.
-            transaction.commit()
-
-            cached_potemplate = potemplate
-            cached_potmsgsets = [
-                potmsgset for potmsgset in potemplate.getPOTMsgSets()
-            ]
-
-            if ((index + 1) % 5) == 0:
-                # Garbage-collect once in 5 templates (but not at the
-                # very beginning).  Bit too expensive to do for each
-                # one.
-                gc.collect()
-
-        domain = potemplate.translation_domain
-        code = pofile.getFullLanguageCode()
-        path = os.path.join(path_prefix, code, "LC_MESSAGES", "%s.po" % domain)
-
-        try:
-            # We don't want obsolete entries here, it makes no sense for a
-            # language pack.
-            contents = pofile.export(
-                ignore_obsolete=True, force_utf8=force_utf8
+    try:
+        for index, pofile in enumerate(pofiles):
+            number = index + 1
+            logger.debug(
+                "Exporting PO file %d (%d/%d)"
+                % (pofile.id, number, pofile_count)
             )
 
-            # Store it in the tarball.
-            archive.add_file(path, contents)
-        except Exception:
-            logger.exception(
-                "Uncaught exception while exporting PO file %d" % pofile.id
+            potemplate = pofile.potemplate
+            if potemplate != cached_potemplate:
+                # Launchpad's StupidCache caches absolutely everything,
+                # which causes us to run out of memory.  We know at this
+                # point that we don't have useful references to
+                # potemplate's messages anymore, so remove them forcibly
+                # from the cache.
+                store = Store.of(potemplate)
+                for potmsgset in cached_potmsgsets.values():
+                    store.invalidate(potmsgset.msgid_singular)
+                    store.invalidate(potmsgset)
+
+                # Commit a transaction with every PO template and its
+                # PO files exported so we don't keep it open for too long.
+                transaction.commit()
+
+                cached_potemplate = potemplate
+                cached_potmsgsets = {
+                    potmsgset.id: potmsgset
+                    for potmsgset in potemplate.getPOTMsgSets(current=False)
+                }
+
+                if ((index + 1) % 5) == 0:
+                    # Garbage-collect once in 5 templates (but not at the
+                    # very beginning).  Bit too expensive to do for each
+                    # one.
+                    gc.collect()
+
+            domain = potemplate.translation_domain
+            code = pofile.getFullLanguageCode()
+            path = os.path.join(
+                path_prefix, code, "LC_MESSAGES", "%s.po" % domain
             )
 
-        store.invalidate(pofile)
+            try:
+                translation_file = make_translation_file_data(
+                    pofile, cached_potmsgsets
+                )
+            except Exception:
+                logger.exception(
+                    "Uncaught exception while exporting PO file %d" % pofile.id
+                )
+            else:
+                if executor is not None:
+                    pending.append(
+                        (
+                            pofile.id,
+                            path,
+                            executor.submit(
+                                render_translation_file,
+                                translation_file,
+                                force_utf8,
+                            ),
+                        )
+                    )
+                    while len(pending) > export_workers * 2:
+                        add_pending()
+                else:
+                    add_rendered(
+                        pofile.id,
+                        path,
+                        partial(
+                            render_translation_file,
+                            translation_file,
+                            force_utf8,
+                        ),
+                    )
+
+            store.invalidate(pofile)
+
+        while pending:
+            add_pending()
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     logger.info("Adding timestamp file")
     # Is important that the timestamp contain the date when the export
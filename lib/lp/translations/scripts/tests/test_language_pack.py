@@ -0,0 +1,115 @@
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for language pack exports."""
+
+import pickle
+import tarfile
+
+import transaction
+from testtools.matchers import Equals
+from zope.security.proxy import removeSecurityProxy
+
+from lp.services.log.logger import DevNullLogger
+from lp.testing import StormStatementRecorder, TestCaseWithFactory
+from lp.testing.layers import LaunchpadZopelessLayer
+from lp.testing.matchers import HasQueryCount
+from lp.translations.scripts.language_pack import (
+    export,
+    make_translation_file_data,
+    render_translation_file,
+)
+
+
+def strip_export_date(content):
+    """Remove the header that records when a file was exported."""
+    return b"\n".join(
+        line
+        for line in content.split(b"\n")
+        if not line.startswith(b'"X-Launchpad-Export-Date: ')
+    )
+
+
+class TestLanguagePackExport(TestCaseWithFactory):
+    layer = LaunchpadZopelessLayer
+
+    def setUp(self):
+        super().setUp()
+        self.distroseries = self.factory.makeUbuntuDistroSeries()
+        self.pofiles = []
+        for _ in range(2):
+            potemplate = self.factory.makePOTemplate(
+                distroseries=self.distroseries,
+                sourcepackagename=self.factory.makeSourcePackageName(),
+            )
+            removeSecurityProxy(potemplate).languagepack = True
+            potmsgsets = [
+                self.factory.makePOTMsgSet(potemplate=potemplate)
+                for _ in range(3)
+            ]
+            for language_code in ("de", "fr"):
+                pofile = self.factory.makePOFile(
+                    language_code, potemplate=potemplate
+                )
+                for potmsgset in potmsgsets[:2]:
+                    self.factory.makeCurrentTranslationMessage(
+                        pofile=pofile, potmsgset=potmsgset
+                    )
+                self.pofiles.append(pofile)
+        transaction.commit()
+
+    def exportContents(self):
+        filehandle, _ = export(
+            self.distroseries, None, False, False, DevNullLogger()
+        )
+        with tarfile.open(fileobj=filehandle) as archive:
+            return [
+                (
+                    member.name,
+                    strip_export_date(archive.extractfile(member).read()),
+                )
+                for member in archive.getmembers()
+                if member.isreg()
+            ]
+
+    def test_render_matches_pofile_export(self):
+        # Rendering a snapshot of a POFile gives the same result as
+        # exporting the POFile directly, even after a round trip through
+        # pickle.
+        pofile = self.pofiles[0]
+        potmsgsets = {
+            potmsgset.id: potmsgset
+            for potmsgset in pofile.potemplate.getPOTMsgSets(current=False)
+        }
+        translation_file = pickle.loads(
+            pickle.dumps(make_translation_file_data(pofile, potmsgsets))
+        )
+        self.assertEqual(
+            strip_export_date(pofile.export(ignore_obsolete=True)),
+            strip_export_date(
+                render_translation_file(translation_file, False)
+            ),
+        )
+
+    def test_snapshot_reuses_potmsgsets(self):
+        # Given prefetched POTMsgSets, taking a snapshot of a POFile only
+        # needs a single query for its translations.
+        pofile = self.pofiles[0]
+        potmsgsets = {
+            potmsgset.id: potmsgset
+            for potmsgset in pofile.potemplate.getPOTMsgSets(current=False)
+        }
+        make_translation_file_data(pofile, potmsgsets)
+        with StormStatementRecorder() as recorder:
+            make_translation_file_data(pofile, potmsgsets)
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+
+    def test_workers_match_serial_export(self):
+        # Rendering PO files in worker processes produces the same tarball
+        # contents, in the same order, as rendering them serially.
+        serial_contents = self.exportContents()
+        self.assertEqual(
+            len(self.pofiles) + 2, len(serial_contents), serial_contents
+        )
+        self.pushConfig("rosetta", language_pack_export_workers=2)
+        self.assertEqual(serial_contents, self.exportContents())
@@ -3,10 +3,15 @@
 
 """Integration-test POFile statistics verification script."""
 
+import transaction
+from zope.security.proxy import removeSecurityProxy
+
+from lp.services.log.logger import DevNullLogger
 from lp.testing import TestCaseWithFactory
 from lp.testing.dbuser import dbuser
 from lp.testing.layers import LaunchpadZopelessLayer
 from lp.translations.interfaces.side import TranslationSide
+from lp.translations.scripts.verify_pofile_stats import Verifier
 
 
 class TestVerifyPOFileStats(TestCaseWithFactory):
@@ -24,3 +29,32 @@ def test_database_permissions(self):
         with dbuser("pofilestats"):
             for pofile in pofiles:
                 pofile.updateStatistics()
+
+    def test_verifier_repairs_batch(self):
+        # The verifier recomputes statistics for a whole batch of POFiles
+        # at once, and counts and repairs those that were wrong.
+        pofiles = [
+            self.factory.makePOFile(side=side)
+            for side in (TranslationSide.UPSTREAM, TranslationSide.UBUNTU)
+        ]
+        for pofile in pofiles:
+            self.factory.makeCurrentTranslationMessage(
+                pofile=pofile,
+                potmsgset=self.factory.makePOTMsgSet(
+                    potemplate=pofile.potemplate, sequence=1
+                ),
+            )
+            pofile.updateStatistics()
+        expected = [pofile.getStatistics() for pofile in pofiles]
+        removeSecurityProxy(pofiles[0]).currentcount = 100
+        transaction.commit()
+
+        verifier = Verifier(transaction, DevNullLogger(), pofiles[0].id)
+        with dbuser("pofilestats"):
+            verifier(len(pofiles))
+        self.assertEqual(len(pofiles), verifier.total_checked)
+        self.assertEqual(1, verifier.total_incorrect)
+        self.assertEqual(0, verifier.total_exceptions)
+        self.assertEqual(
+            expected, [pofile.getStatistics() for pofile in pofiles]
+        )
@@ -53,30 +53,55 @@ def __call__(self, chunk_size):
         Retrieve a batch of `POFile`s in ascending id order, and verify and
         refresh their cached statistics.
         """
-        pofiles = self.getPOFilesBatch(chunk_size)
-
-        self.start_id = None
-        for pofile in pofiles:
-            self.total_checked += 1
-            # Set starting point of next batch to right after the POFile we're
-            # looking at.  If we don't get any POFiles, this loop iterates
-            # zero times and start_id will remain set to None.
-            self.start_id = pofile.id + 1
-            try:
-                self._verify(pofile)
-            except Exception as error:
-                # Verification failed for this POFile.  Don't bail out: if
-                # there's a pattern of failure, we'll want to report that and
-                # not just the first problem we encounter.
-                self.total_exceptions += 1
-                self.logger.warning(
-                    "Error %s while recomputing stats for POFile %d: %s"
-                    % (type(error), pofile.id, error)
-                )
+        pofiles = list(self.getPOFilesBatch(chunk_size))
+
+        # Set starting point of next batch to right after the last POFile
+        # in this one.  If we don't get any POFiles, start_id is set to None.
+        if pofiles:
+            batch_start_id = pofiles[0].id
+            self.start_id = pofiles[-1].id + 1
+        else:
+            self.start_id = None
+        self.total_checked += len(pofiles)
+
+        old_stats = [pofile.getStatistics() for pofile in pofiles]
+        try:
+            # Recount the whole batch in a few set-based queries.
+            self.pofileset.updateStatistics(pofiles)
+        except Exception:
+            # Find out which POFiles are the problem.
+            self.transaction.abort()
+            self.transaction.begin()
+            pofiles = self.pofileset.getBatch(batch_start_id, len(pofiles))
+            for pofile in pofiles:
+                try:
+                    self._verify(pofile)
+                except Exception as error:
+                    # Verification failed for this POFile.  Don't bail
+                    # out: if there's a pattern of failure, we'll want to
+                    # report that and not just the first problem we
+                    # encounter.
+                    self.total_exceptions += 1
+                    self.logger.warning(
+                        "Error %s while recomputing stats for POFile %d: %s"
+                        % (type(error), pofile.id, error)
+                    )
+        else:
+            for pofile, old in zip(pofiles, old_stats):
+                self._compare(pofile, old, pofile.getStatistics())
 
         self.transaction.commit()
         self.transaction.begin()
 
+    def _compare(self, pofile, old_stats, new_stats):
+        """Log a warning if recomputed stats differ from the cached ones."""
+        if new_stats != old_stats:
+            self.total_incorrect += 1
+            self.logger.info(
+                "POFile %d: cached stats were %s, recomputed as %s"
+                % (pofile.id, str(old_stats), str(new_stats))
+            )
+
     def _verify(self, pofile):
         """Re-compute statistics for pofile, and compare to cached stats.
 
@@ -86,12 +111,7 @@ def _verify(self, pofile):
         """
         old_stats = pofile.getStatistics()
         new_stats = pofile.updateStatistics()
-        if new_stats != old_stats:
-            self.total_incorrect += 1
-            self.logger.info(
-                "POFile %d: cached stats were %s, recomputed as %s"
-                % (pofile.id, str(old_stats), str(new_stats))
-            )
+        self._compare(pofile, old_stats, new_stats)
 
 
 class VerifyPOFileStatsProcess:
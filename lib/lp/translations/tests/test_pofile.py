@@ -15,7 +15,10 @@
 from lp.testing.fakemethod import FakeMethod
 from lp.testing.layers import ZopelessDatabaseLayer
 from lp.translations.interfaces.pofile import IPOFileSet
-from lp.translations.interfaces.side import ITranslationSideTraitsSet
+from lp.translations.interfaces.side import (
+    ITranslationSideTraitsSet,
+    TranslationSide,
+)
 from lp.translations.interfaces.translationcommonformat import (
     ITranslationFileData,
 )
@@ -1881,6 +1884,59 @@ def test_getPOFilesByPathAndOrigin_can_ignore_obsolete_templates(self):
             ),
         )
 
+    def test_updateStatistics_matches_individual_updates(self):
+        # Updating statistics for many POFiles at once gives the same
+        # results as updating them one by one, on both translation sides
+        # and for languages with and without plural forms.
+        pofiles = []
+        for side in (TranslationSide.UPSTREAM, TranslationSide.UBUNTU):
+            potemplate = self.factory.makePOTemplate(side=side)
+            potmsgsets = [
+                self.factory.makePOTMsgSet(potemplate, sequence=sequence)
+                for sequence in range(1, 4)
+            ]
+            potmsgsets.append(
+                self.factory.makePOTMsgSet(
+                    potemplate,
+                    singular="%d file",
+                    plural="%d files",
+                    sequence=4,
+                )
+            )
+            for language_code in ("sr", "ja"):
+                pofile = self.factory.makePOFile(
+                    language_code, potemplate=potemplate
+                )
+                self.factory.makeCurrentTranslationMessage(
+                    pofile=pofile, potmsgset=potmsgsets[0]
+                )
+                self.factory.makeCurrentTranslationMessage(
+                    pofile=pofile, potmsgset=potmsgsets[1], current_other=True
+                )
+                self.factory.makeSuggestion(
+                    pofile=pofile, potmsgset=potmsgsets[2]
+                )
+                self.factory.makeCurrentTranslationMessage(
+                    pofile=pofile,
+                    potmsgset=potmsgsets[3],
+                    translations=["%d datoteka"],
+                )
+                pofiles.append(pofile)
+        pofiles.append(self.factory.makePOFile("sr"))
+
+        expected = [pofile.updateStatistics() for pofile in pofiles]
+        for pofile in pofiles:
+            naked_pofile = removeSecurityProxy(pofile)
+            naked_pofile.currentcount = 100
+            naked_pofile.updatescount = 100
+            naked_pofile.rosettacount = 100
+            naked_pofile.unreviewed_count = 100
+        self.pofileset.updateStatistics(pofiles)
+        self.assertEqual(
+            expected, [pofile.getStatistics() for pofile in pofiles]
+        )
+        self.assertNotEqual([(0, 0, 0, 0)] * len(pofiles), expected)
+
 
 class TestPOFileStatistics(TestCaseWithFactory):
     """Test PO files statistics calculation."""
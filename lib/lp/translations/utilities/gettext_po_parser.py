@@ -458,6 +458,18 @@ def _renderDate(self, date, default=None):
 # double-quote or escaped character.
 STRAIGHT_TEXT_RUN = re.compile('[^"\\\\]*')
 
+# Compiled regex for a whole quoted string that uses no escape sequences
+# other than those in ESCAPE_MAP.  Most strings are like this, and can be
+# unescaped in one go; anything else is left to the general parser.
+SIMPLE_QUOTED_STRING = re.compile(r'"([^"\\]*(?:\\[abfnrtv"\'\\][^"\\]*)*)"')
+
+# Compiled regex for an escape sequence in ESCAPE_MAP.
+SIMPLE_ESCAPE = re.compile(r"\\(.)")
+
+
+def _unescape_simple(match):
+    return ESCAPE_MAP[match.group(1)]
+
 
 class POParser:
     """Parser class for Gettext files."""
@@ -841,6 +853,22 @@ def _parseQuotedString(self, string):
           ...
         lp.translations.interfaces.translationimporter.TranslationFormatSyntaxError: Extra content found after string: (x)
         """  # noqa: E501
+        if not self._escaped_line_break:
+            match = SIMPLE_QUOTED_STRING.fullmatch(string)
+            if match is not None:
+                output = match.group(1)
+                if "\\" in output:
+                    output = SIMPLE_ESCAPE.sub(_unescape_simple, output)
+                return output
+        return self._parseComplexQuotedString(string)
+
+    def _parseComplexQuotedString(self, string):
+        """Parse a quoted string one escape sequence at a time.
+
+        This handles everything that `_parseQuotedString` does not handle
+        in one go: continuations after an escaped newline, several quoted
+        strings on one line, numeric escape sequences, and syntax errors.
+        """
         if self._escaped_line_break:
             # Continuing a line after an escaped newline.  Strip indentation.
             string = string.lstrip()
@@ -6,13 +6,15 @@
 from textwrap import dedent
 
 import transaction
+from testtools.matchers import Equals
 from zope.component import getUtility
 from zope.security.proxy import removeSecurityProxy
 
 from lp.registry.interfaces.person import IPersonSet
 from lp.services.librarianserver.testing.fake import FakeLibrarian
-from lp.testing import TestCaseWithFactory
+from lp.testing import StormStatementRecorder, TestCaseWithFactory
 from lp.testing.layers import LaunchpadZopelessLayer, ZopelessDatabaseLayer
+from lp.testing.matchers import HasQueryCount
 from lp.translations.enums import TranslationPermission
 from lp.translations.interfaces.potemplate import IPOTemplateSet
 from lp.translations.interfaces.side import TranslationSide
@@ -25,6 +27,7 @@
 from lp.translations.interfaces.translationimportqueue import (
     ITranslationImportQueue,
 )
+from lp.translations.model.potranslation import POTranslation
 from lp.translations.utilities.gettext_po_importer import GettextPOImporter
 from lp.translations.utilities.translation_common_format import (
     TranslationMessageData,
@@ -642,6 +645,45 @@ def test_InvalidTranslatorEmail(self):
         )
 
 
+class BulkFileImporterTestCase(FileImporterTestCase):
+    """Run the importer tests with messages looked up in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        self.pushConfig("poimport", bulk_import=True)
+
+    def test_prefetchMessages_finds_existing_objects(self):
+        # _prefetchMessages finds the existing POMsgIDs, POTMsgSets and
+        # POTranslations for a file's messages, so that importing a message
+        # needs no further queries to find its POTMsgSet.
+        pot_importer = self._createPOTFileImporter(
+            TEST_TEMPLATE_UPSTREAM, True
+        )
+        pot_importer.importFile()
+        potmsgset = pot_importer.potemplate.getPOTMsgSetByMsgIDText(TEST_MSGID)
+        potranslation = POTranslation.getOrCreateTranslation(TEST_MSGSTR)
+        po_importer = self._createPOFileImporter(
+            pot_importer, TEST_TRANSLATION_UPSTREAM, True
+        )
+        [message] = po_importer.translation_file.messages
+        po_importer._prefetchMessages([message])
+        self.assertEqual(
+            {TEST_MSGID: potmsgset.msgid_singular}, po_importer._pomsgids
+        )
+        self.assertEqual(
+            {(potmsgset.msgid_singular.id, None, None): potmsgset},
+            po_importer._potmsgsets,
+        )
+        self.assertEqual(
+            {TEST_MSGSTR: potranslation}, po_importer._potranslations
+        )
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(
+                potmsgset, po_importer.getOrCreatePOTMsgSet(message)
+            )
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+
+
 class CreateFileImporterTestCase(TestCaseWithFactory):
     """Class test for translation importer creation."""
 
@@ -149,6 +149,35 @@ def testEscape(self):
         messages = translation_file.messages
         self.assertEqual(messages[0].msgid_singular, 'foo"bar\nbaz\\xyzzy')
 
+    def testQuotedStringFastPath(self):
+        # Quoted strings that only use simple escape sequences are parsed
+        # in one go, with the same results as the general parser.
+        for string in (
+            '""',
+            '"foo"',
+            '"foo\\"bar\\nbaz\\\\xyzzy"',
+            '"\\a\\b\\f\\n\\r\\t\\v\\\'"',
+            '"foo \\x41\\102"',
+            '"foo" "bar"',
+            '"foo\\',
+        ):
+            self.parser._escaped_line_break = False
+            expected = self.parser._parseComplexQuotedString(string)
+            expected_line_break = self.parser._escaped_line_break
+            self.parser._escaped_line_break = False
+            self.assertEqual(expected, self.parser._parseQuotedString(string))
+            self.assertEqual(
+                expected_line_break, self.parser._escaped_line_break
+            )
+
+        for string in ('"foo', '"foo\\"', '"foo"bar', '"foo\\q"'):
+            self.parser._escaped_line_break = False
+            self.assertRaises(
+                TranslationFormatSyntaxError,
+                self.parser._parseQuotedString,
+                string,
+            )
+
     # Lalo doesn't agree with this test
     # def badEscapeTest(self):
     #
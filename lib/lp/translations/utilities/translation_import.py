@@ -41,9 +41,12 @@
     TranslationValidationStatus,
 )
 from lp.translations.interfaces.translations import TranslationConstants
+from lp.translations.model.pomsgid import POMsgID
+from lp.translations.model.potranslation import POTranslation
 from lp.translations.utilities.gettext_po_importer import GettextPOImporter
 from lp.translations.utilities.kde_po_importer import KdePOImporter
 from lp.translations.utilities.sanitize import (
+    MixedNewlineMarkersError,
     sanitize_translations_from_import,
 )
 from lp.translations.utilities.translation_common_format import (
@@ -406,6 +409,77 @@ def __init__(self, translation_import_queue_entry, importer, logger=None):
         self.pofile_in_db = None
         self.errors = []
 
+        # Database objects looked up in bulk by _prefetchMessages, or None
+        # if they are looked up one message at a time.
+        self._pomsgids = None
+        self._potmsgsets = None
+        self._potranslations = None
+
+    def _prefetchMessages(self, messages):
+        """Look up existing database objects for `messages` in bulk.
+
+        This finds the POMsgIDs, shared POTMsgSets and POTranslations that
+        importing `messages` would otherwise look up one at a time.
+        Anything that isn't found here is looked up or created while
+        importing each message, as usual.
+        """
+        messages = [
+            message
+            for message in messages
+            if self.pofile_in_db is None
+            or not self.pofile_in_db.isAlreadyTranslatedTheSame(message)
+        ]
+
+        msgids = set()
+        for message in messages:
+            msgids.add(message.msgid_singular)
+            if message.msgid_plural is not None:
+                msgids.add(message.msgid_plural)
+        self._pomsgids = POMsgID.getByMsgids(msgids)
+
+        keys = []
+        for message in messages:
+            msgid_singular = self._pomsgids.get(message.msgid_singular)
+            if message.msgid_plural is None:
+                msgid_plural = None
+            else:
+                msgid_plural = self._pomsgids.get(message.msgid_plural)
+                if msgid_plural is None:
+                    continue
+            if msgid_singular is not None:
+                keys.append((msgid_singular, msgid_plural, message.context))
+        self._potmsgsets = self.potemplate.getSharedPOTMsgSetsByMsgIDs(keys)
+
+        translations = set()
+        if self.pofile is not None:
+            for message in messages:
+                if "fuzzy" in message.flags or not any(message.translations):
+                    continue
+                try:
+                    sanitized_translations = sanitize_translations_from_import(
+                        message.msgid_singular,
+                        message.translations,
+                        self.pofile.language.pluralforms,
+                    )
+                except MixedNewlineMarkersError:
+                    # This is reported when the message is imported.
+                    continue
+                translations.update(
+                    translation
+                    for translation in sanitized_translations.values()
+                    if translation is not None
+                )
+        self._potranslations = POTranslation.getByTranslations(translations)
+
+    def _getOrCreatePOMsgID(self, text):
+        """Get or create a POMsgID, using those found by _prefetchMessages."""
+        pomsgid = self._pomsgids.get(text)
+        if pomsgid is None:
+            pomsgid = self._pomsgids[text] = (
+                self.potemplate.getOrCreatePOMsgID(text)
+            )
+        return pomsgid
+
     def getOrCreatePOTMsgSet(self, message):
         """Get the POTMsgSet that this message belongs to or create a new
         one if none was found.
@@ -413,13 +487,37 @@ def getOrCreatePOTMsgSet(self, message):
         :param message: The message.
         :return: The POTMsgSet instance, existing or new.
         """
-        return self.potemplate.getOrCreateSharedPOTMsgSet(
-            message.msgid_singular,
-            plural_text=message.msgid_plural,
-            context=message.context,
-            initial_file_references=message.file_references,
-            initial_source_comment=message.source_comment,
+        if self._potmsgsets is None:
+            return self.potemplate.getOrCreateSharedPOTMsgSet(
+                message.msgid_singular,
+                plural_text=message.msgid_plural,
+                context=message.context,
+                initial_file_references=message.file_references,
+                initial_source_comment=message.source_comment,
+            )
+
+        # This finds or creates the same POTMsgSet as
+        # IPOTemplate.getOrCreateSharedPOTMsgSet, but starts from the
+        # POTMsgSets that were found in bulk.
+        msgid_singular = self._getOrCreatePOMsgID(message.msgid_singular)
+        if message.msgid_plural is None:
+            msgid_plural = None
+        else:
+            msgid_plural = self._getOrCreatePOMsgID(message.msgid_plural)
+        key = (
+            msgid_singular.id,
+            None if msgid_plural is None else msgid_plural.id,
+            message.context,
         )
+        potmsgset = self._potmsgsets.get(key)
+        if potmsgset is None:
+            potmsgset = self.potemplate.createPOTMsgSetFromMsgIDs(
+                msgid_singular, msgid_plural, message.context, sequence=0
+            )
+            potmsgset.filereferences = message.file_references
+            potmsgset.sourcecomment = message.source_comment
+            self._potmsgsets[key] = potmsgset
+        return potmsgset
 
     @cachedproperty
     def share_with_other_side(self):
@@ -568,6 +666,7 @@ def storeTranslationsInDatabase(self, message_data, potmsgset):
             self.last_translator,
             sanitized_translations,
             from_import=True,
+            potranslations=self._potranslations,
         )
 
         validation_ok = self._validateMessage(
@@ -601,9 +700,15 @@ def importFile(self):
         # Collect errors here.
         self.errors = []
 
-        for message in self.translation_file.messages:
-            if message.msgid_singular:
-                self.importMessage(message)
+        messages = [
+            message
+            for message in self.translation_file.messages
+            if message.msgid_singular
+        ]
+        if config.poimport.bulk_import:
+            self._prefetchMessages(messages)
+        for message in messages:
+            self.importMessage(message)
 
         return self.errors, self.translation_file.syntax_warnings
 
@@ -0,0 +1,121 @@
+#! /usr/bin/python3 -S
+#
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Measure the cost of matching build candidates to builders in bulk.
+
+This simulates a build farm with many queued jobs and idle builders, and
+times how long `BulkBuildCandidates` takes to sort all the jobs into
+per-builder-group heaps and then to find a candidate for every idle
+builder.  No database is needed: the candidates are generated in memory,
+standing in for the result of `BuildQueueSet.findAllBuildCandidates`.
+
+The number of builder groups reported is the number of queries that the
+per-group `PrefetchedBuildCandidates` would make for the same scan cycle.
+"""
+
+import _pythonpath  # noqa: F401
+
+import argparse
+import random
+import time
+
+from lp.buildmaster.interactor import BuilderVitals
+from lp.buildmaster.manager import BulkBuildCandidates
+from lp.buildmaster.model.buildqueue import BuildCandidate
+
+PROCESSORS = ["amd64", "arm64", "armhf", "i386", "ppc64el", "riscv64", "s390x"]
+RESOURCES = [None, ("large",), ("gpu",)]
+
+
+def make_vitals(index, rng):
+    open_resources = restricted_resources = None
+    resources = rng.choice(RESOURCES)
+    if resources == ("gpu",):
+        restricted_resources = resources
+    else:
+        open_resources = resources
+    return BuilderVitals(*([None] * len(BuilderVitals._fields)))._replace(
+        name="builder-%d" % index,
+        processor_names=rng.sample(PROCESSORS, rng.choice([1, 1, 2])),
+        virtualized=rng.random() < 0.8,
+        open_resources=open_resources,
+        restricted_resources=restricted_resources,
+    )
+
+
+def make_candidates(count, rng):
+    candidates = []
+    for index in range(count):
+        resources = rng.choice(RESOURCES + [None] * 3)
+        candidates.append(
+            BuildCandidate(
+                index,
+                rng.randrange(0, 5000),
+                rng.choice(PROCESSORS + [None]),
+                rng.random() < 0.8,
+                list(resources) if resources else None,
+            )
+        )
+    candidates.sort(key=BulkBuildCandidates._getSortKey)
+    return candidates
+
+
+def run(all_vitals, candidates):
+    start = time.perf_counter()
+    bulk_candidates = BulkBuildCandidates(all_vitals)
+    minimum_scores = {
+        processor_name: None
+        for processor_name, _, _, _ in bulk_candidates.builder_groups
+    }
+    bulk_candidates._addAllCandidates(candidates, minimum_scores)
+    indexed = time.perf_counter()
+    assigned = 0
+    for vitals in all_vitals:
+        if bulk_candidates._popCandidateID(vitals) is not None:
+            assigned += 1
+    finished = time.perf_counter()
+    return (
+        len(bulk_candidates.builder_groups),
+        assigned,
+        indexed - start,
+        finished - indexed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--jobs", type=int, default=20000, help="Number of queued jobs"
+    )
+    parser.add_argument(
+        "--builders", type=int, default=500, help="Number of idle builders"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of scan cycles"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    all_vitals = [make_vitals(index, rng) for index in range(args.builders)]
+    candidates = make_candidates(args.jobs, rng)
+    for _ in range(args.repeat):
+        groups, assigned, index_time, assign_time = run(all_vitals, candidates)
+        print(
+            "%d jobs, %d builders, %d builder groups: indexed in %.1f ms, "
+            "assigned %d jobs in %.1f ms"
+            % (
+                args.jobs,
+                args.builders,
+                groups,
+                index_time * 1000,
+                assigned,
+                assign_time * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#! /usr/bin/python3 -S
+#
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Compare the CPU cost of the librarian's producers for local files.
+
+This serves a temporary file over HTTP on localhost using both the
+reactor-driven `FileProducer` (which the librarian previously used for all
+files) and the transport-driven `static.NoRangeStaticProducer` (which it
+now uses for local files), downloads it several times with curl, and
+reports throughput per CPU-second of the serving process.
+"""
+
+import _pythonpath  # noqa: F401
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from resource import RUSAGE_SELF, getrusage
+
+from twisted.internet import defer, reactor, threads
+from twisted.web import resource, server, static
+
+from lp.services.librarianserver.web import FileProducer
+
+PRODUCERS = {
+    "FileProducer": FileProducer,
+    "NoRangeStaticProducer": static.NoRangeStaticProducer,
+}
+
+
+class BenchmarkResource(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, path, size):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.producer_class = None
+
+    def render_GET(self, request):
+        request.setHeader(b"content-length", b"%d" % self.size)
+        producer = self.producer_class(request, open(self.path, "rb"))
+        producer.start()
+        return server.NOT_DONE_YET
+
+
+def cpu_time():
+    usage = getrusage(RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def download(url, repeat):
+    for _ in range(repeat):
+        subprocess.run(
+            ["curl", "--silent", "--output", os.devnull, url], check=True
+        )
+
+
+@defer.inlineCallbacks
+def run(site_resource, port, size, repeat):
+    url = "http://localhost:%d/" % port.getHost().port
+    results = {}
+    for name, producer_class in PRODUCERS.items():
+        site_resource.producer_class = producer_class
+        start_cpu, start_time = cpu_time(), time.monotonic()
+        yield threads.deferToThread(download, url, repeat)
+        cpu, elapsed = cpu_time() - start_cpu, time.monotonic() - start_time
+        results[name] = (cpu, elapsed)
+    total = size * repeat / (1024 * 1024)
+    for name, (cpu, elapsed) in results.items():
+        print(
+            "%-22s %8.1f MiB/CPU-second %8.1f MiB/s"
+            % (name, total / cpu, total / elapsed)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--size", type=int, default=256, help="File size in MiB"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Downloads per producer"
+    )
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    with tempfile.NamedTemporaryFile() as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size):
+            f.write(block)
+        f.flush()
+        site_resource = BenchmarkResource(f.name, size)
+        port = reactor.listenTCP(0, server.Site(site_resource))
+
+        def benchmark():
+            d = run(site_resource, port, size, args.repeat)
+            d.addErrback(lambda failure: failure.printTraceback())
+            d.addBoth(lambda _: reactor.stop())
+
+        reactor.callWhenRunning(benchmark)
+        reactor.run()
+
+
+if __name__ == "__main__":
+    main()
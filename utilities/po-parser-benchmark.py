@@ -0,0 +1,109 @@
+#! /usr/bin/python3 -S
+#
+# Copyright 2026 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Measure how fast the Gettext PO parser parses a corpus of files.
+
+Each PO or POT file given on the command line (directories are searched
+recursively) is parsed both by `POParser` and by a parser that handles
+every quoted string with the general escape-by-escape code, as `POParser`
+did before quoted strings were tokenized with a single regular expression.
+The two parsers must produce the same messages and warnings, or fail in
+the same way; the time each of them took is reported.
+"""
+
+import _pythonpath  # noqa: F401
+
+import argparse
+import os
+import time
+
+from lp.translations.utilities.gettext_po_parser import POParser
+
+
+class ComplexStringPOParser(POParser):
+    """A `POParser` that never uses its quoted string fast path."""
+
+    def _parseQuotedString(self, string):
+        return self._parseComplexQuotedString(string)
+
+
+def find_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if filename.endswith((".po", ".pot")):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+
+def summarize(translation_file):
+    return (
+        [
+            (
+                message.msgid_singular,
+                message.msgid_plural,
+                message.context,
+                message.translations,
+                sorted(message.flags),
+                message.comment,
+                message.source_comment,
+                message.file_references,
+                message.is_obsolete,
+            )
+            for message in translation_file.messages
+        ],
+        translation_file.syntax_warnings,
+    )
+
+
+def parse(parser_class, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            result = summarize(parser_class().parse(content))
+        except Exception as e:
+            result = (type(e), str(e))
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "paths", nargs="+", metavar="PATH", help="PO/POT files or directories"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Times to parse each file"
+    )
+    args = parser.parse_args()
+
+    total_size = 0
+    total_times = {POParser: 0.0, ComplexStringPOParser: 0.0}
+    for path in find_files(args.paths):
+        with open(path, "rb") as f:
+            content = f.read()
+        results = {}
+        for parser_class in total_times:
+            results[parser_class], elapsed = parse(
+                parser_class, content, args.repeat
+            )
+            total_times[parser_class] += elapsed
+        if results[POParser] != results[ComplexStringPOParser]:
+            print("%s: parsers disagree" % path)
+        total_size += len(content) * args.repeat
+
+    if total_size == 0:
+        parser.error("No PO or POT files found.")
+    megabytes = total_size / (1024 * 1024)
+    for parser_class, elapsed in total_times.items():
+        print(
+            "%-22s %8.2f s %8.2f MiB/s"
+            % (parser_class.__name__, elapsed, megabytes / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()